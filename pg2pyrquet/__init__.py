@@ -1 +1,2 @@
 from pg2pyrquet.__main__ import export_database, export_query, export_table
+from pg2pyrquet.reader import read_query, read_table
@@ -1,24 +1,81 @@
+from fnmatch import fnmatchcase
+from pathlib import Path
 from typing import Annotated
 
 import typer
 
+from pg2pyrquet.compact import compact_folder
 from pg2pyrquet.core.logging import get_logger
-from pg2pyrquet.export import export_to_parquet
-from pg2pyrquet.utils.files import read_query_from_file
+from pg2pyrquet.distributed import (
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_POLL_SECONDS,
+    UnitState,
+    plan_table_units,
+    run_worker,
+    write_queue_manifest,
+)
+from pg2pyrquet.export import DEFAULT_BATCH_SIZE, FetchMode, export_to_parquet
+from pg2pyrquet.jobs import (
+    ExportJob,
+    JobKind,
+    JobsConfig,
+    format_report,
+    load_jobs_config,
+    run_export_jobs,
+)
+from pg2pyrquet.parallel import export_query_partitions
+from pg2pyrquet.planner import (
+    apply_plan,
+    format_plan,
+    plan_query_export,
+    plan_table_export,
+)
+from pg2pyrquet.statements import export_named_queries
+from pg2pyrquet.stream import (
+    DEFAULT_FLUSH_SECONDS,
+    DEFAULT_MAX_CHANGES,
+    create_stream_slot,
+    stream_changes,
+    validate_snapshot_complete,
+)
+from pg2pyrquet.utils.files import read_named_queries, read_query_from_file
+from pg2pyrquet.utils.fingerprints import (
+    read_fingerprints,
+    write_fingerprints,
+)
 from pg2pyrquet.utils.path import validate_output_path, validate_query_path
 from pg2pyrquet.utils.postgres import (
+    RelationKind,
+    check_column_indexed,
+    check_slot_exists,
+    get_cluster_databases,
     get_database_tables,
     get_default_query,
+    get_ordered_query,
     get_postgres_dsn,
+    get_primary_key_columns,
+    get_table_fingerprints,
     validate_database_connection,
     validate_table_exists,
 )
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions, get_rolled_file
+from pg2pyrquet.utils.summary import (
+    MetadataCollector,
+    remove_dataset_summary,
+    write_dataset_summary,
+)
+from pg2pyrquet.utils.throttle import Throttle, ThrottleLimits
+from pg2pyrquet.utils.transforms import parse_transform
 
 app = typer.Typer()
 logger = get_logger(name=__name__)
 
 
-DEFAULT_BATCH_SIZE = 10000
+DEFAULT_SORT_MEMORY_MB = 512
+DEFAULT_MAX_BATCH_MB = 64
+DEFAULT_TARGET_FILE_MB = 512
+DEFAULT_CLUSTER_CONCURRENCY = 4
 
 
 @app.command()
@@ -27,7 +84,42 @@ def export_database(
     port: Annotated[str, typer.Option("--port")],
     database: Annotated[str, typer.Option("--database")],
     output_path: Annotated[str, typer.Option("--folder")],
-    batch_size: int = DEFAULT_BATCH_SIZE,
+    batch_size: int | None = None,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    skip_unchanged: bool = False,
+    schemas: str | None = None,
+    include: Annotated[list[str] | None, typer.Option("--include")] = None,
+    exclude: Annotated[list[str] | None, typer.Option("--exclude")] = None,
+    relation_kind: Annotated[
+        list[RelationKind] | None, typer.Option("--relation-kind")
+    ] = None,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    max_file_mb: int | None = None,
+    dry_run: bool = False,
+    auto: bool = False,
+    fetch_mode: Annotated[
+        FetchMode, typer.Option("--fetch-mode")
+    ] = FetchMode.CURSOR,
+    max_transaction_seconds: float | None = None,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+    summary_metadata: bool = False,
 ) -> None:
     """
     Dumps all tables from the specified PostgreSQL database to Parquet files.
@@ -37,27 +129,267 @@ def export_database(
         port (str): The port of the PostgreSQL database.
         database (str): The name of the PostgreSQL database.
         output_path (str): The directory where Parquet files will be saved.
-        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        batch_size (int | None, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE, or to the planned batch size with --auto.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        skip_unchanged (bool, optional): Whether to skip tables unchanged since the previous export. Defaults to False.
+        schemas (str | None, optional): The comma-separated schemas to export the tables of. Defaults to the "public" schema.
+        include (list[str] | None, optional): Glob patterns of the tables to export. Defaults to None, for all tables.
+        exclude (list[str] | None, optional): Glob patterns of the tables to skip. Defaults to None.
+        relation_kind (list[RelationKind] | None, optional): The kinds of relations to export. Defaults to tables and views.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_mb (int | None, optional): The size in megabytes the output is rolled over to the next file at. Defaults to None, for a single file.
+        dry_run (bool, optional): Whether to print the export plan estimated by the database without exporting. Defaults to False.
+        auto (bool, optional): Whether to apply the export plan estimated by the database. Defaults to False.
+        fetch_mode (FetchMode, optional): How the rows are read, with one cursor or in pages of a key. Defaults to FetchMode.CURSOR.
+        max_transaction_seconds (float | None, optional): The duration after which the keyset mode commits its transaction. Defaults to None, to commit after every page.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+        summary_metadata (bool, optional): Whether to write the summary files of the Parquet files of the folder. Defaults to False.
     """
     dsn = get_postgres_dsn(host=host, port=port, database=database)
+    limits = ThrottleLimits(
+        max_rows_per_sec=max_rows_per_sec,
+        max_bytes_per_sec=max_bytes_per_sec,
+        adaptive=adaptive_throttle,
+    )
+    throttle = Throttle(limits=limits, dsn=dsn) if limits.enabled else None
+    collector = MetadataCollector() if summary_metadata else None
+    sink_options = SinkOptions(
+        output_format=output_format,
+        compression=compression,
+        metadata_collector=collector,
+    )
 
     validate_database_connection(dsn=dsn)
 
-    tables = get_database_tables(dsn=dsn)
+    tables = get_database_tables(
+        dsn=dsn,
+        schemas=schemas.split(",") if schemas else None,
+        relation_kinds=relation_kind,
+        include=include,
+        exclude=exclude,
+    )
     logger.info(f"Found tables to dump: {tables}")
 
     output_path = validate_output_path(output_path=output_path)
 
+    fingerprints, exported_fingerprints = {}, {}
+    if skip_unchanged:
+        fingerprints = get_table_fingerprints(dsn=dsn)
+        exported_fingerprints = read_fingerprints(output_path=output_path)
+
+    extension = sink_options.output_format.extension
     for table in tables:
-        logger.info(f"Starting to dump table: {table}")
+        output_file = output_path / f"{table}{extension}"
+        fingerprint = fingerprints.get(table)
+
+        if (
+            fingerprint is not None
+            and exported_fingerprints.get(table) == fingerprint
+            and (
+                output_file.exists()
+                or get_rolled_file(where=output_file, index=0).exists()
+            )
+        ):
+            logger.info(
+                "Skipping unchanged table: %s", table, extra={"table": table}
+            )
+            continue
+
+        table_batch_size = batch_size or DEFAULT_BATCH_SIZE
+        table_sink_options = sink_options
+        max_file_bytes = max_file_mb and max_file_mb * 1024 * 1024
+        if dry_run or auto:
+            plan = plan_table_export(
+                dsn=dsn,
+                table=table,
+                output_format=sink_options.output_format,
+                max_batch_bytes=max_batch_mb * 1024 * 1024,
+            )
+            if dry_run:
+                typer.echo(format_plan(plan=plan))
+                continue
+            logger.info(f"Applying export plan: {format_plan(plan=plan)}")
+            table_batch_size, table_sink_options, max_file_bytes = apply_plan(
+                plan=plan,
+                batch_size=batch_size,
+                sink_options=sink_options,
+                max_file_bytes=max_file_bytes,
+            )
+
+        table_fetch_mode, keyset_columns = fetch_mode, []
+        if fetch_mode == FetchMode.KEYSET:
+            keyset_columns = get_primary_key_columns(dsn=dsn, table=table)
+            if not keyset_columns:
+                logger.warning(
+                    "Table %s has no primary key, reading it with a cursor",
+                    table,
+                    extra={"table": table},
+                )
+                table_fetch_mode = FetchMode.CURSOR
+
+        logger.info(
+            "Starting to dump table: %s", table, extra={"table": table}
+        )
         query = get_default_query(table=table)
         export_to_parquet(
             dsn=dsn,
-            output_file=output_path / f"{table}.parquet",
-            batch_size=batch_size,
+            output_file=output_file,
+            batch_size=table_batch_size,
             query=query,
+            sink_options=table_sink_options,
+            max_batch_bytes=max_batch_mb * 1024 * 1024,
+            large_values=large_values,
+            verify=verify,
+            verify_text_hash=verify_text_hash,
+            max_file_bytes=max_file_bytes,
+            fetch_mode=table_fetch_mode,
+            keyset_columns=keyset_columns,
+            unique_keyset=True,
+            max_transaction_seconds=max_transaction_seconds,
+            throttle=throttle,
         )
 
+        if fingerprint is not None:
+            exported_fingerprints[table] = fingerprint
+            write_fingerprints(
+                output_path=output_path, fingerprints=exported_fingerprints
+            )
+
+    if dry_run:
+        return
+    if summary_metadata:
+        write_dataset_summary(folder=output_path, collector=collector)
+    else:
+        remove_dataset_summary(folder=output_path)
+
+
+@app.command()
+def export_cluster(
+    host: Annotated[str, typer.Option("--host")],
+    port: Annotated[str, typer.Option("--port")],
+    output_path: Annotated[str, typer.Option("--folder")],
+    maintenance_database: str = "postgres",
+    exclude_database: Annotated[
+        list[str] | None, typer.Option("--exclude-database")
+    ] = None,
+    schemas: str | None = None,
+    include: Annotated[list[str] | None, typer.Option("--include")] = None,
+    exclude: Annotated[list[str] | None, typer.Option("--exclude")] = None,
+    relation_kind: Annotated[
+        list[RelationKind] | None, typer.Option("--relation-kind")
+    ] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    max_file_mb: int | None = None,
+    max_concurrency: int = DEFAULT_CLUSTER_CONCURRENCY,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+) -> None:
+    """
+    Dumps the tables of every database of the PostgreSQL instance, one folder per database.
+
+    Args:
+        host (str): The host of the PostgreSQL instance.
+        port (str): The port of the PostgreSQL instance.
+        output_path (str): The directory where the database folders will be created.
+        maintenance_database (str, optional): The database the list of databases is read from. Defaults to "postgres".
+        exclude_database (list[str] | None, optional): Glob patterns of the databases to skip. Defaults to None.
+        schemas (str | None, optional): The comma-separated schemas to export the tables of. Defaults to the "public" schema.
+        include (list[str] | None, optional): Glob patterns of the tables to export. Defaults to None, for all tables.
+        exclude (list[str] | None, optional): Glob patterns of the tables to skip. Defaults to None.
+        relation_kind (list[RelationKind] | None, optional): The kinds of relations to export. Defaults to tables and views.
+        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_mb (int | None, optional): The size in megabytes the output is rolled over to the next file at. Defaults to None, for a single file.
+        max_concurrency (int, optional): The number of databases exported at the same time. Defaults to DEFAULT_CLUSTER_CONCURRENCY.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second from one database. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second from one database. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+    """
+    dsn = get_postgres_dsn(
+        host=host, port=port, database=maintenance_database
+    )
+    validate_database_connection(dsn=dsn)
+    output_path = validate_output_path(output_path=output_path)
+
+    databases = [
+        database
+        for database in get_cluster_databases(dsn=dsn)
+        if not any(
+            fnmatchcase(database, pattern)
+            for pattern in exclude_database or []
+        )
+    ]
+    logger.info(f"Found databases to dump: {databases}")
+
+    jobs = []
+    for database in databases:
+        database_path = output_path / database
+        database_path.mkdir(exist_ok=True)
+        jobs.append(
+            ExportJob(
+                kind=JobKind.DATABASE,
+                database=database,
+                folder=str(database_path),
+                host=host,
+                port=port,
+                batch_size=batch_size,
+                output_format=output_format,
+                compression=compression,
+                max_batch_mb=max_batch_mb,
+                max_file_mb=max_file_mb,
+                large_values=large_values,
+                verify=verify,
+                verify_text_hash=verify_text_hash,
+                schemas=schemas.split(",") if schemas else [],
+                include=include or [],
+                exclude=exclude or [],
+                relation_kinds=relation_kind or [],
+            )
+        )
+
+    results = run_export_jobs(
+        config=JobsConfig(
+            jobs=jobs,
+            max_concurrency=max_concurrency,
+            max_concurrency_per_database=1,
+            max_rows_per_sec=max_rows_per_sec,
+            max_bytes_per_sec=max_bytes_per_sec,
+            adaptive_throttle=adaptive_throttle,
+        )
+    )
+    typer.echo(format_report(results=results))
+    if not all(result.succeeded for result in results):
+        raise typer.Exit(code=1)
+
 
 @app.command()
 def export_table(
@@ -66,8 +398,59 @@ def export_table(
     database: Annotated[str, typer.Option("--database")],
     table: Annotated[str, typer.Option("--table")],
     output_path: Annotated[str, typer.Option("--folder")],
-    output_file: str = "output.parquet",
-    batch_size: int = DEFAULT_BATCH_SIZE,
+    output_file: str | None = None,
+    batch_size: int | None = None,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    transform: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--transform",
+            help=(
+                'Column transforms, as "column=operation[:argument]". '
+                "sha256 hashes every distinct value in Python, about "
+                "1.5 microseconds per value of a column of unique values."
+            ),
+        ),
+    ] = None,
+    page_index: bool = False,
+    bloom_filter: Annotated[
+        list[str] | None, typer.Option("--bloom-filter")
+    ] = None,
+    sorting_column: Annotated[
+        list[str] | None, typer.Option("--sorting-column")
+    ] = None,
+    cluster_by: str | None = None,
+    sort_memory_mb: int = DEFAULT_SORT_MEMORY_MB,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    max_file_mb: int | None = None,
+    dry_run: bool = False,
+    auto: bool = False,
+    fetch_mode: Annotated[
+        FetchMode, typer.Option("--fetch-mode")
+    ] = FetchMode.CURSOR,
+    keyset_column: Annotated[
+        list[str] | None, typer.Option("--keyset-column")
+    ] = None,
+    max_transaction_seconds: float | None = None,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+    summary_metadata: bool = False,
 ) -> None:
     """
     Dumps the specified table from the given PostgreSQL database to a Parquet file.
@@ -78,10 +461,50 @@ def export_table(
         database (str): The name of the PostgreSQL database.
         table (str): The name of the table to dump.
         output_path (str): The directory where the Parquet file will be saved.
-        output_file (str, optional): The name of the output Parquet file. Defaults to "output.parquet".
-        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        output_file (str | None, optional): The name of the output file. Defaults to "output" with the format extension.
+        batch_size (int | None, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE, or to the planned batch size with --auto.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        transform (list[str] | None, optional): Column transforms, as "column=operation[:argument]". Defaults to None.
+        page_index (bool, optional): Whether to write the Parquet page index. Defaults to False.
+        bloom_filter (list[str] | None, optional): Columns to write Parquet bloom filters for, as "column[:ndv]". Defaults to None.
+        sorting_column (list[str] | None, optional): Columns the export is ordered by, as "column[:asc|desc]". Defaults to None.
+        cluster_by (str | None, optional): The column to sort the output by. Defaults to None.
+        sort_memory_mb (int, optional): The memory in megabytes used by the client-side sort before spilling to disk. Defaults to DEFAULT_SORT_MEMORY_MB.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_mb (int | None, optional): The size in megabytes the output is rolled over to the next file at. Defaults to None, for a single file.
+        dry_run (bool, optional): Whether to print the export plan estimated by the database without exporting. Defaults to False.
+        auto (bool, optional): Whether to apply the export plan estimated by the database. Defaults to False.
+        fetch_mode (FetchMode, optional): How the rows are read, with one cursor or in pages of a key. Defaults to FetchMode.CURSOR.
+        keyset_column (list[str] | None, optional): The columns of the unique key the keyset mode pages by. Defaults to the primary key.
+        max_transaction_seconds (float | None, optional): The duration after which the keyset mode commits its transaction. Defaults to None, to commit after every page.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+        summary_metadata (bool, optional): Whether to write the summary files of the Parquet files of the folder. Defaults to False.
     """
     dsn = get_postgres_dsn(host=host, port=port, database=database)
+    limits = ThrottleLimits(
+        max_rows_per_sec=max_rows_per_sec,
+        max_bytes_per_sec=max_bytes_per_sec,
+        adaptive=adaptive_throttle,
+    )
+    throttle = Throttle(limits=limits, dsn=dsn) if limits.enabled else None
+    transforms = [parse_transform(spec=spec) for spec in transform or []]
+    if cluster_by and not sorting_column:
+        sorting_column = [cluster_by]
+    collector = MetadataCollector() if summary_metadata else None
+    sink_options = SinkOptions(
+        output_format=output_format,
+        compression=compression,
+        write_page_index=page_index,
+        bloom_filter_columns=bloom_filter or [],
+        sorting_columns=sorting_column or [],
+        metadata_collector=collector,
+    )
 
     validate_database_connection(dsn=dsn)
 
@@ -89,15 +512,68 @@ def export_table(
     output_path = validate_output_path(output_path=output_path)
 
     query = get_default_query(table=table)
+    sort_by = cluster_by
+    unique_keyset = False
+    if fetch_mode == FetchMode.KEYSET:
+        primary_key = get_primary_key_columns(dsn=dsn, table=table)
+        keyset_column = keyset_column or primary_key
+        unique_keyset = keyset_column == primary_key
+    elif cluster_by and check_column_indexed(
+        dsn=dsn, table=table, column=cluster_by
+    ):
+        logger.info(f"Ordering on the server by indexed column: {cluster_by}")
+        query = get_ordered_query(table=table, column=cluster_by)
+        sort_by = None
+    extension = sink_options.output_format.extension
+    output_file = output_file or f"output{extension}"
+
+    max_file_bytes = max_file_mb and max_file_mb * 1024 * 1024
+    if dry_run or auto:
+        plan = plan_table_export(
+            dsn=dsn,
+            table=table,
+            output_format=sink_options.output_format,
+            max_batch_bytes=max_batch_mb * 1024 * 1024,
+        )
+        if dry_run:
+            typer.echo(format_plan(plan=plan))
+            return
+        logger.info(f"Applying export plan: {format_plan(plan=plan)}")
+        batch_size, sink_options, max_file_bytes = apply_plan(
+            plan=plan,
+            batch_size=batch_size,
+            sink_options=sink_options,
+            max_file_bytes=max_file_bytes,
+        )
 
-    logger.info(f"Starting to dump table: {table}")
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    logger.info("Starting to dump table: %s", table, extra={"table": table})
     export_to_parquet(
         dsn=dsn,
         output_file=output_path / output_file,
         batch_size=batch_size,
         query=query,
+        sink_options=sink_options,
+        sort_by=sort_by,
+        sort_memory_limit=sort_memory_mb * 1024 * 1024,
+        max_batch_bytes=max_batch_mb * 1024 * 1024,
+        large_values=large_values,
+        transforms=transforms,
+        verify=verify,
+        verify_text_hash=verify_text_hash,
+        max_file_bytes=max_file_bytes,
+        fetch_mode=fetch_mode,
+        keyset_columns=keyset_column,
+        unique_keyset=unique_keyset,
+        max_transaction_seconds=max_transaction_seconds,
+        throttle=throttle,
     )
 
+    if summary_metadata:
+        write_dataset_summary(folder=output_path, collector=collector)
+    else:
+        remove_dataset_summary(folder=output_path)
+
 
 @app.command()
 def export_query(
@@ -106,8 +582,64 @@ def export_query(
     database: Annotated[str, typer.Option("--database")],
     query_file: Annotated[str, typer.Option("--query-file")],
     output_path: Annotated[str, typer.Option("--folder")],
-    output_file: str = "custom-query.parquet",
-    batch_size: int = DEFAULT_BATCH_SIZE,
+    output_file: str | None = None,
+    batch_size: int | None = None,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    transform: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--transform",
+            help=(
+                'Column transforms, as "column=operation[:argument]". '
+                "sha256 hashes every distinct value in Python, about "
+                "1.5 microseconds per value of a column of unique values."
+            ),
+        ),
+    ] = None,
+    page_index: bool = False,
+    bloom_filter: Annotated[
+        list[str] | None, typer.Option("--bloom-filter")
+    ] = None,
+    sorting_column: Annotated[
+        list[str] | None, typer.Option("--sorting-column")
+    ] = None,
+    cluster_by: str | None = None,
+    sort_memory_mb: int = DEFAULT_SORT_MEMORY_MB,
+    partition_column: str | None = None,
+    partitions: int = 1,
+    lower_bound: str | None = None,
+    upper_bound: str | None = None,
+    merge_partitions: bool = False,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    max_file_mb: int | None = None,
+    dry_run: bool = False,
+    auto: bool = False,
+    fetch_mode: Annotated[
+        FetchMode, typer.Option("--fetch-mode")
+    ] = FetchMode.CURSOR,
+    keyset_column: Annotated[
+        list[str] | None, typer.Option("--keyset-column")
+    ] = None,
+    max_transaction_seconds: float | None = None,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+    summary_metadata: bool = False,
 ) -> None:
     """
     Dumps the specified custom query from the given PostgreSQL database to a Parquet file.
@@ -118,25 +650,571 @@ def export_query(
         database (str): The name of the PostgreSQL database.
         query_file (str): The path of the file with SQL query.
         output_path (str): The directory where the Parquet file will be saved.
-        output_file (str, optional): The name of the output Parquet file. Defaults to "output.parquet".
-        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        output_file (str | None, optional): The name of the output file. Defaults to "custom-query" with the format extension.
+        batch_size (int | None, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE, or to the planned batch size with --auto.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        transform (list[str] | None, optional): Column transforms, as "column=operation[:argument]". Defaults to None.
+        page_index (bool, optional): Whether to write the Parquet page index. Defaults to False.
+        bloom_filter (list[str] | None, optional): Columns to write Parquet bloom filters for, as "column[:ndv]". Defaults to None.
+        sorting_column (list[str] | None, optional): Columns the export is ordered by, as "column[:asc|desc]". Defaults to None.
+        cluster_by (str | None, optional): The column to sort the output by. Defaults to None.
+        sort_memory_mb (int, optional): The memory in megabytes used by the client-side sort before spilling to disk. Defaults to DEFAULT_SORT_MEMORY_MB.
+        partition_column (str | None, optional): The column of the query result to split the query by. Defaults to None.
+        partitions (int, optional): The number of ranges of the partition column exported in parallel. Defaults to 1.
+        lower_bound (str | None, optional): The lower bound of the partition column, converted to the column type by the server, queried if None. Defaults to None.
+        upper_bound (str | None, optional): The upper bound of the partition column, converted to the column type by the server, queried if None. Defaults to None.
+        merge_partitions (bool, optional): Whether to merge the part files into the output file. Defaults to False.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_mb (int | None, optional): The size in megabytes the output is rolled over to the next file at. Defaults to None, for a single file.
+        dry_run (bool, optional): Whether to print the export plan estimated by the database without exporting. Defaults to False.
+        auto (bool, optional): Whether to apply the export plan estimated by the database. Defaults to False.
+        fetch_mode (FetchMode, optional): How the rows are read, with one cursor or in pages of a key. Defaults to FetchMode.CURSOR.
+        keyset_column (list[str] | None, optional): The columns of the unique key of the query result the keyset mode pages by. Defaults to None.
+        max_transaction_seconds (float | None, optional): The duration after which the keyset mode commits its transaction. Defaults to None, to commit after every page.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+        summary_metadata (bool, optional): Whether to write the summary files of the Parquet files of the folder. Defaults to False.
     """
     dsn = get_postgres_dsn(host=host, port=port, database=database)
+    limits = ThrottleLimits(
+        max_rows_per_sec=max_rows_per_sec,
+        max_bytes_per_sec=max_bytes_per_sec,
+        adaptive=adaptive_throttle,
+    )
+    throttle = Throttle(limits=limits, dsn=dsn) if limits.enabled else None
+    transforms = [parse_transform(spec=spec) for spec in transform or []]
+    if cluster_by and not sorting_column:
+        sorting_column = [cluster_by]
+    collector = MetadataCollector() if summary_metadata else None
+    sink_options = SinkOptions(
+        output_format=output_format,
+        compression=compression,
+        write_page_index=page_index,
+        bloom_filter_columns=bloom_filter or [],
+        sorting_columns=sorting_column or [],
+        metadata_collector=collector,
+    )
 
     validate_database_connection(dsn=dsn)
     output_path = validate_output_path(output_path=output_path)
     query_path = validate_query_path(query_path=query_file)
 
     query = read_query_from_file(query_path=query_path)
+    extension = sink_options.output_format.extension
+    output_file = output_file or f"custom-query{extension}"
+    sort_by = cluster_by
+
+    max_file_bytes = max_file_mb and max_file_mb * 1024 * 1024
+    if dry_run or auto:
+        plan = plan_query_export(
+            dsn=dsn,
+            name=output_file,
+            query=query,
+            output_format=sink_options.output_format,
+            parallel=partition_column is not None,
+            max_batch_bytes=max_batch_mb * 1024 * 1024,
+        )
+        if dry_run:
+            typer.echo(format_plan(plan=plan))
+            return
+        logger.info(f"Applying export plan: {format_plan(plan=plan)}")
+        batch_size, sink_options, max_file_bytes = apply_plan(
+            plan=plan,
+            batch_size=batch_size,
+            sink_options=sink_options,
+            max_file_bytes=max_file_bytes,
+        )
+        if partitions == 1:
+            partitions = plan.workers
 
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
     logger.info(f"Starting to dump custom query: {query}")
-    export_to_parquet(
+    if partition_column and partitions > 1:
+        if fetch_mode == FetchMode.KEYSET:
+            logger.warning("Partitioned exports read with a cursor per range")
+        export_query_partitions(
+            dsn=dsn,
+            output_file=output_path / output_file,
+            batch_size=batch_size,
+            query=query,
+            partition_column=partition_column,
+            partitions=partitions,
+            lower_bound=lower_bound,
+            upper_bound=upper_bound,
+            merge=merge_partitions,
+            sink_options=sink_options,
+            sort_by=sort_by,
+            sort_memory_limit=sort_memory_mb * 1024 * 1024,
+            max_batch_bytes=max_batch_mb * 1024 * 1024,
+            large_values=large_values,
+            transforms=transforms,
+            verify=verify,
+            verify_text_hash=verify_text_hash,
+            max_file_bytes=max_file_bytes,
+            throttle=throttle,
+        )
+    else:
+        export_to_parquet(
+            dsn=dsn,
+            output_file=output_path / output_file,
+            batch_size=batch_size,
+            query=query,
+            sink_options=sink_options,
+            sort_by=sort_by,
+            sort_memory_limit=sort_memory_mb * 1024 * 1024,
+            max_batch_bytes=max_batch_mb * 1024 * 1024,
+            large_values=large_values,
+            transforms=transforms,
+            verify=verify,
+            verify_text_hash=verify_text_hash,
+            max_file_bytes=max_file_bytes,
+            fetch_mode=fetch_mode,
+            keyset_columns=keyset_column,
+            max_transaction_seconds=max_transaction_seconds,
+            throttle=throttle,
+        )
+
+    if summary_metadata:
+        write_dataset_summary(folder=output_path, collector=collector)
+    else:
+        remove_dataset_summary(folder=output_path)
+
+
+@app.command()
+def export_queries(
+    host: Annotated[str, typer.Option("--host")],
+    port: Annotated[str, typer.Option("--port")],
+    database: Annotated[str, typer.Option("--database")],
+    query_path: Annotated[str, typer.Option("--query-path")],
+    output_path: Annotated[str, typer.Option("--folder")],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    max_file_mb: int | None = None,
+    consistent: bool = False,
+    parallel: int = 1,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+    summary_metadata: bool = False,
+) -> None:
+    """
+    Dumps the named queries of a query file, or of a folder of query files, each to its own file.
+
+    Args:
+        host (str): The host of the PostgreSQL database.
+        port (str): The port of the PostgreSQL database.
+        database (str): The name of the PostgreSQL database.
+        query_path (str): The path of the query file, or of a folder of ".sql" files.
+        output_path (str): The directory where the files will be saved, named after the queries.
+        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_mb (int | None, optional): The size in megabytes the output is rolled over to the next file at. Defaults to None, for a single file.
+        consistent (bool, optional): Whether all the queries read one REPEATABLE READ snapshot. Defaults to False.
+        parallel (int, optional): The number of queries exported at the same time. Defaults to 1.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+        summary_metadata (bool, optional): Whether to write the summary files of the Parquet files of the folder. Defaults to False.
+    """
+    dsn = get_postgres_dsn(host=host, port=port, database=database)
+    limits = ThrottleLimits(
+        max_rows_per_sec=max_rows_per_sec,
+        max_bytes_per_sec=max_bytes_per_sec,
+        adaptive=adaptive_throttle,
+    )
+    throttle = Throttle(limits=limits, dsn=dsn) if limits.enabled else None
+    collector = MetadataCollector() if summary_metadata else None
+    sink_options = SinkOptions(
+        output_format=output_format,
+        compression=compression,
+        metadata_collector=collector,
+    )
+
+    validate_database_connection(dsn=dsn)
+    output_path = validate_output_path(output_path=output_path)
+    queries_path = Path(query_path)
+    if not queries_path.is_dir():
+        queries_path = validate_query_path(query_path=queries_path)
+    queries = read_named_queries(query_path=queries_path)
+    logger.info(f"Found queries to dump: {list(queries)}")
+
+    export_named_queries(
         dsn=dsn,
-        output_file=output_path / output_file,
+        queries=queries,
+        output_path=output_path,
         batch_size=batch_size,
-        query=query,
+        sink_options=sink_options,
+        consistent=consistent,
+        parallel=parallel,
+        max_batch_bytes=max_batch_mb * 1024 * 1024,
+        large_values=large_values,
+        verify=verify,
+        verify_text_hash=verify_text_hash,
+        max_file_bytes=max_file_mb and max_file_mb * 1024 * 1024,
+        throttle=throttle,
+    )
+
+    if summary_metadata:
+        write_dataset_summary(folder=output_path, collector=collector)
+    else:
+        remove_dataset_summary(folder=output_path)
+
+
+@app.command()
+def export_stream(
+    host: Annotated[str, typer.Option("--host")],
+    port: Annotated[str, typer.Option("--port")],
+    database: Annotated[str, typer.Option("--database")],
+    output_path: Annotated[str, typer.Option("--folder")],
+    table: Annotated[list[str], typer.Option("--table")],
+    slot: Annotated[str, typer.Option("--slot")],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+    initial_snapshot: bool = True,
+    max_changes: int = DEFAULT_MAX_CHANGES,
+    flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+    max_batches: int | None = None,
+) -> None:
+    """
+    Streams the changes of tables from a logical replication slot to micro-batch files.
+
+    Args:
+        host (str): The host of the PostgreSQL database.
+        port (str): The port of the PostgreSQL database.
+        database (str): The name of the PostgreSQL database.
+        output_path (str): The directory with a folder of files per table.
+        table (list[str]): The names of the streamed tables.
+        slot (str): The name of the replication slot, created with an initial snapshot if it does not exist.
+        batch_size (int, optional): The number of rows to process in each batch of the initial snapshot. Defaults to DEFAULT_BATCH_SIZE.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+        initial_snapshot (bool, optional): Whether to export the tables when the slot is created, and to require their complete snapshot when resuming. Defaults to True.
+        max_changes (int, optional): The number of changes written at once. Defaults to DEFAULT_MAX_CHANGES.
+        flush_seconds (float, optional): The interval between micro-batches in seconds. Defaults to DEFAULT_FLUSH_SECONDS.
+        max_batches (int | None, optional): The number of micro-batches to poll before exiting. Defaults to None, to stream forever.
+    """
+    dsn = get_postgres_dsn(host=host, port=port, database=database)
+    sink_options = SinkOptions(
+        output_format=output_format, compression=compression
+    )
+
+    validate_database_connection(dsn=dsn)
+    output_path = validate_output_path(output_path=output_path)
+    tables = [validate_table_exists(dsn=dsn, table=name) for name in table]
+
+    if check_slot_exists(dsn=dsn, slot=slot):
+        if initial_snapshot:
+            validate_snapshot_complete(
+                output_path=output_path, tables=tables, slot=slot
+            )
+        logger.info(f"Resuming the stream from replication slot: {slot}")
+    else:
+        create_stream_slot(
+            dsn=dsn,
+            slot=slot,
+            tables=tables,
+            output_path=output_path,
+            batch_size=batch_size,
+            sink_options=sink_options,
+            initial_snapshot=initial_snapshot,
+        )
+
+    stream_changes(
+        dsn=dsn,
+        slot=slot,
+        tables=tables,
+        output_path=output_path,
+        sink_options=sink_options,
+        max_changes=max_changes,
+        flush_seconds=flush_seconds,
+        max_batches=max_batches,
+    )
+
+
+@app.command()
+def export_coordinator(
+    host: Annotated[str, typer.Option("--host")],
+    port: Annotated[str, typer.Option("--port")],
+    database: Annotated[str, typer.Option("--database")],
+    output_path: Annotated[str, typer.Option("--folder")],
+    table: Annotated[list[str] | None, typer.Option("--table")] = None,
+    schemas: str | None = None,
+    include: Annotated[list[str] | None, typer.Option("--include")] = None,
+    exclude: Annotated[list[str] | None, typer.Option("--exclude")] = None,
+    partitions: Annotated[
+        int,
+        typer.Option(
+            help=(
+                "The number of units every table is split into. The units "
+                "read no shared snapshot, so rows changed during the export "
+                "are read as of the time of their unit."
+            )
+        ),
+    ] = 1,
+    partition_column: Annotated[
+        str | None,
+        typer.Option(
+            help=(
+                "The column whose ranges the units read. Defaults to the "
+                "first primary key column."
+            )
+        ),
+    ] = None,
+    ctid_ranges: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Split the tables into ranges of pages instead of a column. "
+                "Rows updated onto another page during the export may be "
+                "read twice or missed."
+            )
+        ),
+    ] = False,
+    output_format: Annotated[
+        OutputFormat, typer.Option("--format")
+    ] = OutputFormat.PARQUET,
+    compression: str | None = None,
+) -> None:
+    """
+    Plans a distributed export into work units run by `export-worker` commands.
+
+    Args:
+        host (str): The host of the PostgreSQL database.
+        port (str): The port of the PostgreSQL database.
+        database (str): The name of the PostgreSQL database.
+        output_path (str): The directory shared by the workers, where the files and the work queue will be saved.
+        table (list[str] | None, optional): The tables to export. Defaults to None, for all the tables of the database.
+        schemas (str | None, optional): The comma-separated schemas to export the tables of. Defaults to the "public" schema.
+        include (list[str] | None, optional): Glob patterns of the tables to export. Defaults to None, for all tables.
+        exclude (list[str] | None, optional): Glob patterns of the tables to skip. Defaults to None.
+        partitions (int, optional): The number of units every table is split into. Defaults to 1.
+        partition_column (str | None, optional): The column whose ranges the units read. Defaults to the first primary key column.
+        ctid_ranges (bool, optional): Whether the units read ranges of the table pages instead of a column. Defaults to False.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        compression (str | None, optional): The compression codec of the output files. Defaults to the format default.
+    """
+    dsn = get_postgres_dsn(host=host, port=port, database=database)
+    sink_options = SinkOptions(
+        output_format=output_format, compression=compression
+    )
+
+    validate_database_connection(dsn=dsn)
+    output_path = validate_output_path(output_path=output_path)
+    if table:
+        tables = [
+            validate_table_exists(dsn=dsn, table=name) for name in table
+        ]
+    else:
+        tables = get_database_tables(
+            dsn=dsn,
+            schemas=schemas.split(",") if schemas else None,
+            include=include,
+            exclude=exclude,
+        )
+
+    units = [
+        unit
+        for name in tables
+        for unit in plan_table_units(
+            dsn=dsn,
+            table=name,
+            extension=output_format.extension,
+            partitions=partitions,
+            partition_column=partition_column,
+            ctid_ranges=ctid_ranges,
+        )
+    ]
+    manifest_path = write_queue_manifest(
+        output_path=output_path, units=units, sink_options=sink_options
+    )
+    logger.info(
+        f"Planned {len(units)} units of {len(tables)} tables in: {manifest_path}"
+    )
+
+
+@app.command()
+def export_worker(
+    host: Annotated[str, typer.Option("--host")],
+    port: Annotated[str, typer.Option("--port")],
+    database: Annotated[str, typer.Option("--database")],
+    output_path: Annotated[str, typer.Option("--folder")],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batch_mb: int = DEFAULT_MAX_BATCH_MB,
+    large_values: bool = False,
+    verify: bool = False,
+    verify_text_hash: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Hash the string columns in the verification. The file side "
+                "hashes every distinct value in Python, about 1.5 "
+                "microseconds per value of a column of unique values."
+            )
+        ),
+    ] = False,
+    worker: str | None = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    max_rows_per_sec: float | None = None,
+    max_bytes_per_sec: float | None = None,
+    adaptive_throttle: bool = False,
+) -> None:
+    """
+    Exports the work units planned by `export-coordinator` until none is left.
+
+    Args:
+        host (str): The host of the PostgreSQL database.
+        port (str): The port of the PostgreSQL database.
+        database (str): The name of the PostgreSQL database.
+        output_path (str): The directory shared by the workers, with the work queue.
+        batch_size (int, optional): The number of rows to process in each batch. Defaults to DEFAULT_BATCH_SIZE.
+        max_batch_mb (int, optional): The maximum size of a batch in megabytes. Defaults to DEFAULT_MAX_BATCH_MB.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        verify (bool, optional): Whether to verify the written files against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        worker (str | None, optional): The name of the worker in the queue. Defaults to the host name and process ID.
+        lease_seconds (float, optional): The age after which the lock of a unit is considered abandoned. Defaults to DEFAULT_LEASE_SECONDS.
+        max_attempts (int, optional): The number of attempts of a unit. Defaults to DEFAULT_MAX_ATTEMPTS.
+        poll_seconds (float, optional): The interval between scans of the queue while other workers hold units. Defaults to DEFAULT_POLL_SECONDS.
+        max_rows_per_sec (float | None, optional): The maximum number of rows read per second by the worker. Defaults to None.
+        max_bytes_per_sec (float | None, optional): The maximum number of bytes read per second by the worker. Defaults to None.
+        adaptive_throttle (bool, optional): Whether to slow down while the server is loaded. Defaults to False.
+    """
+    dsn = get_postgres_dsn(host=host, port=port, database=database)
+    limits = ThrottleLimits(
+        max_rows_per_sec=max_rows_per_sec,
+        max_bytes_per_sec=max_bytes_per_sec,
+        adaptive=adaptive_throttle,
     )
 
+    validate_database_connection(dsn=dsn)
+    status = run_worker(
+        dsn=dsn,
+        output_path=validate_output_path(output_path=output_path),
+        batch_size=batch_size,
+        worker=worker,
+        lease_seconds=lease_seconds,
+        max_attempts=max_attempts,
+        poll_seconds=poll_seconds,
+        max_batch_bytes=max_batch_mb * 1024 * 1024,
+        large_values=large_values,
+        verify=verify,
+        verify_text_hash=verify_text_hash,
+        throttle=Throttle(limits=limits, dsn=dsn) if limits.enabled else None,
+    )
+    if status[UnitState.FAILED]:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def compact(
+    output_path: Annotated[str, typer.Option("--folder")],
+    pattern: str = "*.parquet",
+    target_file_mb: int = DEFAULT_TARGET_FILE_MB,
+    output_prefix: str = "compacted",
+    compression: str | None = None,
+    page_index: bool = False,
+    bloom_filter: Annotated[
+        list[str] | None, typer.Option("--bloom-filter")
+    ] = None,
+    sorting_column: Annotated[
+        list[str] | None, typer.Option("--sorting-column")
+    ] = None,
+    sort_by: str | None = None,
+    sort_memory_mb: int = DEFAULT_SORT_MEMORY_MB,
+    summary_metadata: bool = False,
+) -> None:
+    """
+    Merges the Parquet files of a folder into files of a target size.
+
+    Args:
+        output_path (str): The directory with the Parquet files.
+        pattern (str, optional): The glob pattern of the files to compact. Defaults to "*.parquet".
+        target_file_mb (int, optional): The size of the compacted files in megabytes. Defaults to DEFAULT_TARGET_FILE_MB.
+        output_prefix (str, optional): The prefix of the compacted file names. Defaults to "compacted".
+        compression (str | None, optional): The compression codec of the compacted files. Defaults to "snappy".
+        page_index (bool, optional): Whether to write the Parquet page index. Defaults to False.
+        bloom_filter (list[str] | None, optional): Columns to write Parquet bloom filters for, as "column[:ndv]". Defaults to None.
+        sorting_column (list[str] | None, optional): Columns the files are ordered by, as "column[:asc|desc]". Defaults to None.
+        sort_by (str | None, optional): The column to re-sort the rows by. Defaults to None.
+        sort_memory_mb (int, optional): The memory in megabytes used by the sort before spilling to disk. Defaults to DEFAULT_SORT_MEMORY_MB.
+        summary_metadata (bool, optional): Whether to write the summary files of the Parquet files of the folder. Defaults to False.
+    """
+    if sort_by and not sorting_column:
+        sorting_column = [sort_by]
+    sink_options = SinkOptions(
+        compression=compression,
+        write_page_index=page_index,
+        bloom_filter_columns=bloom_filter or [],
+        sorting_columns=sorting_column or [],
+    )
+
+    folder = validate_output_path(output_path=output_path)
+
+    compact_folder(
+        folder=folder,
+        pattern=pattern,
+        target_file_bytes=target_file_mb * 1024 * 1024,
+        output_prefix=output_prefix,
+        sink_options=sink_options,
+        sort_by=sort_by,
+        sort_memory_limit=sort_memory_mb * 1024 * 1024,
+    )
+
+    if summary_metadata:
+        write_dataset_summary(folder=folder)
+    else:
+        remove_dataset_summary(folder=folder)
+
+
+@app.command()
+def run_jobs(
+    config_file: Annotated[str, typer.Argument(help="The YAML jobs file.")]
+) -> None:
+    """
+    Runs the exports described in a YAML file in one process.
+
+    Args:
+        config_file (str): The path of the YAML file with the jobs.
+    """
+    config = load_jobs_config(path=Path(config_file))
+    logger.info(f"Running {len(config.jobs)} jobs from: {config_file}")
+
+    results = run_export_jobs(config=config)
+    typer.echo(format_report(results=results))
+    if not all(result.succeeded for result in results):
+        raise typer.Exit(code=1)
+
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+from pyarrow import RecordBatch
+
+from pg2pyrquet.core.exceptions import SchemaMismatchError
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.sinks import (
+    OutputFormat,
+    RollingSink,
+    SinkOptions,
+    read_batches,
+    read_schema,
+)
+from pg2pyrquet.utils.sort import DEFAULT_SORT_MEMORY_LIMIT, ExternalSortSink
+from pg2pyrquet.utils.summary import remove_dataset_summary
+
+logger = get_logger(name=__name__)
+
+# Size of the compacted files
+DEFAULT_TARGET_FILE_BYTES = 512 * 1024 * 1024
+
+# Uncompressed size of the row groups in the compacted files
+DEFAULT_ROW_GROUP_BYTES = 128 * 1024 * 1024
+
+
+def coalesce_batches(
+    batches: Iterable[RecordBatch], max_batch_bytes: int
+) -> Iterator[RecordBatch]:
+    """
+    Concatenates consecutive small record batches up to a size limit.
+
+    Args:
+        batches (Iterable[RecordBatch]): The record batches to coalesce.
+        max_batch_bytes (int): The size of the coalesced batches in bytes.
+
+    Yields:
+        RecordBatch: The coalesced record batches.
+    """
+    pending: list[RecordBatch] = []
+    pending_bytes = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_bytes += batch.nbytes
+        if pending_bytes >= max_batch_bytes:
+            yield pa.concat_batches(pending)
+            pending, pending_bytes = [], 0
+
+    if pending:
+        yield pa.concat_batches(pending)
+
+
+def read_folder_batches(files: list[Path]) -> Iterator[RecordBatch]:
+    """
+    Streams the record batches of the Parquet files one row group at a time.
+
+    Args:
+        files (list[Path]): The paths to the Parquet files.
+
+    Yields:
+        RecordBatch: The record batches of the files, in order.
+    """
+    for path in files:
+        logger.info(f"Compacting file: {path}")
+        yield from read_batches(
+            where=path, output_format=OutputFormat.PARQUET
+        )
+
+
+def find_compaction_files(folder: Path, pattern: str) -> list[Path]:
+    """
+    Lists the Parquet files of a folder to compact.
+
+    Hidden files and summary files starting with an underscore are skipped.
+
+    Args:
+        folder (Path): The folder with the Parquet files.
+        pattern (str): The glob pattern of the file names.
+
+    Returns:
+        list[Path]: The sorted paths of the files to compact.
+    """
+    return sorted(
+        path
+        for path in folder.glob(pattern)
+        if path.is_file() and not path.name.startswith(("_", "."))
+    )
+
+
+def compact_folder(
+    folder: Path,
+    pattern: str = "*.parquet",
+    target_file_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+    output_prefix: str = "compacted",
+    row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES,
+    sink_options: SinkOptions | None = None,
+    sort_by: str | None = None,
+    sort_memory_limit: int = DEFAULT_SORT_MEMORY_LIMIT,
+) -> list[Path]:
+    """
+    Merges the Parquet files of a folder into files of a target size.
+
+    Files are streamed one row group at a time and small row groups are
+    coalesced, so no file is loaded into memory as a whole. The compacted
+    files are written to a staging folder, moved into place one atomic rename
+    at a time, and only then the original files are removed. Readers never
+    miss any rows, but a reader listing the folder between the renames and the
+    removals briefly sees the rows twice.
+
+    Inputs without any rows are compacted into one empty file, so the folder
+    keeps their schema.
+
+    The compacted file names carry a run identifier, so they never replace a
+    compacted file of an earlier run, even one being compacted again.
+
+    Args:
+        folder (Path): The folder with the Parquet files.
+        pattern (str, optional): The glob pattern of the files to compact. Defaults to "*.parquet".
+        target_file_bytes (int, optional): The size of the compacted files. Defaults to DEFAULT_TARGET_FILE_BYTES.
+        output_prefix (str, optional): The prefix of the compacted file names. Defaults to "compacted".
+        row_group_bytes (int, optional): The uncompressed size of the compacted row groups. Defaults to DEFAULT_ROW_GROUP_BYTES.
+        sink_options (SinkOptions | None, optional): The Parquet writer settings. Defaults to SinkOptions().
+        sort_by (str | None, optional): The column to re-sort the rows by. Defaults to None.
+        sort_memory_limit (int, optional): The bytes buffered before a sorted run is spilled to disk. Defaults to DEFAULT_SORT_MEMORY_LIMIT.
+
+    Returns:
+        list[Path]: The compacted files.
+
+    Raises:
+        SchemaMismatchError: If the files do not share one schema.
+    """
+    sink_options = replace(
+        sink_options or SinkOptions(), output_format=OutputFormat.PARQUET
+    )
+
+    files = find_compaction_files(folder=folder, pattern=pattern)
+    if not files or (len(files) < 2 and not sort_by):
+        logger.info(f"Nothing to compact in folder: {folder}")
+        return files
+
+    schema = read_schema(where=files[0], output_format=OutputFormat.PARQUET)
+    for path in files[1:]:
+        if not read_schema(
+            where=path, output_format=OutputFormat.PARQUET
+        ).equals(schema):
+            raise SchemaMismatchError(
+                f"File '{path}' has a different schema than '{files[0]}'."
+            )
+
+    run_name = (
+        f"{output_prefix}-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        f"-{uuid.uuid4().hex[:8]}"
+    )
+    staging_path = Path(tempfile.mkdtemp(prefix=".compacting-", dir=folder))
+    try:
+        sink = RollingSink(
+            get_path=lambda index: staging_path
+            / f"{run_name}-{index:05d}.parquet",
+            schema=schema,
+            options=sink_options,
+            max_file_bytes=target_file_bytes,
+        )
+        writer = sink
+        if sort_by:
+            writer = ExternalSortSink(
+                sink=sink,
+                schema=schema,
+                key=sort_by,
+                temp_dir=staging_path,
+                memory_limit=sort_memory_limit,
+            )
+
+        with writer:
+            for batch in coalesce_batches(
+                batches=read_folder_batches(files=files),
+                max_batch_bytes=row_group_bytes,
+            ):
+                writer.write_batch(batch)
+
+        compacted_files = [folder / path.name for path in sink.files]
+        if set(compacted_files) & set(files):
+            raise FileExistsError(
+                f"Compacted files would replace input files in: {folder}"
+            )
+        for staged_file, compacted_file in zip(sink.files, compacted_files):
+            os.replace(staged_file, compacted_file)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    for path in files:
+        if path not in compacted_files:
+            path.unlink()
+    # The summary files of the folder point at the removed files
+    remove_dataset_summary(folder=folder)
+
+    logger.info(
+        f"Compacted {len(files)} files into {len(compacted_files)} files."
+    )
+    return compacted_files
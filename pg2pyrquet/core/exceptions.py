@@ -44,3 +44,63 @@ class InvalidQueryError(Exception):
     """
     Raised when an invalid query is provided.
     """
+
+
+class UnsupportedCompressionError(Exception):
+    """
+    Raised when a compression codec is not supported by the output format.
+    """
+
+
+class InvalidColumnOptionError(Exception):
+    """
+    Raised when a per-column writer option is malformed or references an unknown column.
+    """
+
+
+class InvalidTransformError(Exception):
+    """
+    Raised when a column transform is malformed or cannot be applied.
+    """
+
+
+class SchemaMismatchError(Exception):
+    """
+    Raised when files expected to share a schema have different schemas.
+    """
+
+
+class VerificationError(Exception):
+    """
+    Raised when an exported file does not match the aggregates computed by the database.
+    """
+
+
+class InvalidJobConfigError(Exception):
+    """
+    Raised when a jobs configuration file is malformed.
+    """
+
+
+class KeysetColumnsError(Exception):
+    """
+    Raised when a keyset export has no key columns, they are not in the query result, or they hold NULL values.
+    """
+
+
+class WorkQueueError(Exception):
+    """
+    Raised when a distributed export work queue is missing or already planned.
+    """
+
+
+class IncompleteSnapshotError(Exception):
+    """
+    Raised when a change stream resumes from a slot whose initial snapshot did not complete.
+    """
+
+
+class InvalidPartitionColumnError(Exception):
+    """
+    Raised when a partition column or its bounds cannot be split into ranges.
+    """
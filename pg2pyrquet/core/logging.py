@@ -1,8 +1,19 @@
 """
 Module configuration custom logger.
+
+Loggers share one queue handler, so emitting a record only puts it on a
+queue. A single listener thread formats the records and writes them to
+stderr, as text or as JSON lines.
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 
 DEFAULT_LOGGER_NAME = "postgres-to-parquet-dumps"
@@ -12,6 +23,19 @@ LOG_DATE_FORMAT = (
     "%Y-%m-%dT%H:%M:%S"  # Corrected date format to include seconds
 )
 
+# Environment variable selecting the "text" or "json" log format
+LOG_FORMAT_ENV = "PG2PYRQUET_LOG_FORMAT"
+
+# Record attributes written as fields of the JSON log lines
+STRUCTURED_FIELDS = ("table", "file", "batch", "rows")
+
+# Minimum interval between two rate-limited records of one message, in seconds
+RATE_LIMIT_INTERVAL = 1.0
+
+_handler: QueueHandler | None = None
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+
 
 class CustomHandler(logging.StreamHandler):
     """
@@ -26,12 +50,119 @@ class CustomHandler(logging.StreamHandler):
         self.setFormatter(formatter)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter writing every record as one JSON object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, LOG_DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in STRUCTURED_FIELDS:
+            if hasattr(record, name):
+                entry[name] = getattr(record, name)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drops records marked as rate-limited that repeat a message too often.
+
+    Records are marked with `extra={"rate_limited": True}`, and at most one
+    record of every logger and message template passes per interval.
+    """
+
+    def __init__(self, interval: float = RATE_LIMIT_INTERVAL) -> None:
+        super().__init__()
+        self.interval = interval
+        self._last_emitted: dict[tuple[str, Any], float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "rate_limited", False):
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        if now - self._last_emitted.get(key, -self.interval) < self.interval:
+            return False
+        self._last_emitted[key] = now
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler leaving the formatting of the records to the listener.
+
+    The records stay in the process, so the message arguments do not need to
+    be merged into the message on the emitting thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def get_log_formatter() -> logging.Formatter:
+    """
+    Creates the formatter selected by the PG2PYRQUET_LOG_FORMAT variable.
+
+    Returns:
+        logging.Formatter: The JSON formatter for "json", the text one otherwise.
+    """
+    if os.getenv(LOG_FORMAT_ENV, "text").lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(fmt=LOG_MESSAGE_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+
+def get_queue_handler() -> QueueHandler:
+    """
+    Returns the shared queue handler, starting its listener on first use.
+
+    Returns:
+        QueueHandler: The handler putting the records on the log queue.
+    """
+    global _handler, _listener
+
+    with _lock:
+        if _handler is None:
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            stream_handler = CustomHandler()
+            stream_handler.setFormatter(get_log_formatter())
+
+            _handler = DeferredQueueHandler(log_queue)
+            _handler.addFilter(RateLimitFilter())
+            _listener = QueueListener(log_queue, stream_handler)
+            _listener.start()
+            atexit.register(stop_logging)
+        return _handler
+
+
+def stop_logging() -> None:
+    """
+    Stops the listener after it writes all the queued records.
+    """
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
 def get_logger(
     name: str = DEFAULT_LOGGER_NAME, level: int = logging.INFO
 ) -> logging.Logger:
     """
     Configures and returns a logger with the specified name and logging level.
 
+    The shared queue handler is added to a logger only once, however many
+    times the logger is requested.
+
     Args:
         name (str): The name of the logger. Defaults to DEFAULT_LOGGER_NAME.
         level (int): The logging level. Defaults to logging.INFO.
@@ -41,5 +172,7 @@ def get_logger(
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(CustomHandler())
+    handler = get_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     return logger
@@ -0,0 +1,592 @@
+"""
+Distributed export over a work queue in a shared directory.
+
+A coordinator splits a table or database export into work units, one per
+table or per key or page range of a large table, and writes them to a
+manifest in the queue directory of the output folder. Workers on any host
+mounting the folder claim units by exclusively creating lock files, export
+them and record their completion.
+
+Every claim is a numbered attempt of a unit. Workers refresh the lock of
+their attempt while exporting it, so the units of a crashed worker are
+claimed again once their lock is older than the lease, and units whose
+export failed are retried up to a number of attempts:
+
+    _queue/manifest.json            the units and the output format
+    _queue/<unit>.<attempt>.lock    the claim of an attempt by a worker
+    _queue/<unit>.<attempt>.failed  the error of a failed attempt
+    _queue/<unit>.done              the files written by the unit
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from pg2pyrquet.core.exceptions import (
+    InvalidPartitionColumnError,
+    WorkQueueError,
+)
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import export_to_parquet
+from pg2pyrquet.parallel import get_part_file
+from pg2pyrquet.utils.postgres import (
+    get_ctid_partition_queries,
+    get_default_query,
+    get_partition_boundaries,
+    get_partition_queries,
+    get_primary_key_columns,
+    get_query_column_range,
+    get_table_pages,
+)
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+
+logger = get_logger(name=__name__)
+
+# Directory of the work queue inside the output folder
+QUEUE_DIRECTORY_NAME = "_queue"
+
+# File listing the work units of the queue
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Age after which the lock of a unit is considered abandoned, in seconds
+DEFAULT_LEASE_SECONDS = 300.0
+
+# Number of attempts of a unit before it is left failed
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Interval between two scans of the queue while other workers hold units
+DEFAULT_POLL_SECONDS = 10.0
+
+
+class UnitState(str, Enum):
+    """
+    States of a work unit in the queue.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    DONE = "done"
+
+
+@dataclass
+class WorkUnit:
+    """
+    One export of a distributed export.
+
+    Attributes:
+        name (str): The unique name of the unit, naming its queue files.
+        table (str): The table the unit reads.
+        query (str): The query exporting the rows of the unit.
+        output_file (str): The path of the output file, relative to the
+            output folder.
+    """
+
+    name: str
+    table: str
+    query: str
+    output_file: str
+
+
+def get_queue_path(output_path: Path) -> Path:
+    """
+    Generates the path of the work queue of an output folder.
+
+    Args:
+        output_path (Path): The output folder of the distributed export.
+
+    Returns:
+        Path: The queue directory.
+    """
+    return output_path / QUEUE_DIRECTORY_NAME
+
+
+def plan_table_units(
+    dsn: str,
+    table: str,
+    extension: str,
+    partitions: int = 1,
+    partition_column: str | None = None,
+    ctid_ranges: bool = False,
+) -> list[WorkUnit]:
+    """
+    Splits the export of a table into work units.
+
+    The units read equal-width ranges of the partition column, or of the
+    first primary key column by default. With `ctid_ranges`, they read equal
+    ranges of the pages of the table instead, which needs no index. Views,
+    empty tables and tables without a primary key of a numeric or temporal
+    type are exported by a single unit.
+
+    The units are exported in transactions of their own, so they do not read
+    one snapshot. A row changed during the export is read as of the time of
+    the unit holding it, and with page ranges a row updated onto another page
+    may be read twice or missed.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table.
+        extension (str): The extension of the output files.
+        partitions (int, optional): The number of units of the table. Defaults to 1.
+        partition_column (str | None, optional): The column whose ranges the units read. Defaults to the first primary key column.
+        ctid_ranges (bool, optional): Whether the units read ranges of pages instead of a column. Defaults to False.
+
+    Returns:
+        list[WorkUnit]: The units of the table.
+
+    Raises:
+        InvalidPartitionColumnError: If the partition column is not a numeric or temporal column.
+    """
+    query = get_default_query(table=table)
+    output_file = Path(f"{table}{extension}")
+    queries = [query]
+
+    if partitions > 1 and ctid_ranges:
+        pages = get_table_pages(dsn=dsn, table=table)
+        if pages >= partitions:
+            queries = get_ctid_partition_queries(
+                table=table,
+                boundaries=get_partition_boundaries(
+                    lower=0, upper=pages, partitions=partitions
+                ),
+            )
+    elif partitions > 1:
+        column = partition_column or next(
+            iter(get_primary_key_columns(dsn=dsn, table=table)), None
+        )
+        lower, upper = (
+            get_query_column_range(dsn=dsn, query=query, column=column)
+            if column
+            else (None, None)
+        )
+        if column and lower is not None and upper is not None:
+            try:
+                boundaries = get_partition_boundaries(
+                    lower=lower, upper=upper, partitions=partitions
+                )
+            except InvalidPartitionColumnError:
+                if partition_column:
+                    raise
+                logger.warning(
+                    f"Primary key column '{column}' of {table} cannot be "
+                    "split into ranges, exporting it in one unit"
+                )
+            else:
+                queries = get_partition_queries(
+                    query=query, column=column, boundaries=boundaries
+                )
+        elif not column:
+            logger.warning(
+                f"Table {table} has no primary key, exporting it in one unit"
+            )
+
+    if len(queries) == 1:
+        return [
+            WorkUnit(
+                name=table,
+                table=table,
+                query=query,
+                output_file=str(output_file),
+            )
+        ]
+    return [
+        WorkUnit(
+            name=f"{table}.part-{index:04d}",
+            table=table,
+            query=partition_query,
+            output_file=str(
+                get_part_file(output_file=output_file, index=index)
+            ),
+        )
+        for index, partition_query in enumerate(queries)
+    ]
+
+
+def write_queue_manifest(
+    output_path: Path, units: list[WorkUnit], sink_options: SinkOptions
+) -> Path:
+    """
+    Creates the work queue of a distributed export.
+
+    Args:
+        output_path (Path): The output folder of the distributed export.
+        units (list[WorkUnit]): The work units.
+        sink_options (SinkOptions): The output format settings of all the units.
+
+    Returns:
+        Path: The path of the manifest.
+
+    Raises:
+        WorkQueueError: If the output folder already has a work queue.
+    """
+    queue_path = get_queue_path(output_path=output_path)
+    manifest_path = queue_path / MANIFEST_FILE_NAME
+    if manifest_path.exists():
+        raise WorkQueueError(f"Work queue already exists: {queue_path}")
+
+    queue_path.mkdir(parents=True, exist_ok=True)
+    temp_path = manifest_path.with_suffix(".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(
+            {
+                "output_format": sink_options.output_format.value,
+                "compression": sink_options.compression,
+                "units": [asdict(unit) for unit in units],
+            },
+            file,
+            indent=2,
+        )
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+
+def read_queue_manifest(
+    output_path: Path,
+) -> tuple[list[WorkUnit], SinkOptions]:
+    """
+    Reads the work units of a distributed export.
+
+    Args:
+        output_path (Path): The output folder of the distributed export.
+
+    Returns:
+        tuple[list[WorkUnit], SinkOptions]: The work units and their output format settings.
+
+    Raises:
+        WorkQueueError: If the output folder has no work queue.
+    """
+    manifest_path = (
+        get_queue_path(output_path=output_path) / MANIFEST_FILE_NAME
+    )
+    if not manifest_path.exists():
+        raise WorkQueueError(f"Work queue does not exist: {manifest_path}")
+
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    sink_options = SinkOptions(
+        output_format=OutputFormat(manifest["output_format"]),
+        compression=manifest["compression"],
+    )
+    return [WorkUnit(**unit) for unit in manifest["units"]], sink_options
+
+
+def get_unit_state(
+    queue_path: Path, unit: WorkUnit, lease_seconds: float
+) -> tuple[UnitState, int]:
+    """
+    Reads the state of a work unit from its queue files.
+
+    The lock of an attempt older than the lease was abandoned by a crashed
+    worker, so the attempt is considered failed.
+
+    Args:
+        queue_path (Path): The queue directory.
+        unit (WorkUnit): The work unit.
+        lease_seconds (float): The age after which a lock is abandoned, in seconds.
+
+    Returns:
+        tuple[UnitState, int]: The state of the unit and the number of its attempts.
+    """
+    if (queue_path / f"{unit.name}.done").exists():
+        return UnitState.DONE, 0
+
+    attempts = [
+        int(path.name[len(unit.name) + 1 : -len(".lock")])
+        for path in queue_path.glob(f"{unit.name}.*.lock")
+        if path.name[len(unit.name) + 1 : -len(".lock")].isdigit()
+    ]
+    if not attempts:
+        return UnitState.PENDING, 0
+
+    attempt = max(attempts)
+    lock_path = queue_path / f"{unit.name}.{attempt}.lock"
+    if (queue_path / f"{unit.name}.{attempt}.failed").exists():
+        return UnitState.FAILED, attempt
+    try:
+        lock_age = time.time() - lock_path.stat().st_mtime
+    except FileNotFoundError:
+        return UnitState.PENDING, attempt
+    if lock_age > lease_seconds:
+        return UnitState.FAILED, attempt
+    return UnitState.RUNNING, attempt
+
+
+def claim_unit(
+    queue_path: Path, unit: WorkUnit, attempt: int, worker: str
+) -> bool:
+    """
+    Claims an attempt of a work unit by exclusively creating its lock file.
+
+    Args:
+        queue_path (Path): The queue directory.
+        unit (WorkUnit): The work unit.
+        attempt (int): The number of the attempt.
+        worker (str): The name of the claiming worker.
+
+    Returns:
+        bool: True if the worker claimed the attempt, False if another worker did.
+    """
+    lock_path = queue_path / f"{unit.name}.{attempt}.lock"
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+
+    with os.fdopen(fd, "w") as file:
+        json.dump({"worker": worker, "claimed_at": time.time()}, file)
+    return True
+
+
+@contextmanager
+def hold_lease(lock_path: Path, lease_seconds: float) -> Iterator[None]:
+    """
+    Refreshes a lock file while the context is open.
+
+    Args:
+        lock_path (Path): The lock file of the claimed attempt.
+        lease_seconds (float): The age after which a lock is abandoned, in seconds.
+    """
+    stopped = threading.Event()
+
+    def refresh() -> None:
+        while not stopped.wait(lease_seconds / 3):
+            os.utime(lock_path)
+
+    thread = threading.Thread(target=refresh, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_unit(
+    dsn: str,
+    output_path: Path,
+    unit: WorkUnit,
+    attempt: int,
+    batch_size: int,
+    sink_options: SinkOptions,
+    **export_options: Any,
+) -> list[Path]:
+    """
+    Exports a work unit.
+
+    The attempt writes a file of its own that replaces the output file when
+    complete, so an abandoned attempt finishing late never mixes its rows
+    with another attempt.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        output_path (Path): The output folder of the distributed export.
+        unit (WorkUnit): The work unit.
+        attempt (int): The number of the attempt.
+        batch_size (int): The number of rows to process in each batch.
+        sink_options (SinkOptions): The output format settings.
+        **export_options (Any): Other options passed to `export_to_parquet`.
+
+    Returns:
+        list[Path]: The written files.
+    """
+    output_file = output_path / unit.output_file
+    attempt_file = output_file.with_name(f"{output_file.name}.{attempt}.tmp")
+    export_to_parquet(
+        dsn=dsn,
+        output_file=attempt_file,
+        batch_size=batch_size,
+        query=unit.query,
+        sink_options=sink_options,
+        **export_options,
+    )
+    os.replace(attempt_file, output_file)
+    return [output_file]
+
+
+def export_unit(
+    dsn: str,
+    output_path: Path,
+    unit: WorkUnit,
+    attempt: int,
+    worker: str,
+    lease_seconds: float,
+    batch_size: int,
+    sink_options: SinkOptions,
+    **export_options: Any,
+) -> bool:
+    """
+    Exports a claimed attempt of a work unit and records its outcome.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        output_path (Path): The output folder of the distributed export.
+        unit (WorkUnit): The work unit.
+        attempt (int): The number of the claimed attempt.
+        worker (str): The name of the worker.
+        lease_seconds (float): The age after which a lock is abandoned, in seconds.
+        batch_size (int): The number of rows to process in each batch.
+        sink_options (SinkOptions): The output format settings.
+        **export_options (Any): Other options passed to `export_to_parquet`.
+
+    Returns:
+        bool: True if the unit is done, False if the attempt failed.
+    """
+    queue_path = get_queue_path(output_path=output_path)
+    logger.info(
+        f"Worker {worker} exporting unit {unit.name} (attempt {attempt})"
+    )
+    try:
+        with hold_lease(
+            lock_path=queue_path / f"{unit.name}.{attempt}.lock",
+            lease_seconds=lease_seconds,
+        ):
+            files = run_unit(
+                dsn=dsn,
+                output_path=output_path,
+                unit=unit,
+                attempt=attempt,
+                batch_size=batch_size,
+                sink_options=sink_options,
+                **export_options,
+            )
+    except Exception as e:
+        logger.error(f"Unit {unit.name} failed: {e}")
+        (queue_path / f"{unit.name}.{attempt}.failed").write_text(
+            json.dumps({"worker": worker, "error": str(e)})
+        )
+        return False
+
+    done_path = queue_path / f"{unit.name}.done"
+    temp_path = done_path.with_suffix(".tmp")
+    temp_path.write_text(
+        json.dumps(
+            {
+                "worker": worker,
+                "attempt": attempt,
+                "files": [
+                    str(path.relative_to(output_path)) for path in files
+                ],
+            }
+        )
+    )
+    os.replace(temp_path, done_path)
+    return True
+
+
+def get_queue_status(
+    output_path: Path, lease_seconds: float = DEFAULT_LEASE_SECONDS
+) -> dict[UnitState, int]:
+    """
+    Counts the work units of a distributed export by their state.
+
+    Args:
+        output_path (Path): The output folder of the distributed export.
+        lease_seconds (float, optional): The age after which a lock is abandoned, in seconds. Defaults to DEFAULT_LEASE_SECONDS.
+
+    Returns:
+        dict[UnitState, int]: The number of units in every state.
+    """
+    units, _ = read_queue_manifest(output_path=output_path)
+    queue_path = get_queue_path(output_path=output_path)
+    states = Counter(
+        get_unit_state(
+            queue_path=queue_path, unit=unit, lease_seconds=lease_seconds
+        )[0]
+        for unit in units
+    )
+    return {state: states[state] for state in UnitState}
+
+
+def run_worker(
+    dsn: str,
+    output_path: Path,
+    batch_size: int,
+    worker: str | None = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    **export_options: Any,
+) -> dict[UnitState, int]:
+    """
+    Exports the work units of a distributed export until none is left.
+
+    The worker claims every pending unit, and every failed unit with attempts
+    left. It returns once all the units are done or failed for good, waiting
+    for the units held by other workers, which may still fail or be abandoned.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        output_path (Path): The output folder of the distributed export.
+        batch_size (int): The number of rows to process in each batch.
+        worker (str | None, optional): The name of the worker. Defaults to the host name and process ID.
+        lease_seconds (float, optional): The age after which a lock is abandoned, in seconds. Defaults to DEFAULT_LEASE_SECONDS.
+        max_attempts (int, optional): The number of attempts of a unit. Defaults to DEFAULT_MAX_ATTEMPTS.
+        poll_seconds (float, optional): The interval between scans of the queue while other workers hold units. Defaults to DEFAULT_POLL_SECONDS.
+        **export_options (Any): Other options passed to `export_to_parquet`.
+
+    Returns:
+        dict[UnitState, int]: The number of units in every state.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    units, sink_options = read_queue_manifest(output_path=output_path)
+    queue_path = get_queue_path(output_path=output_path)
+
+    while True:
+        waiting = False
+        for unit in units:
+            state, attempts = get_unit_state(
+                queue_path=queue_path, unit=unit, lease_seconds=lease_seconds
+            )
+            if state == UnitState.RUNNING:
+                waiting = True
+            if state not in (UnitState.PENDING, UnitState.FAILED):
+                continue
+            if attempts >= max_attempts:
+                continue
+            attempt = attempts + 1
+            if not claim_unit(
+                queue_path=queue_path,
+                unit=unit,
+                attempt=attempt,
+                worker=worker,
+            ):
+                waiting = True
+                continue
+
+            done = export_unit(
+                dsn=dsn,
+                output_path=output_path,
+                unit=unit,
+                attempt=attempt,
+                worker=worker,
+                lease_seconds=lease_seconds,
+                batch_size=batch_size,
+                sink_options=sink_options,
+                **export_options,
+            )
+            # Failed units are retried after the poll interval
+            waiting = waiting or (not done and attempt < max_attempts)
+
+        if not waiting:
+            break
+        time.sleep(poll_seconds)
+
+    status = get_queue_status(
+        output_path=output_path, lease_seconds=lease_seconds
+    )
+    logger.info(
+        f"Worker {worker} finished: "
+        + ", ".join(
+            f"{count} {state.value}" for state, count in status.items()
+        )
+    )
+    return status
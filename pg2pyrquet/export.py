@@ -1,82 +1,572 @@
-from collections import defaultdict
+import time
+from collections.abc import Iterable, Iterator
+from enum import Enum
 from pathlib import Path
 
 import psycopg
 import pyarrow as pa
-from psycopg.rows import dict_row
-from pyarrow.parquet import ParquetWriter
+from pyarrow import DataType, RecordBatch, Schema
 
+from pg2pyrquet.core.exceptions import KeysetColumnsError
 from pg2pyrquet.core.logging import get_logger
-from pg2pyrquet.utils.parquet import write_batch_to_parquet
-from pg2pyrquet.utils.postgres import get_query_data_types
+from pg2pyrquet.utils.nested import (
+    is_nested_arrow_type,
+    register_nested_loaders,
+)
+from pg2pyrquet.utils.parquet import build_record_batch, promote_large_types
+from pg2pyrquet.utils.pool import ConnectionPool
+from pg2pyrquet.utils.postgres import (
+    get_keyset_page_query,
+    get_keyset_ties_query,
+    get_query_data_types,
+    register_raw_text_loaders,
+    set_transaction_snapshot,
+    strip_query,
+)
+from pg2pyrquet.utils.sinks import (
+    BatchSink,
+    RollingSink,
+    SinkOptions,
+    get_rolled_file,
+    open_sink,
+    remove_output_files,
+)
+from pg2pyrquet.utils.sort import DEFAULT_SORT_MEMORY_LIMIT, ExternalSortSink
+from pg2pyrquet.utils.throttle import Throttle
+from pg2pyrquet.utils.transforms import (
+    Transform,
+    apply_transforms,
+    get_transformed_schema,
+)
+from pg2pyrquet.verify import (
+    get_server_aggregates,
+    get_verified_columns,
+    verify_export,
+)
 
 logger = get_logger(name=__name__)
 
+# Maximum number of rows in a record batch
+DEFAULT_BATCH_SIZE = 10000
 
-def reset_column_values(
-    fields_types: dict[str, pa.DataType], records: dict[str, list]
-) -> None:
+# Maximum size of a record batch (and so of a row group) in bytes
+DEFAULT_MAX_BATCH_BYTES = 64 * 1024 * 1024
+
+# Number of rows fetched first, before the row size is known
+INITIAL_FETCH_SIZE = 100
+
+
+class FetchMode(str, Enum):
+    """
+    Ways of reading the rows of an export from the database.
+    """
+
+    # One server-side cursor in one transaction, consistent but long-running
+    CURSOR = "cursor"
+    # Pages ordered by a unique key, read in short transactions
+    KEYSET = "keyset"
+
+
+def get_fetch_size(
+    batch: RecordBatch, batch_size: int, max_batch_bytes: int
+) -> int:
+    """
+    Calculates the number of rows to fetch next from the size of the last batch.
+
+    Args:
+        batch (RecordBatch): The last fetched batch.
+        batch_size (int): The maximum number of rows in a batch.
+        max_batch_bytes (int): The maximum size of a batch in bytes.
+
+    Returns:
+        int: The number of rows that fit the batch size and byte limits.
+    """
+    if not batch.num_rows or not batch.nbytes:
+        return batch_size
+
+    row_bytes = batch.nbytes / batch.num_rows
+    return max(1, min(batch_size, int(max_batch_bytes / row_bytes)))
+
+
+def fetch_record_batches(
+    cursor: psycopg.Cursor,
+    fields_types: dict[str, DataType],
+    schema: Schema,
+    batch_size: int,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    throttle: Throttle | None = None,
+) -> Iterator[RecordBatch]:
+    """
+    Fetches the rows of the executed query as record batches.
+
+    Each fetch becomes one batch. The number of fetched rows adapts to the size
+    of the previous batch, so batches get smaller when large values show up.
+
+    Args:
+        cursor (psycopg.Cursor): The cursor with the executed query.
+        fields_types (dict[str, pa.DataType]): A dictionary mapping column names to their data types.
+        schema (Schema): The schema of the record batches.
+        batch_size (int): The maximum number of rows in a batch.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+        throttle (Throttle | None, optional): The limiter of the read rate. Defaults to None.
+
+    Yields:
+        RecordBatch: The fetched record batches.
+    """
+    fetch_size = min(batch_size, INITIAL_FETCH_SIZE)
+    while True:
+        fetch_started = time.monotonic()
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        fetch_seconds = time.monotonic() - fetch_started
+        batch = build_record_batch(
+            fields_types=fields_types, rows=rows, schema=schema
+        )
+        del rows
+        if throttle:
+            throttle.wait(
+                rows=batch.num_rows,
+                nbytes=batch.nbytes,
+                fetch_seconds=fetch_seconds,
+            )
+        yield batch
+        fetch_size = get_fetch_size(
+            batch=batch,
+            batch_size=batch_size,
+            max_batch_bytes=max_batch_bytes,
+        )
+
+
+def get_page_without_last_key(
+    rows: list[tuple], key_indexes: list[int]
+) -> list[tuple]:
+    """
+    Drops the rows at the end of a page sharing the key of its last row.
+
+    Args:
+        rows (list[tuple]): The rows of the page, ordered by the key.
+        key_indexes (list[int]): The indexes of the key columns in the rows.
+
+    Returns:
+        list[tuple]: The rows before the first row with the last key.
+    """
+    last_key = [rows[-1][index] for index in key_indexes]
+    end = len(rows) - 1
+    while end > 0 and [rows[end - 1][index] for index in key_indexes] == (
+        last_key
+    ):
+        end -= 1
+    return rows[:end]
+
+
+def fetch_keyset_batches(
+    conn: psycopg.Connection,
+    query: str,
+    key_columns: list[str],
+    fields_types: dict[str, DataType],
+    schema: Schema,
+    batch_size: int,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    max_transaction_seconds: float | None = None,
+    throttle: Throttle | None = None,
+    unique_key: bool = False,
+) -> Iterator[RecordBatch]:
+    """
+    Fetches the rows of a query as record batches, one page of a key at a time.
+
+    Each page selects the rows after the last key of the previous page, so no
+    transaction stays open for the whole export. Pages read different
+    snapshots, so rows changed during the export may be missed or seen in
+    their latest version.
+
+    Unless the key is known to be unique, the rows of a full page sharing its
+    last key are fetched again with all the other rows of that key, so the
+    next page does not skip them, at the cost of one more query per page.
+    Rows whose key is NULL would be skipped by the next page, so they fail
+    the export.
+
+    Args:
+        conn (psycopg.Connection): The connection to read the pages with.
+        query (str): The query to page through.
+        key_columns (list[str]): The columns of the unique key to page by.
+        fields_types (dict[str, pa.DataType]): A dictionary mapping column names to their data types.
+        schema (Schema): The schema of the record batches.
+        batch_size (int): The maximum number of rows in a batch.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+        max_transaction_seconds (float | None, optional): The duration after which the transaction reading the pages is committed. Defaults to None, to commit after every page.
+        throttle (Throttle | None, optional): The limiter of the read rate. Defaults to None.
+        unique_key (bool, optional): Whether the key is unique, like a primary key. Defaults to False.
+
+    Yields:
+        RecordBatch: The fetched record batches.
+
+    Raises:
+        KeysetColumnsError: If a key column holds a NULL value.
+    """
+    key_indexes = [list(fields_types).index(column) for column in key_columns]
+    last_key: tuple | None = None
+    fetch_size = min(batch_size, INITIAL_FETCH_SIZE)
+    transaction_started: float | None = None
+
+    while True:
+        fetch_started = time.monotonic()
+        if transaction_started is None:
+            transaction_started = fetch_started
+        with conn.cursor() as cur:
+            cur.execute(
+                get_keyset_page_query(
+                    query=query,
+                    key_columns=key_columns,
+                    after_key=last_key is not None,
+                    limit=fetch_size,
+                ),
+                last_key,
+            )
+            rows = cur.fetchall()
+            last_page = len(rows) < fetch_size
+            if rows:
+                last_key = tuple(rows[-1][index] for index in key_indexes)
+                if None in last_key:
+                    raise KeysetColumnsError(
+                        f"Keyset columns {key_columns} hold NULL values."
+                    )
+            if rows and not last_page and not unique_key:
+                rows = get_page_without_last_key(
+                    rows=rows, key_indexes=key_indexes
+                )
+                cur.execute(
+                    get_keyset_ties_query(
+                        query=query, key_columns=key_columns
+                    ),
+                    last_key,
+                )
+                rows += cur.fetchall()
+        fetched = time.monotonic()
+
+        if (
+            max_transaction_seconds is None
+            or fetched - transaction_started >= max_transaction_seconds
+        ):
+            conn.commit()
+            transaction_started = None
+
+        if not rows:
+            break
+        batch = build_record_batch(
+            fields_types=fields_types, rows=rows, schema=schema
+        )
+        del rows
+        if any(batch.column(index).null_count for index in key_indexes):
+            raise KeysetColumnsError(
+                f"Keyset columns {key_columns} hold NULL values."
+            )
+        if throttle:
+            throttle.wait(
+                rows=batch.num_rows,
+                nbytes=batch.nbytes,
+                fetch_seconds=fetched - fetch_started,
+            )
+        yield batch
+
+        if last_page:
+            break
+        fetch_size = get_fetch_size(
+            batch=batch,
+            batch_size=batch_size,
+            max_batch_bytes=max_batch_bytes,
+        )
+    conn.commit()
+
+
+def get_output_schema(
+    data_types: dict[str, DataType],
+    large_values: bool = False,
+    transforms: list[Transform] | None = None,
+) -> Schema:
     """
-    Resets the values list for each column in the records dictionary based on the fields_types.
+    Resolves the schema of the files written by an export.
 
     Args:
-        fields_types (dict[str, pa.DataType]): The dictionary of field names and their data types.
-        records (dict[str, list]): The dictionary to reset, where keys are field names.
+        data_types (dict[str, DataType]): The column data types of the query.
+        large_values (bool, optional): Whether binary and string columns are exported with the large types. Defaults to False.
+        transforms (list[Transform] | None, optional): The column transforms of the export. Defaults to None.
+
+    Returns:
+        Schema: The schema of the written record batches.
+    """
+    if large_values:
+        data_types = promote_large_types(fields_types=data_types)
+    return get_transformed_schema(
+        schema=pa.schema(fields=data_types), transforms=transforms or []
+    )
+
+
+def open_export_sink(
+    output_file: Path,
+    schema: Schema,
+    sink_options: SinkOptions,
+    max_file_bytes: int | None = None,
+    sort_by: str | None = None,
+    sort_memory_limit: int = DEFAULT_SORT_MEMORY_LIMIT,
+) -> tuple[BatchSink, list[Path]]:
+    """
+    Opens the sink of an export, rolling and sorting the output if requested.
+
+    The files of an earlier export of the output are removed first, whether
+    it was written to a single file or rolled over several files.
+
+    Args:
+        output_file (Path): The path to the output file.
+        schema (Schema): The schema of the written record batches.
+        sink_options (SinkOptions): The output format settings.
+        max_file_bytes (int | None, optional): The size the output is rolled over to the next file at. Defaults to None, for a single file.
+        sort_by (str | None, optional): The column to sort the output by on the client. Defaults to None.
+        sort_memory_limit (int, optional): The bytes buffered before a sorted run is spilled to disk. Defaults to DEFAULT_SORT_MEMORY_LIMIT.
+
+    Returns:
+        tuple[BatchSink, list[Path]]: The sink and the list of the files it
+            writes, filled in while rolling.
     """
-    for field in fields_types:
-        records[field] = []
+    for path in remove_output_files(where=output_file):
+        logger.info(f"Removed the earlier output file: {path}")
+
+    files = [output_file]
+    if max_file_bytes:
+        rolling_sink = RollingSink(
+            get_path=lambda index: get_rolled_file(
+                where=output_file, index=index
+            ),
+            schema=schema,
+            options=sink_options,
+            max_file_bytes=max_file_bytes,
+        )
+        files = rolling_sink.files
+        sink: BatchSink = rolling_sink
+    else:
+        sink = open_sink(
+            where=output_file, schema=schema, options=sink_options
+        )
+    if sort_by:
+        sink = ExternalSortSink(
+            sink=sink,
+            schema=schema,
+            key=sort_by,
+            temp_dir=output_file.parent,
+            memory_limit=sort_memory_limit,
+        )
+    return sink, files
+
+
+def write_batches(
+    writer: BatchSink,
+    batches: Iterable[RecordBatch],
+    transforms: list[Transform],
+    output_file: Path,
+) -> int:
+    """
+    Transforms the fetched record batches and writes them to the sink.
+
+    Args:
+        writer (BatchSink): The sink to write to.
+        batches (Iterable[RecordBatch]): The fetched record batches.
+        transforms (list[Transform]): The column transforms applied to every batch.
+        output_file (Path): The path to the output file, for logging.
+
+    Returns:
+        int: The number of written rows.
+    """
+    rows = 0
+    for index, batch in enumerate(batches, start=1):
+        rows += batch.num_rows
+        logger.info(
+            "Writing batch %d (%d rows) to the file: %s",
+            index,
+            batch.num_rows,
+            output_file,
+            extra={
+                "file": output_file,
+                "batch": index,
+                "rows": batch.num_rows,
+                "rate_limited": True,
+            },
+        )
+        writer.write_batch(
+            apply_transforms(batch=batch, transforms=transforms)
+        )
+
+    logger.info(
+        "Export finished successfully: %d rows written to: %s",
+        rows,
+        output_file,
+        extra={"file": output_file, "rows": rows},
+    )
+    return rows
 
 
 def export_to_parquet(
-    dsn: str, output_file: Path, batch_size: int, query: str
-) -> None:
+    dsn: str,
+    output_file: Path,
+    batch_size: int,
+    query: str,
+    sink_options: SinkOptions | None = None,
+    sort_by: str | None = None,
+    sort_memory_limit: int = DEFAULT_SORT_MEMORY_LIMIT,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    large_values: bool = False,
+    data_types: dict[str, DataType] | None = None,
+    snapshot: str | None = None,
+    transforms: list[Transform] | None = None,
+    verify: bool = False,
+    verify_text_hash: bool = False,
+    max_file_bytes: int | None = None,
+    pool: ConnectionPool | None = None,
+    fetch_mode: FetchMode = FetchMode.CURSOR,
+    keyset_columns: list[str] | None = None,
+    unique_keyset: bool = False,
+    max_transaction_seconds: float | None = None,
+    throttle: Throttle | None = None,
+) -> list[Path]:
     """
     Processes export the specified table from the database to a Parquet file.
 
     Args:
         dsn (str): The Data Source Name for connecting to the PostgreSQL database.
-        output_file (Path): The path to the output Parquet file.
+        output_file (Path): The path to the output file.
         batch_size (int): The number of rows to process in each batch.
         query (str): SQL query to execute.
+        sink_options (SinkOptions | None, optional): The output format settings. Defaults to Parquet.
+        sort_by (str | None, optional): The column to sort the output by on the client. Defaults to None.
+        sort_memory_limit (int, optional): The bytes buffered before a sorted run is spilled to disk. Defaults to DEFAULT_SORT_MEMORY_LIMIT.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+        large_values (bool, optional): Whether to export binary and string columns with the large types. Defaults to False.
+        data_types (dict[str, DataType] | None, optional): The column data types, resolved from the query if None. Defaults to None.
+        snapshot (str | None, optional): The exported snapshot to read the data from. Defaults to None.
+        transforms (list[Transform] | None, optional): The column transforms applied to every batch before writing. Defaults to None.
+        verify (bool, optional): Whether to verify the written file against aggregates computed by the server. Defaults to False.
+        verify_text_hash (bool, optional): Whether the verification hashes the string columns too. Defaults to False.
+        max_file_bytes (int | None, optional): The size the output is rolled over to the next file at. Defaults to None, for a single file.
+        pool (ConnectionPool | None, optional): The pool to borrow the connection from. Defaults to None, for a new connection.
+        fetch_mode (FetchMode, optional): How the rows are read from the database. Defaults to FetchMode.CURSOR.
+        keyset_columns (list[str] | None, optional): The columns of the unique key the keyset mode pages by. Defaults to None.
+        unique_keyset (bool, optional): Whether the keyset columns are known to be unique, like a primary key, so pages need no tie handling. Defaults to False.
+        max_transaction_seconds (float | None, optional): The duration after which the keyset mode commits its transaction. Defaults to None, to commit after every page.
+        throttle (Throttle | None, optional): The limiter of the read rate, shared by concurrent exports. Defaults to None.
+
+    Returns:
+        list[Path]: The written files.
+
+    Raises:
+        VerificationError: If the written file does not match the server aggregates.
+        KeysetColumnsError: If the keyset mode has no key columns in the query result.
     """
-    records = defaultdict(list)
+    sink_options = sink_options or SinkOptions()
 
-    data_types = get_query_data_types(dsn=dsn, query=query)
+    if data_types is None:
+        data_types = get_query_data_types(dsn=dsn, query=query)
+    if large_values:
+        data_types = promote_large_types(fields_types=data_types)
     schema = pa.schema(fields=data_types)
+    transforms = transforms or []
+    output_schema = get_output_schema(
+        data_types=data_types, transforms=transforms
+    )
+    verified_columns = get_verified_columns(
+        data_types=data_types, transforms=transforms
+    )
+
+    keyset_columns = keyset_columns or []
+    if FetchMode(fetch_mode) == FetchMode.KEYSET:
+        missing = [
+            column for column in keyset_columns if column not in data_types
+        ]
+        if not keyset_columns or missing:
+            raise KeysetColumnsError(
+                f"Keyset export requires key columns of the query result, "
+                f"got {keyset_columns}."
+            )
+        if verify:
+            logger.warning(
+                "Keyset pages read different snapshots than the verification "
+                "aggregates, so writes during the export fail the verification"
+            )
 
-    with ParquetWriter(where=output_file, schema=schema) as writer:
-        with psycopg.connect(dsn) as conn:
+    sink, files = open_export_sink(
+        output_file=output_file,
+        schema=output_schema,
+        sink_options=sink_options,
+        max_file_bytes=max_file_bytes,
+        sort_by=sort_by,
+        sort_memory_limit=sort_memory_limit,
+    )
+
+    with sink as writer:
+        with pool.connection() if pool else psycopg.connect(dsn) as conn:
             logger.info("Connected to DB, starting to execute query...")
+            register_raw_text_loaders(conn=conn)
+            if any(map(is_nested_arrow_type, data_types.values())):
+                register_nested_loaders(conn=conn, query=strip_query(query))
+                conn.commit()
 
-            with conn.cursor(
-                name="pg-to-parquet", row_factory=dict_row
-            ) as cur:
-                cur.itersize = batch_size
-                cur.execute(query)
-                logger.info("Query executed...")
-
-                for index, record in enumerate(cur):
-                    for column, value in record.items():
-                        records[column].append(value)
-
-                    if index % batch_size == 0:
-                        logger.info(
-                            f"Writing batch {index // batch_size + 1} to the file: {output_file}"
-                        )
-                        write_batch_to_parquet(
-                            writer=writer,
+            if FetchMode(fetch_mode) == FetchMode.KEYSET:
+                write_batches(
+                    writer=writer,
+                    batches=fetch_keyset_batches(
+                        conn=conn,
+                        query=query,
+                        key_columns=keyset_columns,
+                        unique_key=unique_keyset,
+                        fields_types=data_types,
+                        schema=schema,
+                        batch_size=batch_size,
+                        max_batch_bytes=max_batch_bytes,
+                        max_transaction_seconds=max_transaction_seconds,
+                        throttle=throttle,
+                    ),
+                    transforms=transforms,
+                    output_file=output_file,
+                )
+            else:
+                if snapshot:
+                    set_transaction_snapshot(conn=conn, snapshot=snapshot)
+                elif verify:
+                    # The aggregates must read the same snapshot as the export
+                    conn.isolation_level = (
+                        psycopg.IsolationLevel.REPEATABLE_READ
+                    )
+
+                with conn.cursor(name="pg-to-parquet") as cur:
+                    cur.execute(query)
+                    logger.info("Query executed...")
+                    write_batches(
+                        writer=writer,
+                        batches=fetch_record_batches(
+                            cursor=cur,
                             fields_types=data_types,
-                            data=records,
                             schema=schema,
-                        )
-                        reset_column_values(
-                            fields_types=data_types, records=records
-                        )
+                            batch_size=batch_size,
+                            max_batch_bytes=max_batch_bytes,
+                            throttle=throttle,
+                        ),
+                        transforms=transforms,
+                        output_file=output_file,
+                    )
 
-                write_batch_to_parquet(
-                    writer=writer,
-                    fields_types=data_types,
-                    data=records,
-                    schema=schema,
+            if verify:
+                logger.info("Computing the aggregates on the server...")
+                expected = get_server_aggregates(
+                    conn=conn,
+                    query=query,
+                    columns=verified_columns,
+                    hash_text=verify_text_hash,
                 )
-                logger.info("Export finished successfully.")
+
+    if verify:
+        verify_export(
+            files=files,
+            output_format=sink_options.output_format,
+            expected=expected,
+            columns=verified_columns,
+            hash_text=verify_text_hash,
+        )
+    return files
@@ -0,0 +1,537 @@
+"""
+Declarative runner executing many exports in one process.
+
+Jobs are described in a YAML file:
+
+    max_concurrency: 8
+    max_concurrency_per_database: 2
+    retries: 3
+    retry_backoff: 2.0
+    max_rows_per_sec: 50000
+    adaptive_throttle: true
+    defaults:
+      host: localhost
+      port: "5432"
+      folder: ./exports
+    jobs:
+      - type: table
+        database: app
+        table: users
+        priority: 10
+      - type: query
+        database: app
+        query_file: queries/orders.sql
+      - type: database
+        database: analytics
+        schemas: [public, sales]
+        exclude: ["*_archive"]
+
+Every key of a job except "type", "name" and "priority" mirrors an option of the
+matching export command, and "defaults" apply to every job.
+"""
+
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import psycopg
+import yaml
+
+from pg2pyrquet.core.exceptions import InvalidJobConfigError
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_BYTES,
+    export_to_parquet,
+)
+from pg2pyrquet.utils.files import read_query_from_file
+from pg2pyrquet.utils.path import validate_output_path, validate_query_path
+from pg2pyrquet.utils.pool import ConnectionPool
+from pg2pyrquet.utils.postgres import (
+    RelationKind,
+    get_database_tables,
+    get_default_query,
+    get_postgres_dsn,
+    get_queries_data_types,
+)
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+from pg2pyrquet.utils.throttle import Throttle, ThrottleLimits
+
+logger = get_logger(name=__name__)
+
+# Errors worth retrying, like lost connections and server restarts
+RETRYABLE_ERRORS = (psycopg.OperationalError,)
+
+
+class JobKind(str, Enum):
+    """
+    Kinds of exports a job can run.
+    """
+
+    TABLE = "table"
+    QUERY = "query"
+    DATABASE = "database"
+
+
+@dataclass
+class ExportJob:
+    """
+    One export of a table, a custom query or a whole database.
+
+    Attributes:
+        kind (JobKind): The kind of the export.
+        database (str): The name of the PostgreSQL database.
+        folder (str): The directory where the files will be saved.
+        name (str): The name of the job in the report, derived if empty.
+        host (str): The host of the PostgreSQL database.
+        port (str): The port of the PostgreSQL database.
+        table (str | None): The table exported by a table job.
+        query_file (str | None): The query file exported by a query job.
+        output_file (str | None): The name of the output file of a table or
+            query job.
+        priority (int): Jobs with a higher priority start first.
+        batch_size (int): The number of rows to process in each batch.
+        output_format (OutputFormat): The output file format.
+        compression (str | None): The compression codec of the output files.
+        max_batch_mb (int): The maximum size of a batch in megabytes.
+        max_file_mb (int | None): The size in megabytes the output is rolled
+            over to the next file at.
+        large_values (bool): Whether to export binary and string columns
+            with the large types.
+        verify (bool): Whether to verify the written files against
+            aggregates computed by the server.
+        verify_text_hash (bool): Whether the verification hashes the string
+            columns too.
+        schemas (list[str]): The schemas exported by a database job, the
+            "public" schema if empty.
+        include (list[str]): Glob patterns of the tables exported by a
+            database job, all tables if empty.
+        exclude (list[str]): Glob patterns of the tables skipped by a
+            database job.
+        relation_kinds (list[RelationKind]): The kinds of relations exported
+            by a database job, tables and views if empty.
+    """
+
+    kind: JobKind
+    database: str
+    folder: str
+    name: str = ""
+    host: str = "localhost"
+    port: str = "5432"
+    table: str | None = None
+    query_file: str | None = None
+    output_file: str | None = None
+    priority: int = 0
+    batch_size: int = DEFAULT_BATCH_SIZE
+    output_format: OutputFormat = OutputFormat.PARQUET
+    compression: str | None = None
+    max_batch_mb: int = DEFAULT_MAX_BATCH_BYTES // (1024 * 1024)
+    max_file_mb: int | None = None
+    large_values: bool = False
+    verify: bool = False
+    verify_text_hash: bool = False
+    schemas: list[str] = field(default_factory=list)
+    include: list[str] = field(default_factory=list)
+    exclude: list[str] = field(default_factory=list)
+    relation_kinds: list[RelationKind] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.kind = JobKind(self.kind)
+        self.relation_kinds = [
+            RelationKind(kind) for kind in self.relation_kinds
+        ]
+        self.output_format = OutputFormat(self.output_format)
+        self.port = str(self.port)
+        if self.kind == JobKind.TABLE and not self.table:
+            raise InvalidJobConfigError("A table job requires a 'table'.")
+        if self.kind == JobKind.QUERY and not self.query_file:
+            raise InvalidJobConfigError(
+                "A query job requires a 'query_file'."
+            )
+        self.name = self.name or (
+            self.table
+            or (self.query_file and Path(self.query_file).stem)
+            or self.database
+        )
+
+
+@dataclass
+class JobsConfig:
+    """
+    Jobs and the limits they run with.
+
+    Attributes:
+        jobs (list[ExportJob]): The jobs to run.
+        max_concurrency (int): The number of jobs running at the same time.
+        max_concurrency_per_database (int): The number of jobs running at the
+            same time against one database.
+        retries (int): The number of retries of a job failing with a
+            retryable error.
+        retry_backoff (float): The delay before the first retry in seconds,
+            doubled before every next retry.
+        max_rows_per_sec (float | None): The maximum number of rows read per
+            second from one database by all its jobs together.
+        max_bytes_per_sec (float | None): The maximum number of bytes read
+            per second from one database by all its jobs together.
+        adaptive_throttle (bool): Whether to slow down the jobs of a database
+            while its server is loaded.
+    """
+
+    jobs: list[ExportJob]
+    max_concurrency: int = 4
+    max_concurrency_per_database: int = 2
+    retries: int = 2
+    retry_backoff: float = 1.0
+    max_rows_per_sec: float | None = None
+    max_bytes_per_sec: float | None = None
+    adaptive_throttle: bool = False
+
+    def __post_init__(self) -> None:
+        for name in ("max_concurrency", "max_concurrency_per_database"):
+            if getattr(self, name) < 1:
+                raise InvalidJobConfigError(
+                    f"'{name}' must be at least 1, got {getattr(self, name)}."
+                )
+
+    @property
+    def throttle_limits(self) -> ThrottleLimits:
+        """
+        Returns the read rate limits of every database.
+        """
+        return ThrottleLimits(
+            max_rows_per_sec=self.max_rows_per_sec,
+            max_bytes_per_sec=self.max_bytes_per_sec,
+            adaptive=self.adaptive_throttle,
+        )
+
+
+@dataclass
+class JobResult:
+    """
+    Outcome of a job.
+
+    Attributes:
+        name (str): The name of the job.
+        succeeded (bool): Whether the job succeeded.
+        attempts (int): The number of attempts.
+        duration (float): The duration of all the attempts in seconds.
+        files (list[Path]): The written files.
+        error (str | None): The error of the last failed attempt.
+    """
+
+    name: str
+    succeeded: bool
+    attempts: int
+    duration: float
+    files: list[Path] = field(default_factory=list)
+    error: str | None = None
+
+
+def parse_job(spec: dict[str, Any], defaults: dict[str, Any]) -> ExportJob:
+    """
+    Parses one job of the configuration file.
+
+    Args:
+        spec (dict[str, Any]): The keys of the job.
+        defaults (dict[str, Any]): The keys applied to every job.
+
+    Returns:
+        ExportJob: The parsed job.
+
+    Raises:
+        InvalidJobConfigError: If the job is malformed.
+    """
+    options = {**defaults, **spec}
+    if "type" in options:
+        options["kind"] = options.pop("type")
+    if "format" in options:
+        options["output_format"] = options.pop("format")
+
+    known = {job_field.name for job_field in fields(ExportJob)}
+    unknown = sorted(set(options) - known)
+    if unknown:
+        raise InvalidJobConfigError(f"Unknown job options: {unknown}.")
+
+    try:
+        return ExportJob(**options)
+    except (TypeError, ValueError) as e:
+        raise InvalidJobConfigError(f"Invalid job {spec}: {e}") from e
+
+
+def load_jobs_config(path: Path) -> JobsConfig:
+    """
+    Loads the jobs configuration from a YAML file.
+
+    Args:
+        path (Path): The path to the YAML file.
+
+    Returns:
+        JobsConfig: The loaded configuration.
+
+    Raises:
+        InvalidJobConfigError: If the configuration is malformed.
+    """
+    with open(path) as file:
+        config = yaml.safe_load(file) or {}
+
+    if not isinstance(config, dict) or not isinstance(
+        config.get("jobs"), list
+    ):
+        raise InvalidJobConfigError(
+            f"Jobs configuration '{path}' must have a 'jobs' list."
+        )
+
+    defaults = config.pop("defaults", None) or {}
+    jobs = [
+        parse_job(spec=spec, defaults=defaults) for spec in config["jobs"]
+    ]
+    try:
+        return JobsConfig(**{**config, "jobs": jobs})
+    except TypeError as e:
+        raise InvalidJobConfigError(f"Invalid jobs configuration: {e}") from e
+
+
+def run_job(
+    job: ExportJob, pool: ConnectionPool, throttle: Throttle | None = None
+) -> list[Path]:
+    """
+    Runs the exports of one job.
+
+    The tables of a database job are listed, and the column types of all the
+    exports resolved in one session, with connections of the pool. Only the
+    ADBC connection resolving the types is opened by every job.
+
+    Args:
+        job (ExportJob): The job to run.
+        pool (ConnectionPool): The pool of connections to the job database.
+        throttle (Throttle | None, optional): The limiter of the read rate of the job database. Defaults to None.
+
+    Returns:
+        list[Path]: The written files.
+    """
+    output_path = validate_output_path(output_path=job.folder)
+    sink_options = SinkOptions(
+        output_format=job.output_format, compression=job.compression
+    )
+    extension = job.output_format.extension
+
+    if job.kind == JobKind.DATABASE:
+        targets = [
+            (get_default_query(table=table), f"{table}{extension}")
+            for table in get_database_tables(
+                dsn=pool.dsn,
+                schemas=job.schemas,
+                relation_kinds=job.relation_kinds,
+                include=job.include,
+                exclude=job.exclude,
+                pool=pool,
+            )
+        ]
+    elif job.kind == JobKind.TABLE:
+        targets = [
+            (
+                get_default_query(table=job.table or ""),
+                job.output_file or f"{job.table}{extension}",
+            )
+        ]
+    else:
+        query_path = validate_query_path(query_path=job.query_file or "")
+        targets = [
+            (
+                read_query_from_file(query_path=query_path),
+                job.output_file or f"{query_path.stem}{extension}",
+            )
+        ]
+
+    data_types = get_queries_data_types(
+        dsn=pool.dsn,
+        queries={output_file: query for query, output_file in targets},
+        pool=pool,
+    )
+
+    files = []
+    for query, output_file in targets:
+        files += export_to_parquet(
+            dsn=pool.dsn,
+            output_file=output_path / output_file,
+            batch_size=job.batch_size,
+            query=query,
+            sink_options=sink_options,
+            data_types=data_types[output_file],
+            max_batch_bytes=job.max_batch_mb * 1024 * 1024,
+            large_values=job.large_values,
+            verify=job.verify,
+            verify_text_hash=job.verify_text_hash,
+            max_file_bytes=job.max_file_mb and job.max_file_mb * 1024 * 1024,
+            pool=pool,
+            throttle=throttle,
+        )
+    return files
+
+
+def run_job_with_retries(
+    job: ExportJob,
+    pool: ConnectionPool,
+    retries: int,
+    retry_backoff: float,
+    throttle: Throttle | None = None,
+) -> JobResult:
+    """
+    Runs a job, retrying retryable errors.
+
+    Args:
+        job (ExportJob): The job to run.
+        pool (ConnectionPool): The pool of connections to the job database.
+        retries (int): The number of retries.
+        retry_backoff (float): The delay before the first retry in seconds.
+        throttle (Throttle | None, optional): The limiter of the read rate of the job database. Defaults to None.
+
+    Returns:
+        JobResult: The outcome of the job.
+    """
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            logger.info(f"Starting job '{job.name}' (attempt {attempt})")
+            files = run_job(job=job, pool=pool, throttle=throttle)
+        except RETRYABLE_ERRORS as e:
+            if attempt <= retries:
+                delay = retry_backoff * 2 ** (attempt - 1)
+                logger.warning(
+                    f"Job '{job.name}' failed: {e}. Retrying in {delay}s..."
+                )
+                time.sleep(delay)
+                continue
+            error = e
+        except Exception as e:
+            error = e
+        else:
+            return JobResult(
+                name=job.name,
+                succeeded=True,
+                attempts=attempt,
+                duration=time.monotonic() - started,
+                files=files,
+            )
+
+        logger.error(f"Job '{job.name}' failed: {error}")
+        return JobResult(
+            name=job.name,
+            succeeded=False,
+            attempts=attempt,
+            duration=time.monotonic() - started,
+            error=f"{type(error).__name__}: {error}",
+        )
+
+
+def run_export_jobs(config: JobsConfig) -> list[JobResult]:
+    """
+    Runs the jobs in threads sharing one connection pool per database.
+
+    Jobs start in the order of their priority, with at most
+    `max_concurrency` jobs running in total and at most
+    `max_concurrency_per_database` jobs running against one database. A job
+    is only started once its database has a free slot, so the jobs of a busy
+    database never hold the slots of the jobs of the other databases. The
+    jobs of one database also share the limits of its read rate.
+
+    Args:
+        config (JobsConfig): The jobs and their limits.
+
+    Returns:
+        list[JobResult]: The outcomes of the jobs, in the configuration order.
+    """
+    dsns = [
+        get_postgres_dsn(host=job.host, port=job.port, database=job.database)
+        for job in config.jobs
+    ]
+    pools = {dsn: ConnectionPool(dsn=dsn) for dsn in set(dsns)}
+    throttles = {
+        dsn: (
+            Throttle(limits=config.throttle_limits, dsn=dsn)
+            if config.throttle_limits.enabled
+            else None
+        )
+        for dsn in set(dsns)
+    }
+
+    pending = sorted(
+        range(len(config.jobs)),
+        key=lambda index: -config.jobs[index].priority,
+    )
+    running: dict[Future, str] = {}
+    running_per_database = dict.fromkeys(set(dsns), 0)
+    futures: dict[int, Future] = {}
+    try:
+        with ThreadPoolExecutor(
+            max_workers=config.max_concurrency
+        ) as executor:
+            while pending or running:
+                for index in list(pending):
+                    dsn = dsns[index]
+                    if len(running) >= config.max_concurrency:
+                        break
+                    if (
+                        running_per_database[dsn]
+                        >= config.max_concurrency_per_database
+                    ):
+                        continue
+
+                    pending.remove(index)
+                    running_per_database[dsn] += 1
+                    futures[index] = executor.submit(
+                        run_job_with_retries,
+                        job=config.jobs[index],
+                        pool=pools[dsn],
+                        retries=config.retries,
+                        retry_backoff=config.retry_backoff,
+                        throttle=throttles[dsn],
+                    )
+                    running[futures[index]] = dsn
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running_per_database[running.pop(future)] -= 1
+            return [futures[index].result() for index in range(len(dsns))]
+    finally:
+        for connection_pool in pools.values():
+            connection_pool.close()
+
+
+def format_report(results: list[JobResult]) -> str:
+    """
+    Formats the outcomes of the jobs as a summary report.
+
+    Args:
+        results (list[JobResult]): The outcomes of the jobs.
+
+    Returns:
+        str: The report, one line per job and a total line.
+    """
+    lines = []
+    for result in results:
+        status = "OK" if result.succeeded else "FAILED"
+        line = (
+            f"{status:<6} {result.name}: {len(result.files)} file(s), "
+            f"{result.attempts} attempt(s), {result.duration:.1f}s"
+        )
+        if result.error:
+            line += f" - {result.error}"
+        lines.append(line)
+
+    failed = sum(not result.succeeded for result in results)
+    lines.append(
+        f"{len(results) - failed} of {len(results)} jobs succeeded, "
+        f"{failed} failed."
+    )
+    return "\n".join(lines)
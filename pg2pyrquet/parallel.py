@@ -0,0 +1,230 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+from pyarrow import Schema
+
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import export_to_parquet, get_output_schema
+from pg2pyrquet.utils.postgres import (
+    export_snapshot,
+    get_partition_boundaries,
+    get_partition_queries,
+    get_query_column_range,
+    get_query_data_types,
+)
+from pg2pyrquet.utils.sinks import (
+    SinkOptions,
+    open_sink,
+    read_batches,
+    split_column_spec,
+)
+from pg2pyrquet.utils.throttle import Throttle
+
+logger = get_logger(name=__name__)
+
+
+def get_part_file(output_file: Path, index: int) -> Path:
+    """
+    Generates the path of a part file of the output file.
+
+    Args:
+        output_file (Path): The path to the output file.
+        index (int): The index of the part.
+
+    Returns:
+        Path: The path to the part file, like "output.part-0001.parquet".
+    """
+    return output_file.with_name(
+        f"{output_file.stem}.part-{index:04d}{output_file.suffix}"
+    )
+
+
+def get_merged_sink_options(
+    sink_options: SinkOptions, partition_column: str
+) -> SinkOptions:
+    """
+    Returns the output format settings of the file merging the part files.
+
+    The parts are concatenated in the ascending order of their ranges, so the
+    merged file is only ordered like the parts when the first sorting column
+    is the partition column in ascending order. The sorting columns are
+    dropped otherwise, as readers would trust an order the file does not have.
+
+    Args:
+        sink_options (SinkOptions): The output format settings of the parts.
+        partition_column (str): The column the parts were split by.
+
+    Returns:
+        SinkOptions: The output format settings of the merged file.
+    """
+    if not sink_options.sorting_columns:
+        return sink_options
+
+    column, order = split_column_spec(spec=sink_options.sorting_columns[0])
+    if column == partition_column and order in (None, "asc"):
+        return sink_options
+
+    logger.warning(
+        f"Merged parts are only ordered by '{partition_column}', "
+        "dropping the sorting columns of the merged file"
+    )
+    return replace(sink_options, sorting_columns=[])
+
+
+def merge_part_files(
+    part_files: list[Path],
+    output_file: Path,
+    schema: Schema,
+    sink_options: SinkOptions,
+) -> None:
+    """
+    Streams the part files into the output file and removes them.
+
+    Without part files, the output file is written empty with the schema.
+
+    Args:
+        part_files (list[Path]): The paths to the part files, in output order.
+        output_file (Path): The path to the merged output file.
+        schema (Schema): The schema of the part files.
+        sink_options (SinkOptions): The output format settings.
+    """
+    output_format = sink_options.output_format
+
+    with open_sink(
+        where=output_file, schema=schema, options=sink_options
+    ) as writer:
+        for part_file in part_files:
+            for batch in read_batches(
+                where=part_file, output_format=output_format
+            ):
+                writer.write_batch(batch)
+
+    for part_file in part_files:
+        part_file.unlink()
+    logger.info(f"Merged {len(part_files)} part files into: {output_file}")
+
+
+def export_query_partitions(
+    dsn: str,
+    output_file: Path,
+    batch_size: int,
+    query: str,
+    partition_column: str,
+    partitions: int,
+    lower_bound: str | None = None,
+    upper_bound: str | None = None,
+    merge: bool = False,
+    sink_options: SinkOptions | None = None,
+    throttle: Throttle | None = None,
+    **export_options: Any,
+) -> list[Path]:
+    """
+    Exports a custom query split by ranges of a column in parallel processes.
+
+    All the workers read the snapshot exported by one coordinating transaction,
+    so the parts are consistent with each other.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        output_file (Path): The path to the output file.
+        batch_size (int): The number of rows to process in each batch.
+        query (str): SQL query to execute.
+        partition_column (str): The column of the query result to split the ranges by.
+        partitions (int): The number of partitions exported in parallel.
+        lower_bound (str | None, optional): The lower bound of the column range, converted to the column type by the server, queried if None. Defaults to None.
+        upper_bound (str | None, optional): The upper bound of the column range, converted to the column type by the server, queried if None. Defaults to None.
+        merge (bool, optional): Whether to merge the part files into the output file. Defaults to False.
+        sink_options (SinkOptions | None, optional): The output format settings. Defaults to Parquet.
+        throttle (Throttle | None, optional): The limiter of the read rate, its limits divided between the workers. Defaults to None.
+        **export_options (Any): Other options passed to `export_to_parquet`.
+
+    Returns:
+        list[Path]: The written files, the part files unless they are merged.
+    """
+    sink_options = sink_options or SinkOptions()
+
+    lower, upper = get_query_column_range(
+        dsn=dsn,
+        query=query,
+        column=partition_column,
+        lower=lower_bound,
+        upper=upper_bound,
+    )
+
+    boundaries = []
+    if lower is not None and upper is not None:
+        boundaries = get_partition_boundaries(
+            lower=lower, upper=upper, partitions=partitions
+        )
+    partition_queries = get_partition_queries(
+        query=query, column=partition_column, boundaries=boundaries
+    )
+    logger.info(
+        f"Exporting {len(partition_queries)} partitions of column "
+        f"'{partition_column}' between {lower} and {upper}"
+    )
+
+    data_types = get_query_data_types(dsn=dsn, query=query)
+    schema = get_output_schema(
+        data_types=data_types,
+        large_values=export_options.get("large_values", False),
+        transforms=export_options.get("transforms"),
+    )
+
+    part_files = [
+        get_part_file(output_file=output_file, index=index)
+        for index in range(len(partition_queries))
+    ]
+
+    if throttle:
+        # Every worker process gets its own copy of the throttle
+        throttle = Throttle(
+            limits=throttle.limits.split(workers=len(partition_queries)),
+            dsn=throttle.dsn,
+        )
+
+    with export_snapshot(dsn=dsn) as snapshot:
+        # Forked workers would share the socket of the connection holding
+        # the snapshot, so they are spawned as fresh interpreters instead.
+        with ProcessPoolExecutor(
+            max_workers=len(partition_queries),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    export_to_parquet,
+                    dsn=dsn,
+                    output_file=part_file,
+                    batch_size=batch_size,
+                    query=partition_query,
+                    sink_options=sink_options,
+                    data_types=data_types,
+                    snapshot=snapshot,
+                    throttle=throttle,
+                    **export_options,
+                )
+                for part_file, partition_query in zip(
+                    part_files, partition_queries
+                )
+            ]
+            written_files = [
+                written_file
+                for future in futures
+                for written_file in future.result()
+            ]
+
+    if not merge:
+        return written_files
+
+    merge_part_files(
+        part_files=written_files,
+        output_file=output_file,
+        schema=schema,
+        sink_options=get_merged_sink_options(
+            sink_options=sink_options, partition_column=partition_column
+        ),
+    )
+    return [output_file]
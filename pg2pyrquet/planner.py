@@ -0,0 +1,250 @@
+"""
+Planning of exports from the size estimated by the database.
+
+The planner turns the estimated row count and row width of a table or query
+into the export settings: the batch size, the number of parallel workers, the
+size of the rolled output files and the compression codec.
+"""
+
+import os
+from dataclasses import dataclass, replace
+
+from pg2pyrquet.compact import DEFAULT_TARGET_FILE_BYTES
+from pg2pyrquet.export import DEFAULT_MAX_BATCH_BYTES
+from pg2pyrquet.utils.postgres import get_query_estimate, get_table_estimate
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+
+# Bounds of the planned batch size, in rows
+MIN_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 1_000_000
+
+# Estimated bytes exported by one parallel worker
+BYTES_PER_WORKER = 1024 * 1024 * 1024
+
+# Estimated bytes above which the output favors the compression ratio over
+# the compression speed
+LARGE_EXPORT_BYTES = 1024 * 1024 * 1024
+
+# Fast and compact compression codecs of the output formats
+COMPRESSION_PROFILES = {
+    OutputFormat.PARQUET: ("snappy", "zstd"),
+    OutputFormat.ARROW_IPC: ("lz4", "zstd"),
+    OutputFormat.ARROW_IPC_STREAM: ("lz4", "zstd"),
+}
+
+
+@dataclass
+class ExportPlan:
+    """
+    Settings of an export chosen from its estimated size.
+
+    Attributes:
+        name (str): The name of the exported table or query.
+        rows (int): The estimated number of rows.
+        row_bytes (int): The estimated width of a row in bytes.
+        batch_size (int): The number of rows in each batch.
+        workers (int): The number of parallel workers.
+        max_file_bytes (int | None): The size the output is rolled over at,
+            None to write a single file.
+        compression (str): The compression codec.
+    """
+
+    name: str
+    rows: int
+    row_bytes: int
+    batch_size: int
+    workers: int
+    max_file_bytes: int | None
+    compression: str
+
+    @property
+    def total_bytes(self) -> int:
+        """
+        Returns the estimated size of the export in bytes.
+        """
+        return self.rows * self.row_bytes
+
+
+def plan_export(
+    name: str,
+    rows: int,
+    row_bytes: int,
+    output_format: OutputFormat = OutputFormat.PARQUET,
+    parallel: bool = False,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+) -> ExportPlan:
+    """
+    Chooses the settings of an export from its estimated size.
+
+    Args:
+        name (str): The name of the exported table or query.
+        rows (int): The estimated number of rows.
+        row_bytes (int): The estimated width of a row in bytes.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        parallel (bool, optional): Whether the export can be split between workers. Defaults to False.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+
+    Returns:
+        ExportPlan: The planned export settings.
+    """
+    rows = max(rows, 0)
+    row_bytes = max(row_bytes, 1)
+    total_bytes = rows * row_bytes
+
+    batch_size = max_batch_bytes // row_bytes
+    batch_size = max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, batch_size))
+
+    workers = 1
+    if parallel:
+        workers = max(
+            1, min(os.cpu_count() or 1, total_bytes // BYTES_PER_WORKER)
+        )
+
+    max_file_bytes = None
+    if total_bytes > DEFAULT_TARGET_FILE_BYTES:
+        max_file_bytes = DEFAULT_TARGET_FILE_BYTES
+
+    fast, compact = COMPRESSION_PROFILES[OutputFormat(output_format)]
+    compression = compact if total_bytes > LARGE_EXPORT_BYTES else fast
+
+    return ExportPlan(
+        name=name,
+        rows=rows,
+        row_bytes=row_bytes,
+        batch_size=batch_size,
+        workers=workers,
+        max_file_bytes=max_file_bytes,
+        compression=compression,
+    )
+
+
+def plan_table_export(
+    dsn: str,
+    table: str,
+    output_format: OutputFormat = OutputFormat.PARQUET,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+) -> ExportPlan:
+    """
+    Plans the export of a table from its statistics.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+
+    Returns:
+        ExportPlan: The planned export settings.
+    """
+    rows, row_bytes = get_table_estimate(dsn=dsn, table=table)
+    return plan_export(
+        name=table,
+        rows=rows,
+        row_bytes=row_bytes,
+        output_format=output_format,
+        max_batch_bytes=max_batch_bytes,
+    )
+
+
+def plan_query_export(
+    dsn: str,
+    name: str,
+    query: str,
+    output_format: OutputFormat = OutputFormat.PARQUET,
+    parallel: bool = False,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+) -> ExportPlan:
+    """
+    Plans the export of a custom query from the estimate of its query plan.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        name (str): The name of the query shown in the plan.
+        query (str): The query to export.
+        output_format (OutputFormat, optional): The output file format. Defaults to Parquet.
+        parallel (bool, optional): Whether the export can be split between workers. Defaults to False.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+
+    Returns:
+        ExportPlan: The planned export settings.
+    """
+    rows, row_bytes = get_query_estimate(dsn=dsn, query=query)
+    return plan_export(
+        name=name,
+        rows=rows,
+        row_bytes=row_bytes,
+        output_format=output_format,
+        parallel=parallel,
+        max_batch_bytes=max_batch_bytes,
+    )
+
+
+def apply_plan(
+    plan: ExportPlan,
+    batch_size: int | None,
+    sink_options: SinkOptions,
+    max_file_bytes: int | None,
+) -> tuple[int, SinkOptions, int | None]:
+    """
+    Applies an export plan to the export settings.
+
+    An explicitly chosen batch size, compression codec and file size take
+    precedence over the planned ones.
+
+    Args:
+        plan (ExportPlan): The export plan.
+        batch_size (int | None): The explicitly chosen batch size.
+        sink_options (SinkOptions): The output format settings.
+        max_file_bytes (int | None): The explicitly chosen file size.
+
+    Returns:
+        tuple[int, SinkOptions, int | None]: The batch size, the output format
+            settings and the file size of the export.
+    """
+    return (
+        batch_size or plan.batch_size,
+        replace(
+            sink_options,
+            compression=sink_options.compression or plan.compression,
+        ),
+        max_file_bytes or plan.max_file_bytes,
+    )
+
+
+def format_size(size: int) -> str:
+    """
+    Formats a size in bytes with a binary unit.
+
+    Args:
+        size (int): The size in bytes.
+
+    Returns:
+        str: The formatted size, like "1.5 GiB".
+    """
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+
+def format_plan(plan: ExportPlan) -> str:
+    """
+    Formats an export plan for printing.
+
+    Args:
+        plan (ExportPlan): The export plan.
+
+    Returns:
+        str: The plan, on one line.
+    """
+    rolling = "single file"
+    if plan.max_file_bytes:
+        rolling = f"roll at {format_size(plan.max_file_bytes)}"
+    return (
+        f"{plan.name}: ~{plan.rows} rows x {plan.row_bytes} B "
+        f"= {format_size(plan.total_bytes)}; "
+        f"batch size {plan.batch_size}, {plan.workers} worker(s), "
+        f"{rolling}, {plan.compression} compression"
+    )
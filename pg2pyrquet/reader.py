@@ -0,0 +1,176 @@
+"""
+In-memory streaming of query results as Arrow record batches.
+
+The readers use the same type mapping, batching and transforms as the exports,
+so in-process consumers get the data without writing and reading back files.
+"""
+
+from collections.abc import Iterator
+
+import psycopg
+import pyarrow as pa
+from pyarrow import DataType, RecordBatch, RecordBatchReader, Schema
+
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_BYTES,
+    fetch_record_batches,
+)
+from pg2pyrquet.utils.nested import (
+    is_nested_arrow_type,
+    register_nested_loaders,
+)
+from pg2pyrquet.utils.parquet import promote_large_types
+from pg2pyrquet.utils.postgres import (
+    get_default_query,
+    get_query_data_types,
+    register_raw_text_loaders,
+    set_transaction_snapshot,
+    strip_query,
+    validate_table_exists,
+)
+from pg2pyrquet.utils.transforms import (
+    Transform,
+    apply_transforms,
+    get_transformed_schema,
+)
+
+logger = get_logger(name=__name__)
+
+
+def iter_query_batches(
+    dsn: str,
+    query: str,
+    data_types: dict[str, DataType],
+    schema: Schema,
+    batch_size: int,
+    max_batch_bytes: int,
+    transforms: list[Transform],
+    snapshot: str | None = None,
+) -> Iterator[RecordBatch]:
+    """
+    Fetches the result of a query as transformed record batches.
+
+    The connection is opened on the first batch and closed when the iterator
+    is exhausted or closed.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        query (str): SQL query to execute.
+        data_types (dict[str, DataType]): A dictionary mapping column names to their data types.
+        schema (Schema): The schema of the fetched record batches.
+        batch_size (int): The maximum number of rows in a batch.
+        max_batch_bytes (int): The maximum size of a batch in bytes.
+        transforms (list[Transform]): The column transforms applied to every batch.
+        snapshot (str | None, optional): The exported snapshot to read the data from. Defaults to None.
+
+    Yields:
+        RecordBatch: The transformed record batches.
+    """
+    with psycopg.connect(dsn) as conn:
+        register_raw_text_loaders(conn=conn)
+        if any(map(is_nested_arrow_type, data_types.values())):
+            register_nested_loaders(conn=conn, query=strip_query(query))
+            conn.commit()
+        if snapshot:
+            set_transaction_snapshot(conn=conn, snapshot=snapshot)
+
+        with conn.cursor(name="pg-to-arrow") as cur:
+            cur.execute(query)
+            for batch in fetch_record_batches(
+                cursor=cur,
+                fields_types=data_types,
+                schema=schema,
+                batch_size=batch_size,
+                max_batch_bytes=max_batch_bytes,
+            ):
+                yield apply_transforms(batch=batch, transforms=transforms)
+
+
+def read_query(
+    dsn: str,
+    query: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    large_values: bool = False,
+    transforms: list[Transform] | None = None,
+    snapshot: str | None = None,
+) -> RecordBatchReader:
+    """
+    Streams the result of a custom query as Arrow record batches.
+
+    The batches are fetched lazily with a server-side cursor, so the reader
+    can be consumed by DuckDB, Polars or any Arrow stream consumer without
+    holding the whole result in memory.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        query (str): SQL query to execute.
+        batch_size (int, optional): The maximum number of rows in a batch. Defaults to DEFAULT_BATCH_SIZE.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+        large_values (bool, optional): Whether to read binary and string columns with the large types. Defaults to False.
+        transforms (list[Transform] | None, optional): The column transforms applied to every batch. Defaults to None.
+        snapshot (str | None, optional): The exported snapshot to read the data from. Defaults to None.
+
+    Returns:
+        RecordBatchReader: The reader of the query result.
+    """
+    data_types = get_query_data_types(dsn=dsn, query=query)
+    if large_values:
+        data_types = promote_large_types(fields_types=data_types)
+    schema = pa.schema(fields=data_types)
+    transforms = transforms or []
+
+    return RecordBatchReader.from_batches(
+        get_transformed_schema(schema=schema, transforms=transforms),
+        iter_query_batches(
+            dsn=dsn,
+            query=query,
+            data_types=data_types,
+            schema=schema,
+            batch_size=batch_size,
+            max_batch_bytes=max_batch_bytes,
+            transforms=transforms,
+            snapshot=snapshot,
+        ),
+    )
+
+
+def read_table(
+    dsn: str,
+    table: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    large_values: bool = False,
+    transforms: list[Transform] | None = None,
+    snapshot: str | None = None,
+) -> RecordBatchReader:
+    """
+    Streams all rows of a table as Arrow record batches.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table to read.
+        batch_size (int, optional): The maximum number of rows in a batch. Defaults to DEFAULT_BATCH_SIZE.
+        max_batch_bytes (int, optional): The maximum size of a batch in bytes. Defaults to DEFAULT_MAX_BATCH_BYTES.
+        large_values (bool, optional): Whether to read binary and string columns with the large types. Defaults to False.
+        transforms (list[Transform] | None, optional): The column transforms applied to every batch. Defaults to None.
+        snapshot (str | None, optional): The exported snapshot to read the data from. Defaults to None.
+
+    Returns:
+        RecordBatchReader: The reader of the table rows.
+
+    Raises:
+        TableDoesNotExistError: If the table does not exist in the database.
+    """
+    table = validate_table_exists(dsn=dsn, table=table)
+    return read_query(
+        dsn=dsn,
+        query=get_default_query(table=table),
+        batch_size=batch_size,
+        max_batch_bytes=max_batch_bytes,
+        large_values=large_values,
+        transforms=transforms,
+        snapshot=snapshot,
+    )
@@ -0,0 +1,83 @@
+"""
+Export of many named queries in one session.
+
+The queries share one connection pool, so a sequential export runs all of them
+over one connection. A consistent export imports the snapshot of one
+REPEATABLE READ transaction in every query, so the outputs are consistent with
+each other even when the queries run in parallel threads.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any
+
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import export_to_parquet
+from pg2pyrquet.utils.pool import ConnectionPool
+from pg2pyrquet.utils.postgres import export_snapshot, get_queries_data_types
+from pg2pyrquet.utils.sinks import SinkOptions
+
+logger = get_logger(name=__name__)
+
+
+def export_named_queries(
+    dsn: str,
+    queries: dict[str, str],
+    output_path: Path,
+    batch_size: int,
+    sink_options: SinkOptions | None = None,
+    consistent: bool = False,
+    parallel: int = 1,
+    **export_options: Any,
+) -> dict[str, list[Path]]:
+    """
+    Exports every named query to its own file.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        queries (dict[str, str]): A dictionary mapping the query names to the queries.
+        output_path (Path): The directory where the files will be saved, named after the queries.
+        batch_size (int): The number of rows to process in each batch.
+        sink_options (SinkOptions | None, optional): The output format settings. Defaults to Parquet.
+        consistent (bool, optional): Whether all the queries read one snapshot. Defaults to False.
+        parallel (int, optional): The number of queries exported at the same time. Defaults to 1.
+        **export_options (Any): Other options passed to `export_to_parquet`.
+
+    Returns:
+        dict[str, list[Path]]: A dictionary mapping the query names to their written files.
+    """
+    sink_options = sink_options or SinkOptions()
+    extension = sink_options.output_format.extension
+    data_types = get_queries_data_types(dsn=dsn, queries=queries)
+    logger.info(
+        f"Exporting {len(queries)} queries with {parallel} worker(s)"
+        f"{' from one snapshot' if consistent else ''}"
+    )
+
+    pool = ConnectionPool(dsn=dsn)
+    with ExitStack() as stack:
+        stack.callback(pool.close)
+        snapshot = (
+            stack.enter_context(export_snapshot(dsn=dsn))
+            if consistent
+            else None
+        )
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = {
+                name: executor.submit(
+                    export_to_parquet,
+                    dsn=dsn,
+                    output_file=output_path / f"{name}{extension}",
+                    batch_size=batch_size,
+                    query=query,
+                    sink_options=sink_options,
+                    data_types=data_types[name],
+                    snapshot=snapshot,
+                    pool=pool,
+                    **export_options,
+                )
+                for name, query in queries.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,429 @@
+"""
+Change data capture of tables into micro-batch files.
+
+The changes are decoded from a logical replication slot with the wal2json
+plugin, through the SQL functions of logical decoding. Every poll peeks the
+changes after the confirmed position of the slot without consuming them, and
+the slot is advanced only after the files holding them are flushed to the
+disk. A crash re-delivers the changes of the last micro-batch instead of
+losing them, so every change is written at least once.
+
+The initial snapshot of every table is marked complete by a marker file next
+to its files. A slot whose snapshot failed is dropped, and a stream does not
+resume from a slot whose tables lack the marker, since the changes before the
+slot would be missing.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import psycopg
+import pyarrow as pa
+from psycopg import sql
+from psycopg.types.json import Jsonb
+from pyarrow import DataType, RecordBatch
+
+from pg2pyrquet.core.exceptions import IncompleteSnapshotError
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.export import export_to_parquet
+from pg2pyrquet.utils.files import sync_path
+from pg2pyrquet.utils.nested import (
+    is_nested_arrow_type,
+    register_nested_loaders,
+)
+from pg2pyrquet.utils.parquet import build_record_batch
+from pg2pyrquet.utils.postgres import (
+    DEFAULT_SCHEMA,
+    advance_slot,
+    create_replication_slot,
+    drop_replication_slot,
+    get_default_query,
+    get_query_data_types,
+    get_table_name,
+    peek_slot_changes,
+    register_raw_text_loaders,
+    strip_query,
+)
+from pg2pyrquet.utils.sinks import SinkOptions, open_sink
+
+logger = get_logger(name=__name__)
+
+# Number of decoded changes after which a micro-batch is written at once
+DEFAULT_MAX_CHANGES = 100_000
+
+# Interval between two micro-batches while the changes arrive slower, in seconds
+DEFAULT_FLUSH_SECONDS = 60.0
+
+# Columns added to every change row, the LSN and the operation of the change
+LSN_COLUMN = "_lsn"
+OPERATION_COLUMN = "_op"
+
+# Options of the wal2json plugin, one document per change with the begin and
+# commit records marking the transaction boundaries
+WAL2JSON_OPTIONS = {"format-version": "2", "include-transaction": "true"}
+
+# Actions of the records that do not change a table row
+TRANSACTION_ACTIONS = ("B", "C", "M")
+
+# Name of the file marking the initial snapshot of a table complete, holding
+# the name of the slot the snapshot was exported for
+SNAPSHOT_MARKER = "_snapshot_complete"
+
+# Query to convert the decoded rows to the column types of their table
+SELECT_CHANGE_ROWS_QUERY = (
+    "SELECT * FROM jsonb_populate_recordset(NULL::{table_name}, %(rows)s);"
+)
+
+
+def parse_lsn(lsn: str) -> int:
+    """
+    Converts an LSN in the "XXX/XXX" text form to its position.
+
+    Args:
+        lsn (str): The LSN text.
+
+    Returns:
+        int: The WAL position of the LSN.
+    """
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def get_qualified_name(table: str) -> str:
+    """
+    Qualifies a table name by its schema, as the wal2json filters name tables.
+
+    Args:
+        table (str): The name of the table, qualified outside the "public" schema.
+
+    Returns:
+        str: The name qualified by the schema.
+    """
+    return table if "." in table else f"{DEFAULT_SCHEMA}.{table}"
+
+
+def get_change_data_types(
+    data_types: dict[str, DataType]
+) -> dict[str, DataType]:
+    """
+    Adds the LSN and operation columns to the column types of a table.
+
+    Args:
+        data_types (dict[str, DataType]): A dictionary mapping the table columns to their data types.
+
+    Returns:
+        dict[str, DataType]: The data types of the change rows.
+    """
+    return {
+        LSN_COLUMN: pa.string(),
+        OPERATION_COLUMN: pa.string(),
+        **data_types,
+    }
+
+
+def group_changes(
+    changes: list[tuple[str, str]]
+) -> dict[str, list[tuple[str, str, dict]]]:
+    """
+    Groups the decoded row changes by their table.
+
+    Deletes carry only the replica identity of the row, and truncates no
+    columns at all.
+
+    Args:
+        changes (list[tuple[str, str]]): The LSN and the wal2json document of every change.
+
+    Returns:
+        dict[str, list[tuple[str, str, dict]]]: A dictionary mapping the table
+            names to the LSN, the operation and the column values of their
+            changes, in the commit order.
+    """
+    grouped: dict[str, list[tuple[str, str, dict]]] = {}
+    for lsn, data in changes:
+        change = json.loads(data)
+        if change["action"] in TRANSACTION_ACTIONS:
+            continue
+
+        table = get_table_name(schema=change["schema"], table=change["table"])
+        columns = change.get("columns") or change.get("identity") or []
+        grouped.setdefault(table, []).append(
+            (
+                lsn,
+                change["action"],
+                {column["name"]: column["value"] for column in columns},
+            )
+        )
+    return grouped
+
+
+def load_change_rows(
+    conn: psycopg.Connection, table: str, changes: list[tuple[str, str, dict]]
+) -> list[tuple]:
+    """
+    Converts the decoded changes of a table to rows of its column types.
+
+    The server parses the decoded values with the input functions of the
+    columns, so the change rows are loaded like the rows of an export.
+
+    Args:
+        conn (psycopg.Connection): The connection to convert the values with.
+        table (str): The name of the table.
+        changes (list[tuple[str, str, dict]]): The LSN, the operation and the column values of every change.
+
+    Returns:
+        list[tuple]: The change rows, starting with the LSN and operation.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL(SELECT_CHANGE_ROWS_QUERY).format(
+                table_name=sql.SQL(table)
+            ),
+            {"rows": Jsonb([values for _, _, values in changes])},
+        )
+        return [
+            (lsn, operation, *row)
+            for (lsn, operation, _), row in zip(changes, cur.fetchall())
+        ]
+
+
+def write_change_file(
+    path: Path, batch: RecordBatch, sink_options: SinkOptions
+) -> None:
+    """
+    Durably writes a micro-batch file.
+
+    The batch is written to a temporary file that is flushed to the disk and
+    renamed, so the file either holds the whole batch or does not exist.
+
+    Args:
+        path (Path): The path of the file.
+        batch (RecordBatch): The change rows.
+        sink_options (SinkOptions): The output format settings.
+    """
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with open_sink(
+        where=temp_path, schema=batch.schema, options=sink_options
+    ) as sink:
+        sink.write_batch(batch)
+
+    sync_path(temp_path)
+    os.replace(temp_path, path)
+    sync_path(path.parent)
+
+
+def write_snapshot_marker(table_path: Path, slot: str) -> None:
+    """
+    Durably marks the initial snapshot of a table complete.
+
+    Args:
+        table_path (Path): The folder of the files of the table.
+        slot (str): The name of the replication slot.
+    """
+    marker_path = table_path / SNAPSHOT_MARKER
+    marker_path.write_text(slot)
+    sync_path(marker_path)
+    sync_path(table_path)
+
+
+def validate_snapshot_complete(
+    output_path: Path, tables: list[str], slot: str
+) -> None:
+    """
+    Validates that the initial snapshot of every table was exported for a slot.
+
+    Args:
+        output_path (Path): The directory with a folder of files per table.
+        tables (list[str]): The names of the streamed tables.
+        slot (str): The name of the replication slot.
+
+    Raises:
+        IncompleteSnapshotError: If a table has no complete snapshot for the slot.
+    """
+    incomplete = [
+        table
+        for table in tables
+        if not (
+            marker_path := output_path / table / SNAPSHOT_MARKER
+        ).is_file()
+        or marker_path.read_text() != slot
+    ]
+    if incomplete:
+        raise IncompleteSnapshotError(
+            f"The initial snapshot of replication slot {slot} did not "
+            f"complete for: {', '.join(incomplete)}. Drop the slot to export "
+            "the snapshot again, or pass --no-initial-snapshot to stream "
+            "without it."
+        )
+
+
+def create_stream_slot(
+    dsn: str,
+    slot: str,
+    tables: list[str],
+    output_path: Path,
+    batch_size: int,
+    sink_options: SinkOptions | None = None,
+    initial_snapshot: bool = True,
+) -> dict[str, list[Path]]:
+    """
+    Creates the replication slot of a stream and exports its initial snapshot.
+
+    The tables are exported from the snapshot the slot starts at, so the
+    snapshot files and the streamed changes neither overlap nor miss a
+    transaction. Once every table is exported, their snapshots are marked
+    complete. If the snapshot fails, the slot is dropped, so the next run
+    creates it again instead of streaming without the snapshot.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        slot (str): The name of the replication slot.
+        tables (list[str]): The names of the streamed tables.
+        output_path (Path): The directory with a folder of files per table.
+        batch_size (int): The number of rows to process in each batch.
+        sink_options (SinkOptions | None, optional): The output format settings. Defaults to Parquet.
+        initial_snapshot (bool, optional): Whether to export the tables before streaming. Defaults to True.
+
+    Returns:
+        dict[str, list[Path]]: A dictionary mapping the table names to their snapshot files.
+    """
+    sink_options = sink_options or SinkOptions()
+    extension = sink_options.output_format.extension
+    files: dict[str, list[Path]] = {}
+
+    try:
+        with create_replication_slot(dsn=dsn, slot=slot) as snapshot:
+            if not initial_snapshot:
+                return files
+
+            for table in tables:
+                table_path = output_path / table
+                table_path.mkdir(parents=True, exist_ok=True)
+                (table_path / SNAPSHOT_MARKER).unlink(missing_ok=True)
+                files[table] = export_to_parquet(
+                    dsn=dsn,
+                    output_file=table_path / f"snapshot{extension}",
+                    batch_size=batch_size,
+                    query=get_default_query(table=table),
+                    sink_options=sink_options,
+                    snapshot=snapshot,
+                )
+    except BaseException:
+        logger.warning(
+            f"Dropping replication slot {slot}, the initial snapshot failed"
+        )
+        try:
+            drop_replication_slot(dsn=dsn, slot=slot)
+        except psycopg.Error as e:
+            logger.error(f"Failed to drop replication slot {slot}: {e}")
+        raise
+
+    for table in tables:
+        write_snapshot_marker(table_path=output_path / table, slot=slot)
+    return files
+
+
+def stream_changes(
+    dsn: str,
+    slot: str,
+    tables: list[str],
+    output_path: Path,
+    sink_options: SinkOptions | None = None,
+    max_changes: int = DEFAULT_MAX_CHANGES,
+    flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+    max_batches: int | None = None,
+) -> int:
+    """
+    Writes the changes of tables to micro-batch files until stopped.
+
+    A micro-batch is written as soon as `max_changes` changes are pending, or
+    every `flush_seconds` otherwise. Every micro-batch writes one file per
+    changed table, named after the LSN of the last decoded record, and then
+    advances the slot past the written changes.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        slot (str): The name of the replication slot.
+        tables (list[str]): The names of the streamed tables.
+        output_path (Path): The directory with a folder of files per table.
+        sink_options (SinkOptions | None, optional): The output format settings. Defaults to Parquet.
+        max_changes (int, optional): The number of changes written at once. Defaults to DEFAULT_MAX_CHANGES.
+        flush_seconds (float, optional): The interval between micro-batches in seconds. Defaults to DEFAULT_FLUSH_SECONDS.
+        max_batches (int | None, optional): The number of micro-batches, empty or not, to poll before returning. Defaults to None, to stream forever.
+
+    Returns:
+        int: The number of written change rows.
+    """
+    sink_options = sink_options or SinkOptions()
+    extension = sink_options.output_format.extension
+    options = {
+        **WAL2JSON_OPTIONS,
+        "add-tables": ",".join(map(get_qualified_name, tables)),
+    }
+    data_types = {
+        table: get_change_data_types(
+            data_types=get_query_data_types(
+                dsn=dsn, query=get_default_query(table=table)
+            )
+        )
+        for table in tables
+    }
+    for table in tables:
+        (output_path / table).mkdir(parents=True, exist_ok=True)
+
+    written_rows = 0
+    batches = 0
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        register_raw_text_loaders(conn=conn)
+        for table in tables:
+            if any(map(is_nested_arrow_type, data_types[table].values())):
+                register_nested_loaders(
+                    conn=conn,
+                    query=strip_query(get_default_query(table=table)),
+                )
+
+        while True:
+            started = time.monotonic()
+            changes = peek_slot_changes(
+                conn=conn, slot=slot, max_changes=max_changes, options=options
+            )
+            if changes:
+                last_lsn = changes[-1][0]
+                for table, table_changes in group_changes(
+                    changes=changes
+                ).items():
+                    if table not in data_types:
+                        continue
+                    batch = build_record_batch(
+                        fields_types=data_types[table],
+                        rows=load_change_rows(
+                            conn=conn, table=table, changes=table_changes
+                        ),
+                        schema=pa.schema(fields=data_types[table]),
+                    )
+                    write_change_file(
+                        path=output_path
+                        / table
+                        / f"changes-{parse_lsn(last_lsn):016X}{extension}",
+                        batch=batch,
+                        sink_options=sink_options,
+                    )
+                    written_rows += batch.num_rows
+                    logger.info(
+                        "Wrote %d changes of %s",
+                        batch.num_rows,
+                        table,
+                        extra={"table": table, "rows": batch.num_rows},
+                    )
+
+                advance_slot(conn=conn, slot=slot, lsn=last_lsn)
+
+            batches += 1
+            if max_batches is not None and batches >= max_batches:
+                break
+            if len(changes) < max_changes:
+                time.sleep(
+                    max(0.0, flush_seconds - (time.monotonic() - started))
+                )
+    return written_rows
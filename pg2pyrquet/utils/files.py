@@ -1,7 +1,56 @@
+import os
+import re
 from pathlib import Path
 
 from pg2pyrquet.core.exceptions import InvalidQueryError
 
+# Comment line starting a named statement in a query file, like "-- name: orders"
+QUERY_NAME_PATTERN = re.compile(r"^--\s*name:\s*(\S+)\s*$", re.MULTILINE)
+
+# Characters allowed in query names, which name the output files
+VALID_QUERY_NAME_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
+
+
+def validate_query(query: str) -> str:
+    """
+    Validates that the query is a SELECT statement.
+
+    Args:
+        query (str): The query to validate.
+
+    Returns:
+        str: The validated query.
+
+    Raises:
+        InvalidQueryError: If the query is invalid.
+    """
+    if "select" not in query.lower():
+        raise InvalidQueryError("Query must contain a SELECT statement.")
+
+    return query
+
+
+def validate_query_name(name: str) -> str:
+    """
+    Validates that a query name is a plain file name.
+
+    Args:
+        name (str): The name of the query.
+
+    Returns:
+        str: The validated name.
+
+    Raises:
+        InvalidQueryError: If the name holds other characters than letters, digits, "_", "." and "-", or "..".
+    """
+    if not VALID_QUERY_NAME_PATTERN.fullmatch(name) or ".." in name:
+        raise InvalidQueryError(
+            f"Query name '{name}' must only contain letters, digits, '_', "
+            "'.' and '-', without '..'."
+        )
+
+    return name
+
 
 def read_query_from_file(query_path: Path) -> str:
     """
@@ -19,7 +68,78 @@ def read_query_from_file(query_path: Path) -> str:
     with open(query_path) as file:
         query = file.read()
 
-    if "select" not in query.lower():
-        raise InvalidQueryError("Query must contain a SELECT statement.")
+    return validate_query(query=query)
 
-    return query
+
+def read_named_queries(query_path: Path) -> dict[str, str]:
+    """
+    Reads the named queries of a query file or of all query files of a folder.
+
+    A file holds either one query, named after the file, or several queries,
+    each starting with a "-- name: <name>" comment line:
+
+        -- name: orders
+        SELECT * FROM orders;
+
+        -- name: order_totals
+        SELECT customer_id, sum(total) FROM orders GROUP BY customer_id;
+
+    Args:
+        query_path (Path): The path to the query file, or to a folder of ".sql" files.
+
+    Returns:
+        dict[str, str]: A dictionary mapping the query names to the queries, in the file order.
+
+    Raises:
+        InvalidQueryError: If a query is invalid or a name is invalid or used twice.
+    """
+    query_files = (
+        sorted(query_path.glob("*.sql"))
+        if query_path.is_dir()
+        else [query_path]
+    )
+
+    queries: dict[str, str] = {}
+    for query_file in query_files:
+        content = query_file.read_text()
+        parts = QUERY_NAME_PATTERN.split(content)
+        if len(parts) == 1:
+            named = [(query_file.stem, content)]
+        elif any(
+            line.strip() and not line.strip().startswith("--")
+            for line in parts[0].splitlines()
+        ):
+            raise InvalidQueryError(
+                f"Query file '{query_file}' has a statement before its "
+                "first '-- name:' line."
+            )
+        else:
+            named = [
+                (validate_query_name(name=name), query)
+                for name, query in zip(parts[1::2], parts[2::2])
+            ]
+
+        for name, query in named:
+            if name in queries:
+                raise InvalidQueryError(
+                    f"Query name '{name}' is used more than once."
+                )
+            queries[name] = validate_query(query=query.strip())
+
+    if not queries:
+        raise InvalidQueryError(f"No queries found in '{query_path}'.")
+    return queries
+
+
+def sync_path(path: Path) -> None:
+    """
+    Flushes a file, or the entries of a directory, to the disk.
+
+    Args:
+        path (Path): The path of the file or directory.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
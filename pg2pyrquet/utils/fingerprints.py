@@ -0,0 +1,48 @@
+"""
+Manifest of the table fingerprints recorded by the previous export.
+"""
+
+import json
+import os
+from pathlib import Path
+
+# Name of the manifest file stored next to the exported files
+FINGERPRINTS_FILE_NAME = "_fingerprints.json"
+
+
+def read_fingerprints(output_path: Path) -> dict[str, str]:
+    """
+    Reads the table fingerprints recorded in the output directory.
+
+    Args:
+        output_path (Path): The directory with the exported files.
+
+    Returns:
+        dict[str, str]: A dictionary mapping table names to their fingerprints,
+            empty if no export recorded them yet.
+    """
+    manifest_path = output_path / FINGERPRINTS_FILE_NAME
+    if not manifest_path.exists():
+        return {}
+
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def write_fingerprints(
+    output_path: Path, fingerprints: dict[str, str]
+) -> None:
+    """
+    Atomically replaces the table fingerprints recorded in the output directory.
+
+    Args:
+        output_path (Path): The directory with the exported files.
+        fingerprints (dict[str, str]): A dictionary mapping table names to their fingerprints.
+    """
+    manifest_path = output_path / FINGERPRINTS_FILE_NAME
+    temp_path = manifest_path.with_suffix(".tmp")
+
+    with open(temp_path, "w") as file:
+        json.dump(fingerprints, file, indent=2, sort_keys=True)
+
+    os.replace(temp_path, manifest_path)
@@ -0,0 +1,504 @@
+"""
+Native Arrow types for the nested PostgreSQL types.
+
+Composite types become structs, `hstore` becomes a string to string map, ranges
+become structs of their bounds and arrays become lists, nested once per
+declared dimension. The types are resolved from the PostgreSQL catalog, and
+the loaders of composite, `hstore` and custom range types are registered on
+the export connection, so the values arrive as tuples, dicts and ranges that
+are converted to Arrow without parsing their text.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+import psycopg
+import pyarrow as pa
+from psycopg import sql
+from psycopg.types import TypeInfo
+from psycopg.types.composite import CompositeInfo, register_composite
+from psycopg.types.hstore import register_hstore
+from psycopg.types.range import Range, RangeInfo, register_range
+from pyarrow import DataType
+
+from pg2pyrquet.core.logging import get_logger
+
+logger = get_logger(name=__name__)
+
+# Query to describe types by their OIDs
+SELECT_TYPES_QUERY = """
+    SELECT
+        t.oid, n.nspname, t.typname, t.typtype, t.typcategory, t.typelem,
+        t.typrelid, t.typbasetype, r.rngsubtype
+    FROM pg_type t
+    JOIN pg_namespace n ON n.oid = t.typnamespace
+    LEFT JOIN pg_range r ON r.rngtypid = t.oid
+    WHERE t.oid = ANY(%(oids)s);
+"""
+
+# Query to list the attributes of composite types in their order
+SELECT_COMPOSITE_ATTRIBUTES_QUERY = """
+    SELECT attrelid, attname, atttypid
+    FROM pg_attribute
+    WHERE attrelid = ANY(%(relids)s) AND attnum > 0 AND NOT attisdropped
+    ORDER BY attrelid, attnum;
+"""
+
+# Query to read the declared dimensions of array table columns
+SELECT_COLUMN_DIMENSIONS_QUERY = """
+    SELECT attrelid, attnum, attndims
+    FROM pg_attribute
+    WHERE (attrelid, attnum) IN (
+        SELECT * FROM unnest(%(relids)s::oid[], %(attnums)s::int2[])
+    );
+"""
+
+# Query to describe the result columns of a query without running it
+SELECT_QUERY_DESCRIPTION_QUERY = (
+    "SELECT * FROM ({query}) AS described LIMIT 0;"
+)
+
+# Arrow types of the scalar PostgreSQL types nested in composites, ranges and
+# arrays, other scalar types are converted to strings
+SCALAR_TYPES = {
+    "bool": pa.bool_(),
+    "int2": pa.int16(),
+    "int4": pa.int32(),
+    "int8": pa.int64(),
+    "oid": pa.int64(),
+    "float4": pa.float32(),
+    "float8": pa.float64(),
+    "bytea": pa.binary(),
+    "date": pa.date32(),
+    "time": pa.time64("us"),
+    "timestamp": pa.timestamp("us"),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+    "interval": pa.duration("us"),
+}
+
+# Type of the "hstore" extension
+HSTORE_TYPE = "hstore"
+
+
+@dataclass
+class PostgresType:
+    """
+    Catalog entry of a PostgreSQL type.
+
+    Attributes:
+        oid (int): The OID of the type.
+        schema (str): The schema of the type.
+        name (str): The name of the type.
+        kind (str): The `pg_type.typtype`, like "c" for composite types and
+            "r" for ranges.
+        category (str): The `pg_type.typcategory`, "A" for arrays.
+        element (int): The OID of the array element type.
+        base (int): The OID of the base type of a domain.
+        subtype (int | None): The OID of the range subtype.
+        relid (int): The OID of the relation of a composite type.
+        attributes (list[tuple[str, int]]): The names and type OIDs of the
+            attributes of a composite type.
+    """
+
+    oid: int
+    schema: str
+    name: str
+    kind: str
+    category: str
+    element: int
+    base: int
+    subtype: int | None
+    relid: int = 0
+    attributes: list[tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def is_array(self) -> bool:
+        """
+        Returns whether the type is an array type.
+        """
+        return self.category == "A" and bool(self.element)
+
+    @property
+    def identifier(self) -> sql.Identifier:
+        """
+        Returns the name of the type qualified by its schema.
+        """
+        return sql.Identifier(self.schema, self.name)
+
+
+def fetch_postgres_types(
+    conn: psycopg.Connection, oids: list[int]
+) -> dict[int, PostgresType]:
+    """
+    Reads the catalog entries of types and of all the types nested in them.
+
+    Args:
+        conn (psycopg.Connection): The connection to read the catalog with.
+        oids (list[int]): The OIDs of the types.
+
+    Returns:
+        dict[int, PostgresType]: A dictionary mapping the OIDs to the types.
+    """
+    types: dict[int, PostgresType] = {}
+    pending = set(oids)
+    with conn.cursor() as cur:
+        while pending:
+            cur.execute(SELECT_TYPES_QUERY, {"oids": sorted(pending)})
+            fetched = [
+                PostgresType(
+                    oid=oid,
+                    schema=schema,
+                    name=name,
+                    kind=kind,
+                    category=category,
+                    element=element,
+                    relid=relid,
+                    base=base,
+                    subtype=subtype,
+                )
+                for (
+                    oid,
+                    schema,
+                    name,
+                    kind,
+                    category,
+                    element,
+                    relid,
+                    base,
+                    subtype,
+                ) in cur.fetchall()
+            ]
+            types.update((pg_type.oid, pg_type) for pg_type in fetched)
+
+            composites = {
+                pg_type.relid: pg_type
+                for pg_type in fetched
+                if pg_type.kind == "c"
+            }
+            if composites:
+                cur.execute(
+                    SELECT_COMPOSITE_ATTRIBUTES_QUERY,
+                    {"relids": list(composites)},
+                )
+                for relid, name, type_oid in cur.fetchall():
+                    composites[relid].attributes.append((name, type_oid))
+
+            nested = {
+                oid
+                for pg_type in fetched
+                for oid in (
+                    pg_type.element,
+                    pg_type.base,
+                    pg_type.subtype,
+                    *(type_oid for _, type_oid in pg_type.attributes),
+                )
+                if oid
+            }
+            pending = nested - set(types)
+    return types
+
+
+def is_nested_postgres_type(
+    types: dict[int, PostgresType], oid: int, dimensions: int = 1
+) -> bool:
+    """
+    Checks whether a type needs a nested Arrow type.
+
+    Args:
+        types (dict[int, PostgresType]): The catalog entries of the types.
+        oid (int): The OID of the type.
+        dimensions (int, optional): The declared dimensions of an array type. Defaults to 1.
+
+    Returns:
+        bool: True for composite, range and hstore types, for arrays of them and for multi-dimensional arrays.
+    """
+    pg_type = types[oid]
+    if pg_type.is_array:
+        return dimensions > 1 or is_nested_postgres_type(
+            types=types, oid=pg_type.element
+        )
+    if pg_type.kind == "d":
+        return is_nested_postgres_type(types=types, oid=pg_type.base)
+    return pg_type.kind in ("c", "r") or pg_type.name == HSTORE_TYPE
+
+
+def get_nested_arrow_type(
+    types: dict[int, PostgresType], oid: int, dimensions: int = 1
+) -> DataType:
+    """
+    Maps a PostgreSQL type to its Arrow type.
+
+    Args:
+        types (dict[int, PostgresType]): The catalog entries of the types.
+        oid (int): The OID of the type.
+        dimensions (int, optional): The declared dimensions of an array type. Defaults to 1.
+
+    Returns:
+        DataType: The Arrow type of the values.
+    """
+    pg_type = types[oid]
+    if pg_type.is_array:
+        data_type = get_nested_arrow_type(types=types, oid=pg_type.element)
+        for _ in range(max(dimensions, 1)):
+            data_type = pa.list_(data_type)
+        return data_type
+    if pg_type.kind == "d":
+        return get_nested_arrow_type(types=types, oid=pg_type.base)
+    if pg_type.kind == "c":
+        return pa.struct(
+            [
+                (name, get_nested_arrow_type(types=types, oid=type_oid))
+                for name, type_oid in pg_type.attributes
+            ]
+        )
+    if pg_type.kind == "r" and pg_type.subtype:
+        bound_type = get_nested_arrow_type(types=types, oid=pg_type.subtype)
+        return pa.struct(
+            [
+                ("lower", bound_type),
+                ("upper", bound_type),
+                ("lower_inclusive", pa.bool_()),
+                ("upper_inclusive", pa.bool_()),
+                ("empty", pa.bool_()),
+            ]
+        )
+    if pg_type.name == HSTORE_TYPE:
+        return pa.map_(pa.string(), pa.string())
+    return SCALAR_TYPES.get(pg_type.name, pa.string())
+
+
+def describe_query(
+    conn: psycopg.Connection, query: str
+) -> list[tuple[str, int, tuple[int, int]]]:
+    """
+    Describes the result columns of a query without running it.
+
+    Args:
+        conn (psycopg.Connection): The connection to describe the query with.
+        query (str): The query to describe, without a trailing semicolon.
+
+    Returns:
+        list[tuple[str, int, tuple[int, int]]]: The name, the type OID and the
+            table OID and attribute number of every column, zeros for
+            computed columns.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL(SELECT_QUERY_DESCRIPTION_QUERY).format(
+                query=sql.SQL(query)
+            )
+        )
+        result = cur.pgresult
+        return [
+            (
+                column.name,
+                column.type_code,
+                (
+                    (result.ftable(index), result.ftablecol(index))
+                    if result
+                    else (0, 0)
+                ),
+            )
+            for index, column in enumerate(cur.description or [])
+        ]
+
+
+def get_nested_data_types(
+    conn: psycopg.Connection, query: str
+) -> dict[str, DataType]:
+    """
+    Resolves the Arrow types of the nested columns of a query result.
+
+    Array columns read from tables are nested once per dimension declared by
+    the table, and once for computed columns.
+
+    Args:
+        conn (psycopg.Connection): The connection to describe the query with.
+        query (str): The query to describe, without a trailing semicolon.
+
+    Returns:
+        dict[str, DataType]: A dictionary mapping the nested column names to their Arrow types.
+    """
+    columns = describe_query(conn=conn, query=query)
+    types = fetch_postgres_types(
+        conn=conn, oids=sorted({type_oid for _, type_oid, _ in columns})
+    )
+
+    array_origins = [
+        origin
+        for _, type_oid, origin in columns
+        if types[type_oid].is_array and origin[0]
+    ]
+    dimensions = {}
+    if array_origins:
+        with conn.cursor() as cur:
+            cur.execute(
+                SELECT_COLUMN_DIMENSIONS_QUERY,
+                {
+                    "relids": [relid for relid, _ in array_origins],
+                    "attnums": [attnum for _, attnum in array_origins],
+                },
+            )
+            dimensions = {
+                (relid, attnum): attndims
+                for relid, attnum, attndims in cur.fetchall()
+            }
+
+    data_types = {}
+    for name, type_oid, origin in columns:
+        column_dimensions = dimensions.get(origin) or 1
+        if is_nested_postgres_type(
+            types=types, oid=type_oid, dimensions=column_dimensions
+        ):
+            data_types[name] = get_nested_arrow_type(
+                types=types, oid=type_oid, dimensions=column_dimensions
+            )
+    return data_types
+
+
+def register_nested_loaders(conn: psycopg.Connection, query: str) -> None:
+    """
+    Registers the loaders of the composite, hstore and range types of a query.
+
+    Without them, psycopg loads the values of these types as their text.
+    Built-in range types are always loaded as ranges.
+
+    Args:
+        conn (psycopg.Connection): The connection to register the loaders on.
+        query (str): The query whose result types are registered, without a trailing semicolon.
+    """
+    columns = describe_query(conn=conn, query=query)
+    oids = sorted({type_oid for _, type_oid, _ in columns})
+    for pg_type in fetch_postgres_types(conn=conn, oids=oids).values():
+        if pg_type.kind == "c":
+            register_composite(
+                CompositeInfo.fetch(conn, pg_type.identifier), conn
+            )
+        elif pg_type.kind == "r" and pg_type.schema != "pg_catalog":
+            register_range(RangeInfo.fetch(conn, pg_type.identifier), conn)
+        elif pg_type.name == HSTORE_TYPE:
+            register_hstore(TypeInfo.fetch(conn, pg_type.identifier), conn)
+        else:
+            continue
+        logger.info(f"Registered the loader of type: {pg_type.name}")
+
+
+def is_nested_arrow_type(data_type: DataType) -> bool:
+    """
+    Checks whether an Arrow type is a struct, a map or a list of nested values.
+
+    Args:
+        data_type (DataType): The Arrow type.
+
+    Returns:
+        bool: True if the values need a conversion to be nested, False otherwise.
+    """
+    if pa.types.is_struct(data_type) or pa.types.is_map(data_type):
+        return True
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        value_type = data_type.value_type
+        return is_nested_arrow_type(value_type) or pa.types.is_list(
+            value_type
+        )
+    return False
+
+
+def range_to_dict(value: Range) -> dict[str, Any]:
+    """
+    Converts a range to the values of its Arrow struct.
+
+    Args:
+        value (Range): The range.
+
+    Returns:
+        dict[str, Any]: The bounds of the range and their inclusiveness.
+    """
+    return {
+        "lower": value.lower,
+        "upper": value.upper,
+        "lower_inclusive": value.lower_inc,
+        "upper_inclusive": value.upper_inc,
+        "empty": value.isempty,
+    }
+
+
+@lru_cache(maxsize=None)
+def get_value_converter(data_type: DataType) -> Callable[[Any], Any] | None:
+    """
+    Builds the conversion of the loaded values to the values of an Arrow type.
+
+    Tuples, dicts and lists are taken by Arrow as they are, so only ranges and
+    scalar values nested in strings are converted.
+
+    Args:
+        data_type (DataType): The Arrow type.
+
+    Returns:
+        Callable[[Any], Any] | None: The conversion of a non-null value, None if no conversion is needed.
+    """
+    if pa.types.is_struct(data_type):
+        converters = [
+            get_value_converter(data_type.field(index).type)
+            for index in range(data_type.num_fields)
+        ]
+        names = [
+            data_type.field(index).name
+            for index in range(data_type.num_fields)
+        ]
+
+        def convert_struct(value: Any) -> Any:
+            if isinstance(value, Range):
+                value = range_to_dict(value=value)
+            if not any(converters):
+                return value
+            items = (
+                [value.get(name) for name in names]
+                if isinstance(value, dict)
+                else value
+            )
+            return tuple(
+                convert(item) if convert and item is not None else item
+                for convert, item in zip(converters, items)
+            )
+
+        return convert_struct
+
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        convert_item = get_value_converter(data_type.value_type)
+        if convert_item is None:
+            return None
+        return lambda value: [
+            None if item is None else convert_item(item) for item in value
+        ]
+
+    if pa.types.is_map(data_type):
+        convert_value = get_value_converter(data_type.item_type)
+        if convert_value is None:
+            return None
+        return lambda value: {
+            key: None if item is None else convert_value(item)
+            for key, item in value.items()
+        }
+
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return lambda value: value if isinstance(value, str) else str(value)
+    return None
+
+
+def convert_nested_values(values: Any, data_type: DataType) -> Any:
+    """
+    Converts the loaded values of a nested column to the values of its Arrow type.
+
+    Args:
+        values (Any): The loaded values of the column.
+        data_type (DataType): The Arrow type of the column.
+
+    Returns:
+        Any: The converted values.
+    """
+    convert = get_value_converter(data_type)
+    if convert is None:
+        return values
+    return [None if value is None else convert(value) for value in values]
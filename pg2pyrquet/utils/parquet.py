@@ -1,35 +1,72 @@
+from collections.abc import Sequence
+
 import pyarrow as pa
-from pyarrow import Schema, array, record_batch
-from pyarrow.parquet import ParquetWriter
+from pyarrow import DataType, RecordBatch, Schema, array, record_batch
 
 from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.nested import (
+    convert_nested_values,
+    is_nested_arrow_type,
+)
 
 logger = get_logger(name=__name__)
 
+# Variable-size types mapped to their 64-bit offset variants for large values
+LARGE_TYPES = {pa.binary(): pa.large_binary(), pa.string(): pa.large_string()}
+
 
-def write_batch_to_parquet(
-    writer: ParquetWriter,
-    fields_types: dict,
-    data: dict[str, list],
-    schema: Schema,
-) -> None:
+def promote_large_types(
+    fields_types: dict[str, DataType]
+) -> dict[str, DataType]:
     """
-    Writes a batch of data to a Parquet file using the provided writer.
+    Maps binary and string columns to the large binary and large string types.
+
+    Large types use 64-bit offsets, so a single column of a batch may hold more
+    than 2 GiB of values.
+
+    Args:
+        fields_types (dict[str, pa.DataType]): A dictionary mapping column names to their data types.
+
+    Returns:
+        dict[str, pa.DataType]: The dictionary with the large types substituted.
+    """
+    return {
+        field: LARGE_TYPES.get(data_type, data_type)
+        for field, data_type in fields_types.items()
+    }
+
+
+def build_record_batch(
+    fields_types: dict[str, DataType], rows: Sequence[tuple], schema: Schema
+) -> RecordBatch:
+    """
+    Builds a record batch from the rows fetched by the database cursor.
+
+    The rows are transposed into columns without copying the values, so every
+    value is copied once, directly into the Arrow buffers. Only the values of
+    nested columns are converted to the Python objects Arrow builds nested
+    arrays from.
 
     Args:
-        writer (ParquetWriter): The ParquetWriter instance used to write data.
         fields_types (dict[str, pa.DataType]): A dictionary mapping column names to their data types.
-        data (dict[str, list]): A dictionary where keys are column names and values are lists of column data.
-        schema (Schema): The schema defining the structure of the Parquet file.
+        rows (Sequence[tuple]): The fetched rows, with values in the column order.
+        schema (Schema): The schema defining the structure of the output file.
 
     Returns:
-        None
+        RecordBatch: The record batch with the rows.
     """
-    batch = record_batch(
+    columns = zip(*rows) if rows else ((),) * len(fields_types)
+    return record_batch(
         data=[
-            array(obj=data[field], type=fields_types[field])
-            for field in fields_types.keys()
+            array(
+                obj=(
+                    convert_nested_values(values=column, data_type=data_type)
+                    if is_nested_arrow_type(data_type=data_type)
+                    else column
+                ),
+                type=data_type,
+            )
+            for column, data_type in zip(columns, fields_types.values())
         ],
         schema=schema,
     )
-    writer.write_batch(batch=batch)
@@ -0,0 +1,79 @@
+"""
+Connection pool shared by the exports running in one process.
+"""
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import psycopg
+from psycopg.pq import TransactionStatus
+
+from pg2pyrquet.core.logging import get_logger
+
+logger = get_logger(name=__name__)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of idle connections to one database.
+
+    The pool does not limit the number of connections, callers limit their own
+    concurrency. Connections are reset when they are returned, so settings of
+    one export do not leak into the next one.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._idle: list[psycopg.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg.Connection]:
+        """
+        Borrows an idle connection, or opens a new one if there is none.
+
+        The transaction is committed if the block succeeds and rolled back
+        otherwise, like with a connection opened by `psycopg.connect`.
+
+        Yields:
+            psycopg.Connection: The borrowed connection.
+        """
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = psycopg.connect(self.dsn)
+
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed and not conn.broken:
+                conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            self._release(conn=conn)
+
+    def _release(self, conn: psycopg.Connection) -> None:
+        if (
+            conn.closed
+            or conn.broken
+            or conn.info.transaction_status != TransactionStatus.IDLE
+        ):
+            conn.close()
+            return
+
+        conn.isolation_level = None
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        """
+        Closes all the idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        logger.info(f"Closed {len(idle)} pooled connections.")
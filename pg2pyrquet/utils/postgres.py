@@ -1,33 +1,303 @@
 import os
 import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from fnmatch import fnmatchcase
+from typing import Any
 from urllib.parse import urlparse
 
 import psycopg
 from adbc_driver_postgresql.dbapi import connect as adbc_connect
+from psycopg import sql
+from psycopg.types.string import TextLoader
 from pyarrow import DataType
 
 from pg2pyrquet.core.exceptions import (
     DatabaseConnectionError,
+    InvalidPartitionColumnError,
     InvalidPostgresCredentialsError,
     TableDoesNotExistError,
 )
 from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.nested import get_nested_data_types
+from pg2pyrquet.utils.pool import ConnectionPool
 
 logger = get_logger(name=__name__)
 
+# Types loaded as their raw text instead of being parsed into Python objects
+RAW_TEXT_TYPES = ("json", "jsonb")
+
+# Schema whose tables are named without the schema
+DEFAULT_SCHEMA = "public"
+
+# Python types of the column values that can be split into ranges
+PARTITION_BOUND_TYPES = (int, float, Decimal, date, datetime, timedelta)
+
+# Application name of the sessions opened by the exports
+APPLICATION_NAME = "pg2pyrquet"
+
+
+class RelationKind(str, Enum):
+    """
+    Kinds of relations a database export can include.
+    """
+
+    TABLE = "table"
+    VIEW = "view"
+    MATERIALIZED_VIEW = "materialized-view"
+
+    @property
+    def relkinds(self) -> tuple[str, ...]:
+        """
+        Returns the `pg_class.relkind` values of the kind.
+        """
+        return {
+            RelationKind.TABLE: ("r", "p", "f"),
+            RelationKind.VIEW: ("v",),
+            RelationKind.MATERIALIZED_VIEW: ("m",),
+        }[self]
+
+
+# Relations exported by default, the tables and views
+DEFAULT_RELATION_KINDS = (RelationKind.TABLE, RelationKind.VIEW)
+
 # Query to select all rows from a specified table
 SELECT_ALL_TABLE_QUERY = "SELECT * FROM {table_name};"
 
-# Query to list all databases in the PostgreSQL instance
-SELECT_DATABASES_QUERY = "SELECT datname FROM pg_database;"
+# Query to select all rows from a specified table ordered by a column
+SELECT_ALL_TABLE_ORDERED_QUERY = (
+    "SELECT * FROM {table_name} ORDER BY {column_name};"
+)
+
+# Query to check whether a btree index starting with a column exists on a table
+# and orders it like Parquet, by bytes: text columns only in a byte-wise
+# collation, as the server orders them in the collation of the column
+SELECT_COLUMN_INDEXED_QUERY = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = ic.relam
+        JOIN pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        LEFT JOIN pg_collation co ON co.oid = a.attcollation
+        WHERE i.indrelid = %(table_name)s::regclass
+            AND a.attname = %(column_name)s
+            AND am.amname = 'btree'
+            AND i.indpred IS NULL
+            AND i.indisvalid
+            AND (
+                a.attcollation = 0
+                OR (
+                    i.indcollation[0] = a.attcollation
+                    AND co.collname IN ('C', 'POSIX', 'ucs_basic')
+                )
+            )
+    );
+"""
+
+# Query to list the primary key columns of a table in the key order
+SELECT_PRIMARY_KEY_QUERY = """
+    SELECT a.attname
+    FROM pg_index i
+    JOIN pg_attribute a
+        ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+    WHERE i.indrelid = %(table_name)s::regclass AND i.indisprimary
+    ORDER BY array_position(i.indkey::int2[], a.attnum);
+"""
+
+# Query to select one page of the rows of a custom query after a key
+SELECT_KEYSET_PAGE_QUERY = "SELECT * FROM ({query}) AS paged{predicate} ORDER BY {key} LIMIT {limit};"
+
+# Query to select all the rows of a custom query with a key
+SELECT_KEYSET_TIES_QUERY = (
+    "SELECT * FROM ({query}) AS paged WHERE ({key}) = ({values});"
+)
+
+# Query to list all databases in the PostgreSQL instance that accept
+# connections, without the templates
+SELECT_DATABASES_QUERY = """
+    SELECT datname
+    FROM pg_database
+    WHERE datallowconn AND NOT datistemplate
+    ORDER BY datname;
+"""
 
-# Query to list all tables in the 'public' schema of the current database
+# Query to list the readable relations of the given kinds in the given schemas,
+# without the partitions of partitioned tables
 SELECT_TABLES_QUERY = """
-    SELECT table_name
-    FROM information_schema.tables
-    WHERE table_schema = 'public';
+    SELECT n.nspname, c.relname
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = ANY(%(schemas)s)
+        AND c.relkind::text = ANY(%(relkinds)s)
+        AND NOT c.relispartition
+        AND has_table_privilege(c.oid, 'SELECT')
+    ORDER BY n.nspname, c.relname;
+"""
+
+# Query to fingerprint the tables by their storage file and cumulative row
+# change counters, named like the listed tables. Partitioned tables have
+# neither, so they join the fingerprints of their leaf partitions, and have
+# none if a leaf is not a plain table
+SELECT_TABLE_FINGERPRINTS_QUERY = """
+    SELECT
+        CASE
+            WHEN n.nspname = 'public' THEN c.relname
+            ELSE n.nspname || '.' || c.relname
+        END,
+        CASE
+            WHEN c.relkind = 'p' THEN (
+                SELECT
+                    CASE
+                        WHEN bool_and(lc.relkind = 'r') THEN string_agg(
+                            concat_ws(
+                                ':',
+                                lc.relfilenode,
+                                ls.n_tup_ins,
+                                ls.n_tup_upd,
+                                ls.n_tup_del
+                            ),
+                            ',' ORDER BY lc.oid
+                        )
+                    END
+                FROM pg_partition_tree(c.oid) t
+                JOIN pg_class lc ON lc.oid = t.relid
+                LEFT JOIN pg_stat_user_tables ls ON ls.relid = t.relid
+                WHERE t.isleaf
+            )
+            ELSE concat_ws(
+                ':', c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del
+            )
+        END
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE (c.relkind = 'r' AND s.relid IS NOT NULL)
+        OR (
+            c.relkind = 'p'
+            AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        );
+"""
+
+# Query to retrieve the range of a column in the result of a custom query
+SELECT_QUERY_COLUMN_RANGE_QUERY = (
+    "SELECT min({column_name}), max({column_name}) FROM ({query}) AS ranged;"
+)
+
+# Query to retrieve the type of a column in the result of a custom query,
+# without running it
+SELECT_QUERY_COLUMN_TYPE_QUERY = """
+    SELECT pg_typeof(typed.{column_name})::text
+    FROM (SELECT 1) AS one
+    LEFT JOIN (SELECT * FROM ({query}) AS limited LIMIT 0) AS typed ON TRUE;
+"""
+
+# Query to convert the bounds of a partition column to the column type
+CAST_COLUMN_BOUNDS_QUERY = (
+    "SELECT CAST(%(lower)s AS {type_name}), CAST(%(upper)s AS {type_name});"
+)
+
+# Query to select the rows of a custom query matching a partition predicate
+SELECT_QUERY_PARTITION_QUERY = (
+    "SELECT * FROM ({query}) AS partitioned WHERE {predicate};"
+)
+
+# Query to read the number of pages of a table from the size of its storage
+SELECT_TABLE_PAGES_QUERY = """
+    SELECT pg_relation_size(%(table_name)s::regclass)
+        / current_setting('block_size')::int;
+"""
+
+# Query to select the rows of a table stored in a range of pages
+SELECT_TABLE_CTID_RANGE_QUERY = (
+    "SELECT * FROM {table_name} WHERE {predicate};"
+)
+
+# Query to compute the row count and aggregates of a custom query in one pass
+SELECT_QUERY_AGGREGATES_QUERY = (
+    "SELECT count(*), {aggregates} FROM ({query}) AS verified;"
+)
+
+# Query to estimate the row count and the average row width of a table from
+# the planner statistics of its own schema
+SELECT_TABLE_ESTIMATE_QUERY = """
+    SELECT
+        c.reltuples::bigint,
+        (
+            SELECT sum(s.avg_width)
+            FROM pg_stats s
+            WHERE s.schemaname = n.nspname AND s.tablename = c.relname
+        )
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = %(table_name)s::regclass;
+"""
+
+# Query to estimate the row count and the row width of a custom query
+EXPLAIN_QUERY = "EXPLAIN (FORMAT JSON) {query};"
+
+# Query to count the active sessions waiting on I/O or locks, other than the
+# sessions of the exports, and to measure the replication lag of the
+# standbys, in seconds
+SELECT_SERVER_LOAD_QUERY = """
+    SELECT
+        (
+            SELECT count(*)
+            FROM pg_stat_activity
+            WHERE state = 'active'
+                AND wait_event_type IN ('IO', 'Lock', 'LWLock')
+                AND pid <> pg_backend_pid()
+                AND application_name IS DISTINCT FROM %(application_name)s
+        ),
+        (
+            SELECT COALESCE(max(EXTRACT(EPOCH FROM replay_lag)), 0)::float8
+            FROM pg_stat_replication
+        );
 """
 
+# Query to export the snapshot of the current transaction to other sessions
+EXPORT_SNAPSHOT_QUERY = "SELECT pg_export_snapshot();"
+
+# Statement to import a snapshot exported by another session
+SET_TRANSACTION_SNAPSHOT_QUERY = "SET TRANSACTION SNAPSHOT {snapshot};"
+
+# Logical decoding plugin of the replication slots
+DEFAULT_SLOT_PLUGIN = "wal2json"
+
+# Replication command to create a logical slot and export the snapshot its
+# changes start after
+CREATE_REPLICATION_SLOT_QUERY = (
+    "CREATE_REPLICATION_SLOT {slot} LOGICAL {plugin} EXPORT_SNAPSHOT;"
+)
+
+# Query to check whether a replication slot exists
+SELECT_SLOT_EXISTS_QUERY = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_replication_slots WHERE slot_name = %(slot)s
+    );
+"""
+
+# Query to drop a replication slot
+DROP_SLOT_QUERY = "SELECT pg_drop_replication_slot(%(slot)s);"
+
+# Query to decode the changes after the confirmed position of a slot, without
+# consuming them
+PEEK_SLOT_CHANGES_QUERY = """
+    SELECT lsn::text, data
+    FROM pg_logical_slot_peek_changes(
+        %(slot)s, NULL, %(max_changes)s, VARIADIC %(options)s::text[]
+    );
+"""
+
+# Query to move the confirmed position of a slot, releasing the older WAL
+ADVANCE_SLOT_QUERY = (
+    "SELECT pg_replication_slot_advance(%(slot)s, %(lsn)s::pg_lsn);"
+)
+
 
 def get_postgres_auth() -> str:
     """
@@ -55,6 +325,9 @@ def get_postgres_dsn(host: str, port: str, database: str) -> str:
     """
     Generates the PostgreSQL DSN (Data Source Name) for the specified database.
 
+    The sessions are named after APPLICATION_NAME, so the load probes of the
+    throttle can tell them apart.
+
     Args:
         host (str): The hostname of the PostgreSQL server.
         port (str): The port number of the PostgreSQL server.
@@ -64,7 +337,10 @@ def get_postgres_dsn(host: str, port: str, database: str) -> str:
         str: The connection string for the PostgreSQL database.
     """
     auth = get_postgres_auth()
-    return f"postgresql://{auth}@{host}:{port}/{database}"
+    return (
+        f"postgresql://{auth}@{host}:{port}/{database}"
+        f"?application_name={APPLICATION_NAME}"
+    )
 
 
 def get_default_query(table: str) -> str:
@@ -80,10 +356,127 @@ def get_default_query(table: str) -> str:
     return SELECT_ALL_TABLE_QUERY.format(table_name=table)
 
 
+def get_ordered_query(table: str, column: str) -> str:
+    """
+    Generates the query to select all rows from the specified table ordered by a column.
+
+    Args:
+        table (str): The name of the table to query.
+        column (str): The name of the column to order by.
+
+    Returns:
+        str: The query to select all rows from the table in the column order.
+    """
+    return SELECT_ALL_TABLE_ORDERED_QUERY.format(
+        table_name=table, column_name=column
+    )
+
+
+def check_column_indexed(dsn: str, table: str, column: str) -> bool:
+    """
+    Checks if a btree index starting with the specified column exists on the table.
+
+    Text columns only qualify in a byte-wise collation, like "C", since the
+    Parquet sorting metadata declares the byte order of the values.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table to check.
+        column (str): The name of the column to check.
+
+    Returns:
+        bool: True if the table can be read in the column order from an index, False otherwise.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                SELECT_COLUMN_INDEXED_QUERY,
+                {"table_name": table, "column_name": column},
+            )
+            (indexed,) = cur.fetchone()
+            return indexed
+
+
+def get_primary_key_columns(dsn: str, table: str) -> list[str]:
+    """
+    Retrieves the primary key columns of the specified table.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table.
+
+    Returns:
+        list[str]: The primary key columns in the key order, empty if the table has no primary key.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_PRIMARY_KEY_QUERY, {"table_name": table})
+            return [column for (column,) in cur.fetchall()]
+
+
+def get_keyset_page_query(
+    query: str, key_columns: list[str], after_key: bool, limit: int
+) -> sql.Composed:
+    """
+    Generates the query selecting the next page of a query ordered by a key.
+
+    The page starts after the key passed as the query parameters, so every
+    page is found with an index scan instead of skipping the previous rows.
+    The literal "%" of the query are escaped when the page has parameters.
+
+    Args:
+        query (str): The query to page through.
+        key_columns (list[str]): The columns of the unique key to order by.
+        after_key (bool): Whether the page starts after a key, False for the first page.
+        limit (int): The maximum number of rows in the page.
+
+    Returns:
+        sql.Composed: The page query with one placeholder per key column.
+    """
+    key = sql.SQL(", ").join(sql.Identifier(column) for column in key_columns)
+    predicate = sql.SQL("")
+    if after_key:
+        predicate = sql.SQL(" WHERE ({}) > ({})").format(
+            key, sql.SQL(", ").join(sql.Placeholder() * len(key_columns))
+        )
+    query = strip_query(query)
+    return sql.SQL(SELECT_KEYSET_PAGE_QUERY).format(
+        query=sql.SQL(query.replace("%", "%%") if after_key else query),
+        predicate=predicate,
+        key=key,
+        limit=sql.Literal(limit),
+    )
+
+
+def get_keyset_ties_query(query: str, key_columns: list[str]) -> sql.Composed:
+    """
+    Generates the query selecting all the rows of a query with a key.
+
+    The literal "%" of the query are escaped, as the query has parameters.
+
+    Args:
+        query (str): The query to page through.
+        key_columns (list[str]): The columns of the key.
+
+    Returns:
+        sql.Composed: The query with one placeholder per key column.
+    """
+    return sql.SQL(SELECT_KEYSET_TIES_QUERY).format(
+        query=sql.SQL(strip_query(query).replace("%", "%%")),
+        key=sql.SQL(", ").join(
+            sql.Identifier(column) for column in key_columns
+        ),
+        values=sql.SQL(", ").join(sql.Placeholder() * len(key_columns)),
+    )
+
+
 def get_query_data_types(dsn: str, query: str) -> dict[str, DataType]:
     """
     Retrieves the data types of columns in the specified table.
 
+    Composite, hstore, range and multi-dimensional array columns are mapped to
+    nested Arrow types resolved from the catalog.
+
     Args:
         dsn (str): The Data Source Name for connecting to the PostgreSQL database.
         query (str): The query to execute to retrieve the data types.
@@ -91,11 +484,534 @@ def get_query_data_types(dsn: str, query: str) -> dict[str, DataType]:
     Returns:
         dict[str, DataType]: A dictionary mapping column names to their data types.
     """
-    query_with_limit = format_query_with_limit(query=query)
+    return get_queries_data_types(dsn=dsn, queries={"query": query})["query"]
+
+
+def get_queries_data_types(
+    dsn: str, queries: dict[str, str], pool: ConnectionPool | None = None
+) -> dict[str, dict[str, DataType]]:
+    """
+    Retrieves the data types of the columns of several queries in one session.
+
+    The types are read with one ADBC connection, which a pool of psycopg
+    connections cannot provide, and the nested types with one psycopg
+    connection, borrowed from the pool if any.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        queries (dict[str, str]): A dictionary mapping the query names to the queries.
+        pool (ConnectionPool | None, optional): The pool to borrow the psycopg connection from. Defaults to None, for a new connection.
+
+    Returns:
+        dict[str, dict[str, DataType]]: A dictionary mapping the query names to their column data types.
+    """
+    data_types = {}
     with adbc_connect(uri=dsn) as conn:
         with conn.cursor() as cur:
-            cur.execute(query_with_limit)
-            return {column[0]: column[1] for column in cur.description}
+            for name, query in queries.items():
+                cur.execute(format_query_with_limit(query=query))
+                data_types[name] = {
+                    column[0]: column[1] for column in cur.description
+                }
+
+    with pool.connection() if pool else psycopg.connect(dsn) as conn:
+        for name, query in queries.items():
+            data_types[name].update(
+                get_nested_data_types(conn=conn, query=strip_query(query))
+            )
+    return data_types
+
+
+def register_raw_text_loaders(conn: psycopg.Connection) -> None:
+    """
+    Configures the connection to load JSON values as their raw text.
+
+    The exported schema stores JSON as strings, so parsing the values into
+    Python objects would only waste CPU and memory.
+
+    Args:
+        conn (psycopg.Connection): The connection to configure.
+    """
+    for type_name in RAW_TEXT_TYPES:
+        conn.adapters.register_loader(type_name, TextLoader)
+
+
+def strip_query(query: str) -> str:
+    """
+    Strips the surrounding whitespace and trailing semicolons of a query, so it
+    can be used as a subquery.
+
+    Args:
+        query (str): The query to strip.
+
+    Returns:
+        str: The stripped query.
+    """
+    return query.strip().rstrip(";").strip()
+
+
+def get_query_column_range(
+    dsn: str,
+    query: str,
+    column: str,
+    lower: str | None = None,
+    upper: str | None = None,
+) -> tuple:
+    """
+    Retrieves the minimum and maximum value of a column in the result of a query.
+
+    Bounds given as text are converted to the column type by the server, so
+    they are parsed like the column values, and the minimum or maximum is
+    only queried for the missing ones.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        query (str): The query returning the column.
+        column (str): The name of the column.
+        lower (str | None, optional): The lower bound, queried if None. Defaults to None.
+        upper (str | None, optional): The upper bound, queried if None. Defaults to None.
+
+    Returns:
+        tuple: The minimum and maximum value, both None if the result is empty.
+
+    Raises:
+        InvalidPartitionColumnError: If a bound is not a value of the column type.
+    """
+    column_name = sql.Identifier(column)
+    stripped_query = sql.SQL(strip_query(query))
+    column_min, column_max = lower, upper
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            if lower is not None or upper is not None:
+                cur.execute(
+                    sql.SQL(SELECT_QUERY_COLUMN_TYPE_QUERY).format(
+                        column_name=column_name, query=stripped_query
+                    )
+                )
+                (type_name,) = cur.fetchone()
+                try:
+                    cur.execute(
+                        sql.SQL(CAST_COLUMN_BOUNDS_QUERY).format(
+                            type_name=sql.SQL(type_name)
+                        ),
+                        {"lower": lower, "upper": upper},
+                    )
+                except psycopg.DataError as e:
+                    raise InvalidPartitionColumnError(
+                        f"Bounds {lower!r} and {upper!r} of partition column "
+                        f"'{column}' are not {type_name} values: {e}"
+                    ) from e
+                column_min, column_max = cur.fetchone()
+
+            if lower is None or upper is None:
+                cur.execute(
+                    sql.SQL(SELECT_QUERY_COLUMN_RANGE_QUERY).format(
+                        column_name=column_name, query=stripped_query
+                    )
+                )
+                queried_min, queried_max = cur.fetchone()
+                column_min = queried_min if lower is None else column_min
+                column_max = queried_max if upper is None else column_max
+    return column_min, column_max
+
+
+def get_query_aggregates(
+    conn: psycopg.Connection, query: str, aggregates: list[sql.Composable]
+) -> tuple:
+    """
+    Computes the row count and the aggregates of the result of a query.
+
+    Args:
+        conn (psycopg.Connection): The connection to run the query on.
+        query (str): The query to aggregate.
+        aggregates (list[sql.Composable]): The aggregate expressions.
+
+    Returns:
+        tuple: The row count followed by the aggregate values.
+    """
+    aggregates_query = sql.SQL(SELECT_QUERY_AGGREGATES_QUERY).format(
+        aggregates=(
+            sql.SQL(", ").join(aggregates) if aggregates else sql.SQL("NULL")
+        ),
+        query=sql.SQL(strip_query(query)),
+    )
+    with conn.cursor() as cur:
+        cur.execute(aggregates_query)
+        row = cur.fetchone()
+    return row if aggregates else row[:1]
+
+
+def get_query_estimate(dsn: str, query: str) -> tuple[int, int]:
+    """
+    Estimates the size of the result of a query with the planner.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        query (str): The query to estimate.
+
+    Returns:
+        tuple[int, int]: The estimated row count and row width in bytes.
+    """
+    explain_query = sql.SQL(EXPLAIN_QUERY).format(
+        query=sql.SQL(strip_query(query))
+    )
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(explain_query)
+            ((plan,),) = cur.fetchall()
+    return int(plan[0]["Plan"]["Plan Rows"]), int(
+        plan[0]["Plan"]["Plan Width"]
+    )
+
+
+def get_table_estimate(dsn: str, table: str) -> tuple[int, int]:
+    """
+    Estimates the size of a table from its statistics.
+
+    Tables that were never analyzed have no statistics, so they are estimated
+    by the planner instead.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table.
+
+    Returns:
+        tuple[int, int]: The estimated row count and row width in bytes.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_TABLE_ESTIMATE_QUERY, {"table_name": table})
+            rows, width = cur.fetchone()
+
+    if rows < 0 or width is None:
+        return get_query_estimate(
+            dsn=dsn, query=get_default_query(table=table)
+        )
+    return rows, int(width)
+
+
+def get_server_load(dsn: str, timeout: int) -> tuple[int, float]:
+    """
+    Measures the load signals of the database server.
+
+    The sessions of the exports, named after APPLICATION_NAME, are not
+    counted, so concurrent exports do not slow each other down.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        timeout (int): The timeout of the connection and of the query in seconds.
+
+    Returns:
+        tuple[int, float]: The number of active sessions waiting on I/O or
+            locks and the replication lag of the slowest standby in seconds.
+    """
+    with psycopg.connect(
+        dsn,
+        autocommit=True,
+        connect_timeout=timeout,
+        options=f"-c statement_timeout={timeout * 1000}",
+    ) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                SELECT_SERVER_LOAD_QUERY,
+                {"application_name": APPLICATION_NAME},
+            )
+            waiting_sessions, replication_lag = cur.fetchone()
+    return waiting_sessions, replication_lag
+
+
+def get_partition_boundaries(lower: Any, upper: Any, partitions: int) -> list:
+    """
+    Splits the range between the bounds into equal-width partitions.
+
+    Args:
+        lower (Any): The lower bound of the range.
+        upper (Any): The upper bound of the range.
+        partitions (int): The number of partitions.
+
+    Returns:
+        list: The sorted, distinct boundaries between the partitions.
+
+    Raises:
+        InvalidPartitionColumnError: If the bounds are not numbers, dates,
+            timestamps or intervals.
+    """
+    for bound in (lower, upper):
+        if isinstance(bound, bool) or not isinstance(
+            bound, PARTITION_BOUND_TYPES
+        ):
+            raise InvalidPartitionColumnError(
+                "Partition columns must be numeric, date, timestamp or "
+                f"interval columns, got a bound of type {type(bound).__name__}"
+            )
+
+    step = upper - lower
+    boundaries = set()
+    for index in range(1, partitions):
+        if isinstance(step, int):
+            boundaries.add(lower + step * index // partitions)
+        else:
+            boundaries.add(lower + step * index / partitions)
+    return sorted(boundaries)
+
+
+def get_partition_queries(
+    query: str, column: str, boundaries: list
+) -> list[str]:
+    """
+    Wraps a query into one query per range between the boundaries.
+
+    The first partition is unbounded below, the last partition is unbounded
+    above and also holds the NULL values, so every row belongs to exactly one
+    partition.
+
+    Args:
+        query (str): The query to partition.
+        column (str): The name of the partition column in the query result.
+        boundaries (list): The sorted boundaries between the partitions.
+
+    Returns:
+        list[str]: The partition queries.
+    """
+    identifier = sql.Identifier(column)
+    edges = [None, *boundaries, None]
+
+    predicates = []
+    for lower, upper in zip(edges, edges[1:]):
+        conditions = []
+        if lower is not None:
+            conditions.append(
+                sql.SQL("{} >= {}").format(identifier, sql.Literal(lower))
+            )
+        if upper is not None:
+            conditions.append(
+                sql.SQL("{} < {}").format(identifier, sql.Literal(upper))
+            )
+        predicate = sql.SQL(" AND ").join(conditions or [sql.SQL("TRUE")])
+        if upper is None:
+            predicate = sql.SQL("({}) OR {} IS NULL").format(
+                predicate, identifier
+            )
+        predicates.append(predicate)
+
+    return [
+        sql.SQL(SELECT_QUERY_PARTITION_QUERY)
+        .format(query=sql.SQL(strip_query(query)), predicate=predicate)
+        .as_string(None)
+        for predicate in predicates
+    ]
+
+
+def get_table_pages(dsn: str, table: str) -> int:
+    """
+    Retrieves the number of pages a table is stored in.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        table (str): The name of the table.
+
+    Returns:
+        int: The number of pages, zero for views and partitioned tables.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_TABLE_PAGES_QUERY, {"table_name": table})
+            (pages,) = cur.fetchone()
+            return pages
+
+
+def get_ctid_partition_queries(
+    table: str, boundaries: list[int]
+) -> list[str]:
+    """
+    Splits the rows of a table into queries of the pages between the boundaries.
+
+    The ranges are read with TID range scans, and the last one is unbounded
+    so it also holds the rows stored after the table was sized.
+
+    Args:
+        table (str): The name of the table.
+        boundaries (list[int]): The sorted page numbers between the partitions.
+
+    Returns:
+        list[str]: The partition queries.
+    """
+    edges = [None, *boundaries, None]
+
+    queries = []
+    for lower, upper in zip(edges, edges[1:]):
+        conditions = []
+        if lower is not None:
+            conditions.append(
+                sql.SQL("ctid >= {}::tid").format(sql.Literal(f"({lower},0)"))
+            )
+        if upper is not None:
+            conditions.append(
+                sql.SQL("ctid < {}::tid").format(sql.Literal(f"({upper},0)"))
+            )
+        queries.append(
+            sql.SQL(SELECT_TABLE_CTID_RANGE_QUERY)
+            .format(
+                table_name=sql.SQL(table),
+                predicate=sql.SQL(" AND ").join(
+                    conditions or [sql.SQL("TRUE")]
+                ),
+            )
+            .as_string(None)
+        )
+    return queries
+
+
+@contextmanager
+def export_snapshot(dsn: str) -> Iterator[str]:
+    """
+    Opens a REPEATABLE READ transaction and exports its snapshot.
+
+    The snapshot can be imported by other sessions while the context is open,
+    so they all read the same consistent state of the database.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+
+    Yields:
+        str: The identifier of the exported snapshot.
+    """
+    with psycopg.connect(dsn) as conn:
+        conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+        with conn.cursor() as cur:
+            cur.execute(EXPORT_SNAPSHOT_QUERY)
+            (snapshot,) = cur.fetchone()
+            yield snapshot
+
+
+def set_transaction_snapshot(conn: psycopg.Connection, snapshot: str) -> None:
+    """
+    Starts a REPEATABLE READ transaction reading the exported snapshot.
+
+    Args:
+        conn (psycopg.Connection): The connection without an open transaction.
+        snapshot (str): The identifier of the exported snapshot.
+    """
+    conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+    conn.execute(
+        sql.SQL(SET_TRANSACTION_SNAPSHOT_QUERY).format(
+            snapshot=sql.Literal(snapshot)
+        )
+    )
+
+
+def check_slot_exists(dsn: str, slot: str) -> bool:
+    """
+    Checks if a replication slot with the specified name exists.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        slot (str): The name of the replication slot.
+
+    Returns:
+        bool: True if the slot exists, False otherwise.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_SLOT_EXISTS_QUERY, {"slot": slot})
+            (exists,) = cur.fetchone()
+            return exists
+
+
+def drop_replication_slot(dsn: str, slot: str) -> None:
+    """
+    Drops a replication slot, releasing the WAL it retains.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        slot (str): The name of the replication slot.
+    """
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(DROP_SLOT_QUERY, {"slot": slot})
+    logger.info(f"Dropped replication slot: {slot}")
+
+
+@contextmanager
+def create_replication_slot(
+    dsn: str, slot: str, plugin: str = DEFAULT_SLOT_PLUGIN
+) -> Iterator[str]:
+    """
+    Creates a logical replication slot and exports the snapshot it starts at.
+
+    The slot is created over a replication connection, which keeps the
+    snapshot importable while the context is open. The snapshot sees exactly
+    the changes committed before the first change decoded from the slot.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        slot (str): The name of the replication slot.
+        plugin (str, optional): The logical decoding plugin. Defaults to DEFAULT_SLOT_PLUGIN.
+
+    Yields:
+        str: The identifier of the exported snapshot.
+    """
+    with psycopg.connect(
+        dsn, autocommit=True, replication="database"
+    ) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(CREATE_REPLICATION_SLOT_QUERY).format(
+                    slot=sql.Identifier(slot), plugin=sql.Identifier(plugin)
+                )
+            )
+            _, lsn, snapshot, _ = cur.fetchone()
+            logger.info(f"Created replication slot {slot} at LSN: {lsn}")
+            yield snapshot
+
+
+def peek_slot_changes(
+    conn: psycopg.Connection,
+    slot: str,
+    max_changes: int,
+    options: dict[str, str],
+) -> list[tuple[str, str]]:
+    """
+    Decodes the changes after the confirmed position of a slot.
+
+    The changes are not consumed, so they are decoded again until the slot is
+    advanced past them. Decoding stops at the first transaction end after
+    `max_changes` changes.
+
+    Args:
+        conn (psycopg.Connection): The connection to decode the changes with.
+        slot (str): The name of the replication slot.
+        max_changes (int): The number of changes after which decoding stops.
+        options (dict[str, str]): The options of the decoding plugin.
+
+    Returns:
+        list[tuple[str, str]]: The LSN and the decoded data of every change.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            PEEK_SLOT_CHANGES_QUERY,
+            {
+                "slot": slot,
+                "max_changes": max_changes,
+                "options": [
+                    item for option in options.items() for item in option
+                ],
+            },
+        )
+        return cur.fetchall()
+
+
+def advance_slot(conn: psycopg.Connection, slot: str, lsn: str) -> None:
+    """
+    Moves the confirmed position of a slot to an LSN.
+
+    Args:
+        conn (psycopg.Connection): The connection to advance the slot with.
+        slot (str): The name of the replication slot.
+        lsn (str): The LSN the changes were consumed up to.
+    """
+    with conn.cursor() as cur:
+        cur.execute(ADVANCE_SLOT_QUERY, {"slot": slot, "lsn": lsn})
 
 
 def check_db_exists(dsn: str) -> bool:
@@ -116,34 +1032,165 @@ def check_db_exists(dsn: str) -> bool:
     return True
 
 
-def get_database_tables(dsn: str) -> list[str]:
+def get_table_name(schema: str, table: str) -> str:
+    """
+    Generates the name a table is exported and queried by.
+
+    Args:
+        schema (str): The schema of the table.
+        table (str): The name of the table in its schema.
+
+    Returns:
+        str: The table name, qualified by the schema unless it is the default one.
+    """
+    return table if schema == DEFAULT_SCHEMA else f"{schema}.{table}"
+
+
+def match_table_patterns(
+    schema: str,
+    table: str,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> bool:
+    """
+    Checks whether a table matches the include and exclude glob patterns.
+
+    Patterns are matched against both the table name and its name qualified
+    by the schema, so "orders_*" and "sales.*" both work.
+
+    Args:
+        schema (str): The schema of the table.
+        table (str): The name of the table in its schema.
+        include (list[str] | None, optional): Patterns of the tables to keep, all tables if empty. Defaults to None.
+        exclude (list[str] | None, optional): Patterns of the tables to skip. Defaults to None.
+
+    Returns:
+        bool: True if the table is included and not excluded, False otherwise.
+    """
+    names = (table, f"{schema}.{table}")
+
+    def matches(patterns: list[str]) -> bool:
+        return any(
+            fnmatchcase(name, pattern)
+            for name in names
+            for pattern in patterns
+        )
+
+    if include and not matches(include):
+        return False
+    return not (exclude and matches(exclude))
+
+
+def get_database_tables(
+    dsn: str,
+    schemas: list[str] | None = None,
+    relation_kinds: list[RelationKind] | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    pool: ConnectionPool | None = None,
+) -> list[str]:
     """
     Retrieves the list of all tables in the specified database.
 
     Args:
         dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+        schemas (list[str] | None, optional): The schemas to list the tables of. Defaults to the "public" schema.
+        relation_kinds (list[RelationKind] | None, optional): The kinds of relations to list. Defaults to DEFAULT_RELATION_KINDS.
+        include (list[str] | None, optional): Glob patterns of the tables to keep. Defaults to None, for all tables.
+        exclude (list[str] | None, optional): Glob patterns of the tables to skip. Defaults to None.
+        pool (ConnectionPool | None, optional): The pool to borrow the connection from. Defaults to None, for a new connection.
 
     Returns:
-        list[str]: A list of table names.
+        list[str]: A list of table names, qualified by the schema outside the "public" schema.
+    """
+    relkinds = [
+        relkind
+        for kind in relation_kinds or DEFAULT_RELATION_KINDS
+        for relkind in RelationKind(kind).relkinds
+    ]
+    with pool.connection() if pool else psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                SELECT_TABLES_QUERY,
+                {
+                    "schemas": schemas or [DEFAULT_SCHEMA],
+                    "relkinds": relkinds,
+                },
+            )
+            return [
+                get_table_name(schema=schema, table=table)
+                for schema, table in cur.fetchall()
+                if match_table_patterns(
+                    schema=schema,
+                    table=table,
+                    include=include,
+                    exclude=exclude,
+                )
+            ]
+
+
+def get_cluster_databases(dsn: str) -> list[str]:
+    """
+    Retrieves the list of the databases of the PostgreSQL instance.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to any database of the instance.
+
+    Returns:
+        list[str]: A list of database names, without the templates.
     """
     with psycopg.connect(dsn) as conn:
         with conn.cursor() as cur:
-            cur.execute(SELECT_TABLES_QUERY)
-            return [table_name for (table_name,) in cur.fetchall()]
+            cur.execute(SELECT_DATABASES_QUERY)
+            return [database for (database,) in cur.fetchall()]
+
+
+def get_table_fingerprints(dsn: str) -> dict[str, str]:
+    """
+    Retrieves the change fingerprints of all tables in the specified database.
+
+    A fingerprint changes whenever rows are inserted, updated or deleted, or the
+    table is rewritten (TRUNCATE, VACUUM FULL, CLUSTER). The storage and the
+    counters of a partitioned table are those of its leaf partitions, so its
+    fingerprint joins theirs, and partitioned tables with a leaf that is not
+    a plain table, like a foreign table, have no fingerprint.
+
+    Args:
+        dsn (str): The Data Source Name for connecting to the PostgreSQL database.
+
+    Returns:
+        dict[str, str]: A dictionary mapping table names to their fingerprints.
+    """
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SELECT_TABLE_FINGERPRINTS_QUERY)
+            return {
+                table: fingerprint
+                for table, fingerprint in cur.fetchall()
+                if fingerprint is not None
+            }
 
 
 def check_table_exists(dsn: str, table: str) -> bool:
     """
     Checks if a table with the specified name exists in the given database.
 
+    Only the schema of the table is listed, so the check stays cheap on
+    databases with many schemas.
+
     Args:
         dsn (str): The Data Source Name for connecting to the PostgreSQL database.
-        table (str): The name of the table to check.
+        table (str): The name of the table to check, qualified by the schema outside the "public" schema.
 
     Returns:
         bool: True if the table exists, False otherwise.
     """
-    return table in get_database_tables(dsn=dsn)
+    schema, _, _ = table.rpartition(".")
+    return table in get_database_tables(
+        dsn=dsn,
+        schemas=[schema or DEFAULT_SCHEMA],
+        relation_kinds=list(RelationKind),
+    )
 
 
 def validate_database_connection(dsn: str) -> str:
@@ -0,0 +1,448 @@
+"""
+Output sinks for exported record batches.
+
+Every export writes its batches through a sink, so the fetch and batching
+code does not depend on the output file format.
+"""
+
+import re
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from types import TracebackType
+from typing import Protocol, Self
+
+import pyarrow as pa
+from pyarrow import RecordBatch, Schema
+from pyarrow.parquet import ParquetFile, ParquetWriter, SortingColumn
+
+from pg2pyrquet.core.exceptions import (
+    InvalidColumnOptionError,
+    UnsupportedCompressionError,
+)
+from pg2pyrquet.utils.summary import MetadataCollector
+
+# Buffer compression codecs supported by the Arrow IPC format
+IPC_COMPRESSION_CODECS = ("lz4", "zstd")
+
+
+class OutputFormat(str, Enum):
+    """
+    File formats supported as export output.
+    """
+
+    PARQUET = "parquet"
+    ARROW_IPC = "arrow-ipc"
+    ARROW_IPC_STREAM = "arrow-ipc-stream"
+
+    @property
+    def extension(self) -> str:
+        """
+        Returns the conventional file extension for the format.
+        """
+        return {
+            OutputFormat.PARQUET: ".parquet",
+            OutputFormat.ARROW_IPC: ".arrow",
+            OutputFormat.ARROW_IPC_STREAM: ".arrows",
+        }[self]
+
+
+@dataclass
+class SinkOptions:
+    """
+    Settings of the sink the exported batches are written to.
+
+    Attributes:
+        output_format (OutputFormat): The output file format.
+        compression (str | None): The compression codec. Parquet uses its
+            default codec and Arrow IPC writes uncompressed buffers when None.
+        write_page_index (bool): Whether to write the Parquet page index.
+        bloom_filter_columns (list[str]): Columns to write Parquet bloom
+            filters for, as "column" or "column:ndv".
+        sorting_columns (list[str]): Columns the export is ordered by, as
+            "column" or "column:desc", declared in the Parquet metadata.
+        metadata_collector (MetadataCollector | None): The collector of the
+            footers of the written Parquet files, for the dataset summary.
+    """
+
+    output_format: OutputFormat = OutputFormat.PARQUET
+    compression: str | None = None
+    write_page_index: bool = False
+    bloom_filter_columns: list[str] = field(default_factory=list)
+    sorting_columns: list[str] = field(default_factory=list)
+    metadata_collector: MetadataCollector | None = field(
+        default=None, compare=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        self.output_format = OutputFormat(self.output_format)
+
+
+class BatchSink(Protocol):
+    """
+    Interface shared by all the sinks.
+    """
+
+    def write_batch(self, batch: RecordBatch) -> None:
+        """
+        Writes the record batch to the output.
+        """
+
+    def close(self) -> None:
+        """
+        Flushes and closes the output.
+        """
+
+    def __enter__(self) -> Self:
+        """
+        Returns the sink itself.
+        """
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """
+        Closes the sink.
+        """
+
+
+class ArrowIpcSink:
+    """
+    Sink writing record batches in the Arrow IPC file or stream format.
+
+    Files written without buffer compression can be memory-mapped by the
+    consumers and read with zero copies.
+    """
+
+    def __init__(
+        self,
+        where: Path,
+        schema: Schema,
+        stream: bool = False,
+        compression: str | None = None,
+    ) -> None:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        new_writer = pa.ipc.new_stream if stream else pa.ipc.new_file
+        self._file = pa.OSFile(str(where), mode="wb")
+        try:
+            self._writer = new_writer(self._file, schema, options=options)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def write_batch(self, batch: RecordBatch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        self._file.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def split_column_spec(spec: str) -> tuple[str, str | None]:
+    """
+    Splits a per-column option in the "column[:value]" format.
+
+    Args:
+        spec (str): The column option.
+
+    Returns:
+        tuple[str, str | None]: The column name and the optional value.
+
+    Raises:
+        InvalidColumnOptionError: If the column name is empty.
+    """
+    column, _, value = spec.partition(":")
+    if not column:
+        raise InvalidColumnOptionError(f"Column name is missing in '{spec}'.")
+    return column, value or None
+
+
+def get_bloom_filter_options(
+    schema: Schema, columns: list[str]
+) -> dict[str, dict[str, int]]:
+    """
+    Builds the ParquetWriter bloom filter options for the specified columns.
+
+    Args:
+        schema (Schema): The schema of the written record batches.
+        columns (list[str]): Column options in the "column[:ndv]" format.
+
+    Returns:
+        dict[str, dict[str, int]]: The bloom filter options by column.
+
+    Raises:
+        InvalidColumnOptionError: If a column is unknown or the NDV is invalid.
+    """
+    bloom_filter_options = {}
+    for spec in columns:
+        column, ndv = split_column_spec(spec=spec)
+        if column not in schema.names:
+            raise InvalidColumnOptionError(
+                f"Bloom filter column '{column}' is not in the query result."
+            )
+        if ndv is not None and not ndv.isdigit():
+            raise InvalidColumnOptionError(
+                f"Bloom filter NDV must be a positive integer, got '{ndv}'."
+            )
+        bloom_filter_options[column] = {"ndv": int(ndv)} if ndv else {}
+    return bloom_filter_options
+
+
+def get_sorting_columns(
+    schema: Schema, columns: list[str]
+) -> tuple[SortingColumn, ...]:
+    """
+    Builds the Parquet sorting columns metadata for the specified columns.
+
+    Args:
+        schema (Schema): The schema of the written record batches.
+        columns (list[str]): Column options in the "column[:asc|desc]" format.
+
+    Returns:
+        tuple[SortingColumn, ...]: The sorting columns metadata.
+
+    Raises:
+        InvalidColumnOptionError: If a column is unknown or the order is invalid.
+    """
+    sort_keys = []
+    for spec in columns:
+        column, order = split_column_spec(spec=spec)
+        if order not in (None, "asc", "desc"):
+            raise InvalidColumnOptionError(
+                f"Sort order must be 'asc' or 'desc', got '{order}'."
+            )
+        sort_keys.append(
+            (column, "descending" if order == "desc" else "ascending")
+        )
+
+    try:
+        return SortingColumn.from_ordering(schema, sort_keys)
+    except ValueError as e:
+        raise InvalidColumnOptionError(str(e)) from e
+
+
+def open_sink(where: Path, schema: Schema, options: SinkOptions) -> BatchSink:
+    """
+    Opens the sink matching the configured output format.
+
+    Args:
+        where (Path): The path to the output file.
+        schema (Schema): The schema of the written record batches.
+        options (SinkOptions): The sink settings.
+
+    Returns:
+        BatchSink: The opened sink.
+
+    Raises:
+        UnsupportedCompressionError: If the codec is not supported by Arrow IPC.
+        InvalidColumnOptionError: If a per-column Parquet option is invalid.
+    """
+    if options.output_format == OutputFormat.PARQUET:
+        return ParquetWriter(
+            where=where,
+            schema=schema,
+            compression=options.compression or "snappy",
+            write_page_index=options.write_page_index,
+            bloom_filter_options=get_bloom_filter_options(
+                schema=schema, columns=options.bloom_filter_columns
+            )
+            or None,
+            sorting_columns=get_sorting_columns(
+                schema=schema, columns=options.sorting_columns
+            )
+            or None,
+            metadata_collector=(
+                options.metadata_collector.for_file(path=where)
+                if options.metadata_collector
+                else None
+            ),
+        )
+
+    if (
+        options.compression is not None
+        and options.compression.lower() not in IPC_COMPRESSION_CODECS
+    ):
+        raise UnsupportedCompressionError(
+            f"Arrow IPC supports only {IPC_COMPRESSION_CODECS} compression, "
+            f"got '{options.compression}'."
+        )
+
+    return ArrowIpcSink(
+        where=where,
+        schema=schema,
+        stream=options.output_format == OutputFormat.ARROW_IPC_STREAM,
+        compression=options.compression and options.compression.lower(),
+    )
+
+
+def get_rolled_file(where: Path, index: int) -> Path:
+    """
+    Generates the path of a file of an output rolled over several files.
+
+    Args:
+        where (Path): The path to the output file.
+        index (int): The index of the rolled file.
+
+    Returns:
+        Path: The path to the rolled file, like "output-00000.parquet".
+    """
+    return where.with_name(f"{where.stem}-{index:05d}{where.suffix}")
+
+
+def remove_output_files(where: Path) -> list[Path]:
+    """
+    Removes the files an earlier export of an output wrote.
+
+    An output written to a single file or rolled over several files leaves
+    different file names, so a new export of it removes both kinds first,
+    instead of leaving stale files next to the ones it writes.
+
+    Args:
+        where (Path): The path to the output file.
+
+    Returns:
+        list[Path]: The paths to the removed files.
+    """
+    if not where.parent.is_dir():
+        return []
+
+    rolled_name = re.compile(
+        rf"{re.escape(where.stem)}-\d{{5,}}{re.escape(where.suffix)}"
+    )
+    removed = [
+        path
+        for path in sorted(where.parent.iterdir())
+        if path.is_file()
+        and (path.name == where.name or rolled_name.fullmatch(path.name))
+    ]
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+class RollingSink:
+    """
+    Sink writing record batches to a sequence of files of a maximum size.
+
+    A new file is started once the current one reaches the size limit, so a
+    file may exceed the limit by at most one batch. A sink closed without any
+    batch writes one empty file, so the schema of an empty output is kept.
+    """
+
+    def __init__(
+        self,
+        get_path: Callable[[int], Path],
+        schema: Schema,
+        options: SinkOptions,
+        max_file_bytes: int,
+    ) -> None:
+        self.files: list[Path] = []
+        self._get_path = get_path
+        self._schema = schema
+        self._options = options
+        self._max_file_bytes = max_file_bytes
+        self._sink: BatchSink | None = None
+
+    def write_batch(self, batch: RecordBatch) -> None:
+        sink = self._open_file()
+        sink.write_batch(batch)
+        if self.files[-1].stat().st_size >= self._max_file_bytes:
+            self._close_file()
+
+    def close(self) -> None:
+        if not self.files:
+            self._open_file()
+        self._close_file()
+
+    def _open_file(self) -> BatchSink:
+        if self._sink is None:
+            self.files.append(self._get_path(len(self.files)))
+            self._sink = open_sink(
+                where=self.files[-1],
+                schema=self._schema,
+                options=self._options,
+            )
+        return self._sink
+
+    def _close_file(self) -> None:
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def read_schema(where: Path, output_format: OutputFormat) -> Schema:
+    """
+    Reads the schema of a file written by a sink.
+
+    Args:
+        where (Path): The path to the file.
+        output_format (OutputFormat): The format of the file.
+
+    Returns:
+        Schema: The schema of the file.
+    """
+    if output_format == OutputFormat.PARQUET:
+        with ParquetFile(where) as parquet_file:
+            return parquet_file.schema_arrow
+
+    with pa.memory_map(str(where)) as source:
+        if output_format == OutputFormat.ARROW_IPC_STREAM:
+            return pa.ipc.open_stream(source).schema
+        return pa.ipc.open_file(source).schema
+
+
+def read_batches(
+    where: Path, output_format: OutputFormat
+) -> Iterator[RecordBatch]:
+    """
+    Streams the record batches of a file written by a sink.
+
+    Parquet files are read one row group at a time and Arrow IPC files are
+    memory-mapped, so the file is never loaded into memory as a whole.
+
+    Args:
+        where (Path): The path to the file.
+        output_format (OutputFormat): The format of the file.
+
+    Yields:
+        RecordBatch: The record batches of the file.
+    """
+    if output_format == OutputFormat.PARQUET:
+        with ParquetFile(where) as parquet_file:
+            for index in range(parquet_file.num_row_groups):
+                yield from parquet_file.read_row_group(index).to_batches()
+        return
+
+    with pa.memory_map(str(where)) as source:
+        if output_format == OutputFormat.ARROW_IPC_STREAM:
+            yield from pa.ipc.open_stream(source)
+        else:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
@@ -0,0 +1,204 @@
+"""
+Bounded-memory external sort of exported record batches.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import RecordBatch, Schema, Table
+
+from pg2pyrquet.core.exceptions import InvalidColumnOptionError
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.sinks import BatchSink
+
+logger = get_logger(name=__name__)
+
+# Memory used to buffer rows before a sorted run is spilled to disk
+DEFAULT_SORT_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Number of rows per record batch in the spilled runs and in the output
+DEFAULT_SORT_CHUNK_SIZE = 64 * 1024
+
+
+class SortedRun:
+    """
+    Sorted run spilled to a memory-mapped Arrow IPC file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._source = pa.memory_map(str(path))
+        self._reader = pa.ipc.open_file(self._source)
+        self._next_batch = 0
+        self.pending = Table.from_batches([], schema=self._reader.schema)
+
+    def load(self) -> bool:
+        """
+        Loads the next spilled batch when all the pending rows are consumed.
+
+        Returns:
+            bool: False if the run is exhausted, True otherwise.
+        """
+        while not self.pending.num_rows:
+            if self._next_batch == self._reader.num_record_batches:
+                return False
+            batch = self._reader.get_batch(self._next_batch)
+            self._next_batch += 1
+            self.pending = Table.from_batches([batch])
+        return True
+
+    def last_key(self, key: str) -> pa.ChunkedArray:
+        """
+        Returns the largest key of the pending rows as a one-value array.
+        """
+        return self.pending[key].slice(self.pending.num_rows - 1)
+
+    def close(self) -> None:
+        self._source.close()
+
+
+class ExternalSortSink:
+    """
+    Sink sorting all the written batches by a key column before passing them
+    to the wrapped sink.
+
+    Batches are buffered up to the memory limit, then sorted and spilled to
+    temporary Arrow IPC files. On close the runs are memory-mapped and
+    k-way merged into the wrapped sink, so memory stays bounded by the limit
+    plus one chunk per run. Rows with a null key are written last, matching
+    the PostgreSQL ORDER BY default.
+    """
+
+    def __init__(
+        self,
+        sink: BatchSink,
+        schema: Schema,
+        key: str,
+        temp_dir: Path,
+        memory_limit: int = DEFAULT_SORT_MEMORY_LIMIT,
+        chunk_size: int = DEFAULT_SORT_CHUNK_SIZE,
+    ) -> None:
+        if key not in schema.names:
+            raise InvalidColumnOptionError(
+                f"Sort column '{key}' is not in the query result."
+            )
+
+        self._sink = sink
+        self._schema = schema
+        self._key = key
+        self._memory_limit = memory_limit
+        self._chunk_size = chunk_size
+        self._temp_dir = Path(
+            tempfile.mkdtemp(prefix=".pg2pyrquet-sort-", dir=temp_dir)
+        )
+        self._buffer: list[RecordBatch] = []
+        self._buffer_size = 0
+        self._runs: list[Path] = []
+        self._null_runs: list[Path] = []
+
+    def write_batch(self, batch: RecordBatch) -> None:
+        self._buffer.append(batch)
+        self._buffer_size += batch.nbytes
+        if self._buffer_size >= self._memory_limit:
+            self._spill()
+
+    def close(self) -> None:
+        try:
+            if self._runs or self._null_runs:
+                self._spill()
+                self._merge()
+            else:
+                sorted_table, null_table = self._sort_buffer()
+                self._write_table(sorted_table)
+                self._write_table(null_table)
+            self._sink.close()
+        finally:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+        self._sink.close()
+
+    def _sort_buffer(self) -> tuple[Table, Table]:
+        """
+        Sorts the buffered batches and splits off the rows with a null key.
+        """
+        table = Table.from_batches(self._buffer, schema=self._schema)
+        self._buffer = []
+        self._buffer_size = 0
+
+        is_null = pc.is_null(table[self._key])
+        return (
+            table.filter(pc.invert(is_null)).sort_by(self._key),
+            table.filter(is_null),
+        )
+
+    def _spill(self) -> None:
+        """
+        Writes the sorted buffer as a new run to the temporary directory.
+        """
+        if not self._buffer:
+            return
+
+        sorted_table, null_table = self._sort_buffer()
+        for table, runs, kind in (
+            (sorted_table, self._runs, "run"),
+            (null_table, self._null_runs, "nulls"),
+        ):
+            if not table.num_rows:
+                continue
+            path = self._temp_dir / f"{kind}-{len(runs)}.arrow"
+            with pa.ipc.new_file(str(path), self._schema) as writer:
+                writer.write_table(table, max_chunksize=self._chunk_size)
+            runs.append(path)
+
+        logger.info(f"Spilled sorted run {len(self._runs)} to disk.")
+
+    def _merge(self) -> None:
+        """
+        Merges the spilled runs into the wrapped sink in key order.
+        """
+        runs = [SortedRun(path=path) for path in self._runs]
+        try:
+            active = [run for run in runs if run.load()]
+            while active:
+                # Every pending row up to the smallest of the runs' largest
+                # keys can be emitted: no run holds a smaller key later on.
+                bound = pc.min(
+                    pa.chunked_array(
+                        [run.last_key(self._key) for run in active]
+                    )
+                )
+                chunks = []
+                for run in active:
+                    mask = pc.less_equal(run.pending[self._key], bound)
+                    chunks.append(run.pending.filter(mask))
+                    run.pending = run.pending.filter(pc.invert(mask))
+                self._write_table(pa.concat_tables(chunks).sort_by(self._key))
+                active = [run for run in active if run.load()]
+        finally:
+            for run in runs:
+                run.close()
+
+        for path in self._null_runs:
+            with pa.memory_map(str(path)) as source:
+                self._write_table(pa.ipc.open_file(source).read_all())
+
+    def _write_table(self, table: Table) -> None:
+        for batch in table.to_batches(max_chunksize=self._chunk_size):
+            self._sink.write_batch(batch)
@@ -0,0 +1,257 @@
+"""
+Dataset summary files of a folder of exported Parquet files.
+
+The `_metadata` file holds the footers of all the files, so readers plan a
+query over the folder from one file instead of every footer, and the
+`_common_metadata` file holds their schema. The JSON manifest lists the row
+count and the per-column min/max statistics of every file, for consumers
+without a Parquet reader.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import pyarrow.parquet as pq
+from pyarrow.parquet import FileMetaData
+
+from pg2pyrquet.core.logging import get_logger
+
+logger = get_logger(name=__name__)
+
+# Summary file with the row groups of all the files of the folder
+METADATA_FILE_NAME = "_metadata"
+
+# Summary file with the schema shared by the files of the folder
+COMMON_METADATA_FILE_NAME = "_common_metadata"
+
+# JSON manifest with the row counts and column statistics of every file
+MANIFEST_FILE_NAME = "_manifest.json"
+
+
+class MetadataCollector:
+    """
+    Thread-safe collection of the footers of the Parquet files as they close.
+
+    Writers append their footer to the collector returned by `for_file`, like
+    to the `metadata_collector` list of `pyarrow.parquet.ParquetWriter`. The
+    collector is not shared with other processes, so the files they write are
+    summarized from their footers.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[Path, FileMetaData] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"files": {}}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, path: Path, metadata: FileMetaData) -> None:
+        """
+        Records the footer of a written file.
+
+        Args:
+            path (Path): The path of the file.
+            metadata (FileMetaData): The footer of the file.
+        """
+        with self._lock:
+            self.files[Path(path).resolve()] = metadata
+
+    def for_file(self, path: Path) -> "FileMetadataCollector":
+        """
+        Returns the collector of the footer of one file.
+
+        Args:
+            path (Path): The path of the file.
+
+        Returns:
+            FileMetadataCollector: The collector passed to the file writer.
+        """
+        return FileMetadataCollector(collector=self, path=path)
+
+
+class FileMetadataCollector:
+    """
+    Collector of the footer of one file, appended to by its writer.
+    """
+
+    def __init__(self, collector: MetadataCollector, path: Path) -> None:
+        self.collector = collector
+        self.path = path
+
+    def append(self, metadata: FileMetaData) -> None:
+        self.collector.add(path=self.path, metadata=metadata)
+
+
+def get_column_statistics(metadata: FileMetaData) -> dict[str, dict]:
+    """
+    Aggregates the statistics of the columns over the row groups of a file.
+
+    The bounds are only known when every row group with values has them.
+
+    Args:
+        metadata (FileMetaData): The footer of the file.
+
+    Returns:
+        dict[str, dict]: A dictionary mapping the column paths to their min,
+            max and null count, None when unknown.
+    """
+    row_groups = [
+        metadata.row_group(index) for index in range(metadata.num_row_groups)
+    ]
+    statistics = {}
+    for column_index in range(metadata.num_columns):
+        stats = [
+            (row_group.num_rows, row_group.column(column_index).statistics)
+            for row_group in row_groups
+        ]
+        bounded = [
+            column_stats
+            for _, column_stats in stats
+            if column_stats is not None and column_stats.has_min_max
+        ]
+        complete = all(
+            column_stats is not None
+            and (
+                column_stats.has_min_max
+                or column_stats.null_count == num_rows
+            )
+            for num_rows, column_stats in stats
+        )
+        counted = all(
+            column_stats is not None and column_stats.has_null_count
+            for _, column_stats in stats
+        )
+        statistics[metadata.schema.column(column_index).path] = {
+            "min": (
+                min(column_stats.min for column_stats in bounded)
+                if complete and bounded
+                else None
+            ),
+            "max": (
+                max(column_stats.max for column_stats in bounded)
+                if complete and bounded
+                else None
+            ),
+            "null_count": (
+                sum(column_stats.null_count for _, column_stats in stats)
+                if counted
+                else None
+            ),
+        }
+    return statistics
+
+
+def remove_dataset_summary(
+    folder: Path,
+    names: tuple[str, ...] = (
+        METADATA_FILE_NAME,
+        COMMON_METADATA_FILE_NAME,
+        MANIFEST_FILE_NAME,
+    ),
+) -> list[Path]:
+    """
+    Removes the summary files of a folder left by an earlier run.
+
+    Summary files describe the files of the folder when they were written, so
+    they are removed whenever the files change without rewriting them.
+
+    Args:
+        folder (Path): The folder with the Parquet files.
+        names (tuple[str, ...], optional): The names of the summary files to remove. Defaults to all of them.
+
+    Returns:
+        list[Path]: The removed summary files.
+    """
+    removed = [folder / name for name in names if (folder / name).exists()]
+    for path in removed:
+        path.unlink()
+    if removed:
+        logger.info(f"Removed the outdated summary files of: {folder}")
+    return removed
+
+
+def write_dataset_summary(
+    folder: Path, collector: MetadataCollector | None = None
+) -> list[Path]:
+    """
+    Writes the summary files of the Parquet files of a folder.
+
+    The footers collected while the files were written are used as they are,
+    and the footers of the other files are read. `_metadata` and
+    `_common_metadata` need one schema, so they are only written when all the
+    files share it, while the manifest always lists every file. The summary
+    files that are not rewritten are removed, so none of an earlier run is
+    left describing other files.
+
+    Args:
+        folder (Path): The folder with the Parquet files.
+        collector (MetadataCollector | None, optional): The footers collected by the writers. Defaults to None.
+
+    Returns:
+        list[Path]: The written summary files.
+    """
+    collected = collector.files if collector else {}
+    files = sorted(folder.glob("*.parquet"))
+    if not files:
+        remove_dataset_summary(folder=folder)
+        return []
+
+    footers = []
+    for path in files:
+        metadata = collected.get(path.resolve()) or pq.read_metadata(path)
+        metadata.set_file_path(path.name)
+        footers.append(metadata)
+
+    manifest_path = folder / MANIFEST_FILE_NAME
+    temp_path = manifest_path.with_suffix(".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(
+            {
+                "rows": sum(metadata.num_rows for metadata in footers),
+                "files": [
+                    {
+                        "path": path.name,
+                        "rows": metadata.num_rows,
+                        "row_groups": metadata.num_row_groups,
+                        "columns": get_column_statistics(metadata=metadata),
+                    }
+                    for path, metadata in zip(files, footers)
+                ],
+            },
+            file,
+            indent=2,
+            default=str,
+        )
+    os.replace(temp_path, manifest_path)
+    written = [manifest_path]
+
+    schema = footers[0].schema
+    if not all(metadata.schema.equals(schema) for metadata in footers):
+        logger.warning(
+            f"Files of {folder} have different schemas, "
+            f"skipping {METADATA_FILE_NAME} and {COMMON_METADATA_FILE_NAME}"
+        )
+        remove_dataset_summary(
+            folder=folder,
+            names=(METADATA_FILE_NAME, COMMON_METADATA_FILE_NAME),
+        )
+        return written
+
+    arrow_schema = schema.to_arrow_schema()
+    pq.write_metadata(arrow_schema, folder / COMMON_METADATA_FILE_NAME)
+    pq.write_metadata(
+        arrow_schema, folder / METADATA_FILE_NAME, metadata_collector=footers
+    )
+    written += [
+        folder / COMMON_METADATA_FILE_NAME,
+        folder / METADATA_FILE_NAME,
+    ]
+    logger.info(f"Wrote the summary files of {len(files)} files in: {folder}")
+    return written
@@ -0,0 +1,240 @@
+"""
+Rate limiting of the rows and bytes exports read from the database.
+
+One throttle can be shared by the exports running in threads, so the limits
+apply to all of them together. The adaptive mode periodically checks the load
+of the server and the latency of the fetches, halving the read rate while the
+server is loaded and slowly restoring it afterwards.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any
+
+import psycopg
+
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.postgres import get_server_load
+
+logger = get_logger(name=__name__)
+
+# Minimum interval between two checks of the server load, in seconds
+PROBE_INTERVAL = 5.0
+
+# Timeout of the connection and of the query probing the server load, in
+# seconds
+PROBE_TIMEOUT = 2
+
+# Active sessions waiting on I/O or locks above which the server is loaded,
+# not counting the sessions of the exports
+MAX_WAITING_SESSIONS = 4
+
+# Replication lag above which the server is loaded, in seconds
+MAX_REPLICATION_LAG = 10.0
+
+# Ratio of the recent to the fastest fetch latency above which the server is
+# loaded
+MAX_LATENCY_RATIO = 3.0
+
+# Weight of the latest fetch in the average fetch latency
+LATENCY_SMOOTHING = 0.2
+
+# Lowest fraction of the read rate kept while the server is loaded
+MIN_RATE_FACTOR = 0.05
+
+# Factor the read rate grows by after every check finding the server idle
+RECOVERY_FACTOR = 1.25
+
+
+@dataclass(frozen=True)
+class ThrottleLimits:
+    """
+    Limits of the rate exports read from the database at.
+
+    Attributes:
+        max_rows_per_sec (float | None): The maximum number of rows read per second.
+        max_bytes_per_sec (float | None): The maximum number of bytes read per second.
+        adaptive (bool): Whether to slow down while the server is loaded.
+    """
+
+    max_rows_per_sec: float | None = None
+    max_bytes_per_sec: float | None = None
+    adaptive: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether any limit is set.
+        """
+        return bool(
+            self.max_rows_per_sec or self.max_bytes_per_sec or self.adaptive
+        )
+
+    def split(self, workers: int) -> "ThrottleLimits":
+        """
+        Divides the rate limits between workers that cannot share a throttle.
+
+        Args:
+            workers (int): The number of workers.
+
+        Returns:
+            ThrottleLimits: The limits of one worker.
+        """
+        return replace(
+            self,
+            max_rows_per_sec=self.max_rows_per_sec
+            and self.max_rows_per_sec / workers,
+            max_bytes_per_sec=self.max_bytes_per_sec
+            and self.max_bytes_per_sec / workers,
+        )
+
+
+class Throttle:
+    """
+    Thread-safe limiter of the rows and bytes read from the database.
+
+    Every fetched batch pushes back the time the next fetch of any thread may
+    start at, by the time the batch takes at the limited rate. Without rate
+    limits, the adaptive mode pauses after every fetch instead, so the export
+    spends only the allowed fraction of its time reading.
+    """
+
+    def __init__(
+        self, limits: ThrottleLimits, dsn: str | None = None
+    ) -> None:
+        self.limits = limits
+        self.dsn = dsn
+        self.rate_factor = 1.0
+        self._next_fetch = -math.inf
+        self._last_probe = time.monotonic()
+        self._latency: float | None = None
+        self._fastest_latency: float | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def wait(self, rows: int, nbytes: int, fetch_seconds: float) -> None:
+        """
+        Sleeps until the fetched batch fits the limits.
+
+        Args:
+            rows (int): The number of fetched rows.
+            nbytes (int): The size of the fetched rows in bytes.
+            fetch_seconds (float): The duration of the fetch in seconds.
+        """
+        if self.limits.adaptive:
+            with self._lock:
+                probe = self._record_fetch(
+                    rows=rows, fetch_seconds=fetch_seconds
+                )
+            if probe:
+                # The server is probed outside the lock, so the exports
+                # sharing the throttle do not wait for the probe
+                self._adapt()
+
+        with self._lock:
+            now = time.monotonic()
+            fetch_cost = max(
+                (
+                    rows / self.limits.max_rows_per_sec
+                    if self.limits.max_rows_per_sec
+                    else 0.0
+                ),
+                (
+                    nbytes / self.limits.max_bytes_per_sec
+                    if self.limits.max_bytes_per_sec
+                    else 0.0
+                ),
+            )
+            if fetch_cost:
+                self._next_fetch = (
+                    max(self._next_fetch, now - fetch_seconds)
+                    + fetch_cost / self.rate_factor
+                )
+            else:
+                self._next_fetch = max(self._next_fetch, now) + (
+                    fetch_seconds * (1 / self.rate_factor - 1)
+                )
+            delay = self._next_fetch - now
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record_fetch(self, rows: int, fetch_seconds: float) -> bool:
+        """
+        Records the latency of a fetch and claims the next load probe.
+
+        Returns:
+            bool: Whether the server load is due to be probed.
+        """
+        if rows:
+            latency = fetch_seconds / rows
+            self._latency = (
+                latency
+                if self._latency is None
+                else LATENCY_SMOOTHING * latency
+                + (1 - LATENCY_SMOOTHING) * self._latency
+            )
+            self._fastest_latency = min(
+                latency, self._fastest_latency or latency
+            )
+
+        now = time.monotonic()
+        if now - self._last_probe < PROBE_INTERVAL:
+            return False
+        self._last_probe = now
+        return True
+
+    def _adapt(self) -> None:
+        with self._lock:
+            slow = bool(
+                self._latency is not None
+                and self._fastest_latency
+                and self._latency > self._fastest_latency * MAX_LATENCY_RATIO
+            )
+        reasons = ["slow fetches"] if slow else []
+        reasons += self._get_server_load_reasons()
+
+        with self._lock:
+            if reasons:
+                self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+                logger.warning(
+                    "Server is loaded (%s), reading at %.0f%% of the rate",
+                    ", ".join(reasons),
+                    self.rate_factor * 100,
+                )
+            elif self.rate_factor < 1:
+                self.rate_factor = min(
+                    1.0, self.rate_factor * RECOVERY_FACTOR
+                )
+                logger.info(
+                    "Server load is normal, reading at %.0f%% of the rate",
+                    self.rate_factor * 100,
+                )
+
+    def _get_server_load_reasons(self) -> list[str]:
+        if not self.dsn:
+            return []
+        try:
+            waiting_sessions, replication_lag = get_server_load(
+                dsn=self.dsn, timeout=PROBE_TIMEOUT
+            )
+        except psycopg.Error as e:
+            logger.warning(f"Failed to check the server load: {e}")
+            return []
+
+        reasons = []
+        if waiting_sessions > MAX_WAITING_SESSIONS:
+            reasons.append(f"{waiting_sessions} waiting sessions")
+        if replication_lag > MAX_REPLICATION_LAG:
+            reasons.append(f"{replication_lag:.1f}s replication lag")
+        return reasons
@@ -0,0 +1,572 @@
+"""
+Verification of exported files against aggregates computed by the server.
+
+The server computes the row count and per-column aggregates of the query in a
+single pass, and the same aggregates are computed from the written file with
+pyarrow.compute, so an export is checked without comparing it row by row.
+
+String columns are hashed only on request, as the file side hashes every
+distinct value in Python, about 1.5 microseconds per value of a column of
+unique values, and the server hashes every row.
+"""
+
+import hashlib
+import math
+import os
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import psycopg
+import pyarrow as pa
+import pyarrow.compute as pc
+from psycopg import sql
+from pyarrow import Array, ChunkedArray, DataType, RecordBatch, Table
+from pyarrow.parquet import ParquetFile
+
+from pg2pyrquet.core.exceptions import VerificationError
+from pg2pyrquet.core.logging import get_logger
+from pg2pyrquet.utils.postgres import get_query_aggregates
+from pg2pyrquet.utils.sinks import OutputFormat, read_batches
+from pg2pyrquet.utils.transforms import Transform
+
+logger = get_logger(name=__name__)
+
+# Order-independent hashes are summed modulo 2 ** 64
+HASH_MODULUS = 2**64
+
+# Relative tolerance of floating point aggregates, which depend on the order
+# of the additions
+FLOAT_TOLERANCE = 1e-6
+
+# Relative tolerance of the aggregates of single and half precision columns,
+# whose values carry fewer significant digits
+FLOAT32_TOLERANCE = 1e-4
+
+# Text of a value as the server outputs it. A cast to text would strip the
+# padding of bpchar values, which the exported strings keep
+OUTPUT_TEXT_EXPRESSION = (
+    "(CASE WHEN {column} IS NOT NULL THEN concat({column}) END)"
+)
+
+# Format of the dates hashed by the server, the ISO format Arrow casts dates
+# to strings in whatever the DateStyle of the session
+DATE_HASH_FORMAT = "YYYY-MM-DD"
+
+
+@dataclass
+class ColumnAggregates:
+    """
+    Aggregates of one column of an export.
+
+    Attributes:
+        count (int): The number of non-null values.
+        null_count (int): The number of null values.
+        min (Any): The minimum value, if the column is orderable.
+        max (Any): The maximum value, if the column is orderable.
+        sum (Any): The sum of the values, if the column is numeric.
+        hash (int | None): The order-independent hash of the values, if
+            their text representation matches on the server.
+    """
+
+    count: int = 0
+    null_count: int = 0
+    min: Any = None
+    max: Any = None
+    sum: Any = None
+    hash: int | None = None
+
+
+@dataclass
+class ExportAggregates:
+    """
+    Aggregates of an export.
+
+    Attributes:
+        num_rows (int): The number of rows.
+        columns (dict[str, ColumnAggregates]): The aggregates of the columns.
+    """
+
+    num_rows: int = 0
+    columns: dict[str, ColumnAggregates] = field(default_factory=dict)
+
+
+def is_orderable(data_type: DataType) -> bool:
+    """
+    Checks if the min and max of a column compare equally on both sides.
+    """
+    return (
+        pa.types.is_integer(data_type)
+        or pa.types.is_floating(data_type)
+        or pa.types.is_decimal(data_type)
+        or pa.types.is_date(data_type)
+        or pa.types.is_timestamp(data_type)
+        or is_text(data_type)
+    )
+
+
+def is_summable(data_type: DataType) -> bool:
+    """
+    Checks if the sum of a column is computed.
+    """
+    return (
+        pa.types.is_integer(data_type)
+        or pa.types.is_floating(data_type)
+        or pa.types.is_decimal(data_type)
+    )
+
+
+def is_hashable(data_type: DataType, hash_text: bool = False) -> bool:
+    """
+    Checks if the values of a column are hashed.
+
+    Numeric columns are already checked by their sum, and string columns are
+    hashed only with `hash_text`, for their cost.
+    """
+    return (
+        pa.types.is_boolean(data_type)
+        or pa.types.is_date32(data_type)
+        or (hash_text and is_text(data_type))
+    )
+
+
+def is_text(data_type: DataType) -> bool:
+    """
+    Checks if a column holds strings.
+    """
+    return pa.types.is_string(data_type) or pa.types.is_large_string(
+        data_type
+    )
+
+
+def get_float_tolerance(data_type: DataType) -> float:
+    """
+    Returns the relative tolerance of the aggregates of a column.
+    """
+    if pa.types.is_float16(data_type) or pa.types.is_float32(data_type):
+        return FLOAT32_TOLERANCE
+    return FLOAT_TOLERANCE
+
+
+def get_verified_columns(
+    data_types: dict[str, DataType], transforms: list[Transform]
+) -> dict[str, DataType]:
+    """
+    Selects the query columns written to the file unchanged.
+
+    Args:
+        data_types (dict[str, DataType]): The column data types of the query.
+        transforms (list[Transform]): The column transforms of the export.
+
+    Returns:
+        dict[str, DataType]: The columns to verify.
+    """
+    transformed = {transform.column for transform in transforms} | {
+        transform.argument
+        for transform in transforms
+        if transform.operation == "rename"
+    }
+    return {
+        column: data_type
+        for column, data_type in data_types.items()
+        if column not in transformed
+    }
+
+
+def get_server_aggregate_expressions(
+    column: str, data_type: DataType, hash_text: bool = False
+) -> list[sql.Composable]:
+    """
+    Builds the server-side aggregate expressions of a column.
+
+    Strings are compared as the server outputs them, keeping the padding of
+    bpchar values, in the "C" collation, which orders them by their bytes
+    like Arrow does. NaN values are left out of the min, max and sum of
+    floating point columns, as Arrow skips them in the min and max while the
+    server orders them above all numbers, and floats are summed in double
+    precision on both sides. The hash sums the first 64 bits of the MD5
+    digest of the text of every value, dates in the ISO format.
+
+    Args:
+        column (str): The name of the column.
+        data_type (DataType): The data type of the column.
+        hash_text (bool, optional): Whether to hash string columns. Defaults to False.
+
+    Returns:
+        list[sql.Composable]: The expressions, in the ColumnAggregates order.
+    """
+    identifier = sql.Identifier(column)
+    expressions = [sql.SQL("count({})").format(identifier)]
+
+    value: sql.Composable = identifier
+    text: sql.Composable = sql.SQL("{}::text").format(identifier)
+    where: sql.Composable = sql.SQL("")
+    if is_text(data_type):
+        text = sql.SQL(OUTPUT_TEXT_EXPRESSION).format(column=identifier)
+        value = sql.SQL('{} COLLATE "C"').format(text)
+    elif pa.types.is_date32(data_type):
+        text = sql.SQL("to_char({}, {})").format(
+            identifier, sql.Literal(DATE_HASH_FORMAT)
+        )
+    if pa.types.is_floating(data_type):
+        where = sql.SQL(" FILTER (WHERE {} <> 'NaN')").format(identifier)
+
+    if is_orderable(data_type):
+        expressions.append(sql.SQL("min({}){}").format(value, where))
+        expressions.append(sql.SQL("max({}){}").format(value, where))
+    if is_summable(data_type):
+        summed: sql.Composable = identifier
+        if pa.types.is_floating(data_type):
+            summed = sql.SQL("{}::float8").format(identifier)
+        expressions.append(sql.SQL("sum({}){}").format(summed, where))
+    if is_hashable(data_type=data_type, hash_text=hash_text):
+        expressions.append(
+            sql.SQL(
+                "sum(('x' || left(md5({}), 16))::bit(64)::bigint)"
+            ).format(text)
+        )
+    return expressions
+
+
+def get_server_aggregates(
+    conn: psycopg.Connection,
+    query: str,
+    columns: dict[str, DataType],
+    hash_text: bool = False,
+) -> ExportAggregates:
+    """
+    Computes the aggregates of a query on the server in one pass.
+
+    Args:
+        conn (psycopg.Connection): The connection reading the exported data.
+        query (str): The exported query.
+        columns (dict[str, DataType]): The columns to aggregate.
+        hash_text (bool, optional): Whether to hash string columns. Defaults to False.
+
+    Returns:
+        ExportAggregates: The aggregates of the query result.
+    """
+    num_rows, *values = get_query_aggregates(
+        conn=conn,
+        query=query,
+        aggregates=[
+            expression
+            for column, data_type in columns.items()
+            for expression in get_server_aggregate_expressions(
+                column=column, data_type=data_type, hash_text=hash_text
+            )
+        ],
+    )
+
+    aggregates = ExportAggregates(num_rows=num_rows)
+    column_values = iter(values)
+    for column, data_type in columns.items():
+        count = next(column_values)
+        column_aggregates = ColumnAggregates(
+            count=count, null_count=num_rows - count
+        )
+        if is_orderable(data_type):
+            column_aggregates.min = next(column_values)
+            column_aggregates.max = next(column_values)
+        if is_summable(data_type):
+            column_aggregates.sum = next(column_values)
+        if is_hashable(data_type=data_type, hash_text=hash_text):
+            column_hash = next(column_values)
+            if column_hash is not None:
+                column_aggregates.hash = int(column_hash) % HASH_MODULUS
+        aggregates.columns[column] = column_aggregates
+    return aggregates
+
+
+def hash_values(values: Array) -> int | None:
+    """
+    Computes the order-independent hash of an array, matching the server.
+
+    The array is dictionary-encoded, so only its distinct values are hashed.
+
+    Args:
+        values (Array): The values to hash.
+
+    Returns:
+        int | None: The sum of the value hashes modulo 2 ** 64, None if all
+            the values are null.
+    """
+    encoded = pc.dictionary_encode(pc.cast(values, pa.large_string()))
+    digests = pa.array(
+        [
+            int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+            for value in encoded.dictionary.to_pylist()
+        ],
+        type=pa.uint64(),
+    )
+    # Unsigned integer sums wrap around, which is the modulo 2 ** 64 sum
+    return pc.sum(pc.take(digests, encoded.indices)).as_py()
+
+
+def get_batch_aggregates(
+    batch: RecordBatch | Table,
+    columns: dict[str, DataType],
+    hash_text: bool = False,
+) -> ExportAggregates:
+    """
+    Computes the aggregates of one record batch or row group of the file.
+
+    Args:
+        batch (RecordBatch | Table): The record batch or row group.
+        columns (dict[str, DataType]): The columns to aggregate.
+        hash_text (bool, optional): Whether to hash string columns. Defaults to False.
+
+    Returns:
+        ExportAggregates: The aggregates of the record batch.
+    """
+    aggregates = ExportAggregates(num_rows=batch.num_rows)
+    for column in columns:
+        values = batch.column(column)
+        if isinstance(values, ChunkedArray):
+            values = values.combine_chunks()
+        data_type = values.type
+        column_aggregates = ColumnAggregates(
+            count=len(values) - values.null_count,
+            null_count=values.null_count,
+        )
+        aggregated = values
+        if pa.types.is_floating(data_type):
+            # NaN values are left out like on the server
+            aggregated = pc.if_else(
+                pc.is_nan(values), pa.scalar(None, data_type), values
+            )
+        if is_orderable(data_type):
+            min_max = pc.min_max(aggregated)
+            column_aggregates.min = min_max["min"].as_py()
+            column_aggregates.max = min_max["max"].as_py()
+        if is_summable(data_type):
+            summed = aggregated
+            if pa.types.is_integer(data_type):
+                # Integer sums wrap around, decimals are exact
+                summed = pc.cast(values, pa.decimal128(38, 0))
+            elif pa.types.is_floating(data_type):
+                summed = pc.cast(aggregated, pa.float64())
+            column_aggregates.sum = pc.sum(summed).as_py()
+        if is_hashable(data_type=data_type, hash_text=hash_text):
+            column_aggregates.hash = hash_values(values=values)
+        aggregates.columns[column] = column_aggregates
+    return aggregates
+
+
+def combine_optional(
+    left: Any, right: Any, combine: Callable[[Any, Any], Any]
+) -> Any:
+    """
+    Combines two partial aggregates, either of which may be None.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return combine(left, right)
+
+
+def merge_aggregates(
+    left: ExportAggregates, right: ExportAggregates
+) -> ExportAggregates:
+    """
+    Merges the aggregates of two parts of an export.
+
+    Args:
+        left (ExportAggregates): The aggregates of the first part.
+        right (ExportAggregates): The aggregates of the second part.
+
+    Returns:
+        ExportAggregates: The aggregates of both parts.
+    """
+    merged = ExportAggregates(num_rows=left.num_rows + right.num_rows)
+    for column in left.columns.keys() | right.columns.keys():
+        first = left.columns.get(column, ColumnAggregates())
+        second = right.columns.get(column, ColumnAggregates())
+        merged.columns[column] = ColumnAggregates(
+            count=first.count + second.count,
+            null_count=first.null_count + second.null_count,
+            min=combine_optional(first.min, second.min, min),
+            max=combine_optional(first.max, second.max, max),
+            sum=combine_optional(first.sum, second.sum, lambda a, b: a + b),
+            hash=combine_optional(
+                first.hash, second.hash, lambda a, b: (a + b) % HASH_MODULUS
+            ),
+        )
+    return merged
+
+
+def get_file_aggregates(
+    where: Path,
+    output_format: OutputFormat,
+    columns: dict[str, DataType],
+    hash_text: bool = False,
+    max_workers: int | None = None,
+) -> ExportAggregates:
+    """
+    Computes the aggregates of a written file.
+
+    Parquet row groups are read and aggregated in parallel threads, since the
+    decoding and the compute kernels release the GIL. Arrow IPC files are
+    memory-mapped and aggregated batch by batch.
+
+    Args:
+        where (Path): The path to the file.
+        output_format (OutputFormat): The format of the file.
+        columns (dict[str, DataType]): The columns to aggregate.
+        hash_text (bool, optional): Whether to hash string columns. Defaults to False.
+        max_workers (int | None, optional): The number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        ExportAggregates: The aggregates of the file.
+    """
+    partials: Iterable[ExportAggregates]
+    if output_format == OutputFormat.PARQUET:
+        with ParquetFile(where) as parquet_file:
+            num_row_groups = parquet_file.num_row_groups
+
+        def aggregate_row_group(index: int) -> ExportAggregates:
+            with ParquetFile(where, memory_map=True) as parquet_file:
+                row_group = parquet_file.read_row_group(
+                    index, columns=list(columns)
+                )
+            return get_batch_aggregates(
+                batch=row_group, columns=columns, hash_text=hash_text
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or os.cpu_count()
+        ) as pool:
+            partials = list(
+                pool.map(aggregate_row_group, range(num_row_groups))
+            )
+    else:
+        partials = (
+            get_batch_aggregates(
+                batch=batch, columns=columns, hash_text=hash_text
+            )
+            for batch in read_batches(
+                where=where, output_format=output_format
+            )
+        )
+
+    aggregates = ExportAggregates(
+        columns={column: ColumnAggregates() for column in columns}
+    )
+    for partial in partials:
+        aggregates = merge_aggregates(left=aggregates, right=partial)
+    return aggregates
+
+
+def values_match(
+    expected: Any, actual: Any, tolerance: float = FLOAT_TOLERANCE
+) -> bool:
+    """
+    Compares two aggregate values, floats with a relative tolerance.
+
+    Two NaN values match, like the sums of infinities of both signs.
+    """
+    if isinstance(expected, float) or isinstance(actual, float):
+        if expected is None or actual is None:
+            return expected is actual
+        if math.isnan(float(expected)) and math.isnan(float(actual)):
+            return True
+        return math.isclose(float(expected), float(actual), rel_tol=tolerance)
+    return expected == actual
+
+
+def compare_aggregates(
+    expected: ExportAggregates,
+    actual: ExportAggregates,
+    columns: dict[str, DataType] | None = None,
+) -> list[str]:
+    """
+    Lists the differences between the server and the file aggregates.
+
+    Args:
+        expected (ExportAggregates): The aggregates computed by the server.
+        actual (ExportAggregates): The aggregates computed from the file.
+        columns (dict[str, DataType] | None, optional): The column data types, setting the tolerance of the floating point columns. Defaults to None.
+
+    Returns:
+        list[str]: The descriptions of the mismatches, empty if all match.
+    """
+    mismatches = []
+    if expected.num_rows != actual.num_rows:
+        mismatches.append(
+            f"row count: expected {expected.num_rows}, got {actual.num_rows}"
+        )
+
+    for column, expected_column in expected.columns.items():
+        actual_column = actual.columns.get(column)
+        if actual_column is None:
+            mismatches.append(f"column '{column}' is missing from the file")
+            continue
+        tolerance = (
+            get_float_tolerance(data_type=columns[column])
+            if columns and column in columns
+            else FLOAT_TOLERANCE
+        )
+        for name in ("count", "null_count", "min", "max", "sum", "hash"):
+            expected_value = getattr(expected_column, name)
+            actual_value = getattr(actual_column, name)
+            if not values_match(
+                expected=expected_value,
+                actual=actual_value,
+                tolerance=tolerance,
+            ):
+                mismatches.append(
+                    f"{name} of column '{column}': expected "
+                    f"{expected_value!r}, got {actual_value!r}"
+                )
+    return mismatches
+
+
+def verify_export(
+    files: list[Path],
+    output_format: OutputFormat,
+    expected: ExportAggregates,
+    columns: dict[str, DataType],
+    hash_text: bool = False,
+) -> None:
+    """
+    Verifies the written files against the aggregates computed by the server.
+
+    Args:
+        files (list[Path]): The paths to the files written by the export.
+        output_format (OutputFormat): The format of the files.
+        expected (ExportAggregates): The aggregates computed by the server.
+        columns (dict[str, DataType]): The columns to verify.
+        hash_text (bool, optional): Whether to hash string columns. Defaults to False.
+
+    Raises:
+        VerificationError: If any aggregate of the files differs.
+    """
+    actual = ExportAggregates(
+        columns={column: ColumnAggregates() for column in columns}
+    )
+    for where in files:
+        actual = merge_aggregates(
+            left=actual,
+            right=get_file_aggregates(
+                where=where,
+                output_format=output_format,
+                columns=columns,
+                hash_text=hash_text,
+            ),
+        )
+
+    mismatches = compare_aggregates(
+        expected=expected, actual=actual, columns=columns
+    )
+    if mismatches:
+        raise VerificationError(
+            f"Export {[str(where) for where in files]} does not match the "
+            "database: " + "; ".join(mismatches)
+        )
+    logger.info(
+        f"Verified {actual.num_rows} rows and {len(columns)} columns of: "
+        f"{', '.join(str(where) for where in files)}"
+    )
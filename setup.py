@@ -20,7 +20,8 @@ install_requires = (
         "adbc_driver_postgresql==1.1.0",
         "psycopg==3.2.1",
         "psycopg-binary==3.2.1",
-        "pyarrow==17.0.0",
+        "pyarrow==26.0.0",
+        "PyYAML==6.0.3",
         "typer==0.12.4",
     ],
 )
@@ -0,0 +1,78 @@
+import json
+import logging
+from unittest.mock import patch
+
+from pg2pyrquet.core.logging import (
+    DeferredQueueHandler,
+    JsonFormatter,
+    RateLimitFilter,
+    get_log_formatter,
+    get_logger,
+)
+
+
+def make_record(msg="Writing batch %d", args=(1,), **extra):
+    record = logging.LogRecord(
+        name="pg2pyrquet.export",
+        level=logging.INFO,
+        pathname=__file__,
+        lineno=1,
+        msg=msg,
+        args=args,
+        exc_info=None,
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_get_logger_adds_handler_once():
+    logger = get_logger(name="pytest-logger")
+    get_logger(name="pytest-logger")
+
+    assert len(logger.handlers) == 1
+    assert isinstance(logger.handlers[0], DeferredQueueHandler)
+
+
+def test_deferred_queue_handler_does_not_format():
+    record = make_record()
+    handler = DeferredQueueHandler(queue=None)
+
+    assert handler.prepare(record) is record
+    assert record.args == (1,)
+
+
+@patch("pg2pyrquet.core.logging.time.monotonic")
+def test_rate_limit_filter(mock_monotonic):
+    rate_limit_filter = RateLimitFilter(interval=1.0)
+
+    mock_monotonic.return_value = 10.0
+    assert rate_limit_filter.filter(make_record(rate_limited=True))
+    mock_monotonic.return_value = 10.5
+    assert not rate_limit_filter.filter(make_record(rate_limited=True))
+    assert rate_limit_filter.filter(make_record())
+    assert rate_limit_filter.filter(
+        make_record(msg="Other message", rate_limited=True)
+    )
+    mock_monotonic.return_value = 11.0
+    assert rate_limit_filter.filter(make_record(rate_limited=True))
+
+
+def test_json_formatter():
+    record = make_record(batch=3, rows=100, rate_limited=True)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "pg2pyrquet.export"
+    assert entry["message"] == "Writing batch 1"
+    assert entry["batch"] == 3
+    assert entry["rows"] == 100
+    assert "rate_limited" not in entry
+
+
+def test_get_log_formatter(monkeypatch):
+    monkeypatch.setenv("PG2PYRQUET_LOG_FORMAT", "json")
+    assert isinstance(get_log_formatter(), JsonFormatter)
+
+    monkeypatch.delenv("PG2PYRQUET_LOG_FORMAT")
+    assert not isinstance(get_log_formatter(), JsonFormatter)
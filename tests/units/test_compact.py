@@ -0,0 +1,143 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from pg2pyrquet.compact import (
+    coalesce_batches,
+    compact_folder,
+    find_compaction_files,
+)
+from pg2pyrquet.core.exceptions import SchemaMismatchError
+from pg2pyrquet.utils.sinks import SinkOptions
+from pg2pyrquet.utils.summary import write_dataset_summary
+
+SCHEMA = pa.schema(fields=[pa.field("field1", pa.int64())])
+
+
+def write_file(path, values, schema=SCHEMA):
+    pq.write_table(pa.table([pa.array(values)], schema=schema), path)
+
+
+def test_find_compaction_files(tmp_path):
+    for name in ("b.parquet", "a.parquet", "_metadata", ".hidden.parquet"):
+        (tmp_path / name).touch()
+    (tmp_path / "_common.parquet").touch()
+
+    assert find_compaction_files(folder=tmp_path, pattern="*.parquet") == [
+        tmp_path / "a.parquet",
+        tmp_path / "b.parquet",
+    ]
+
+
+def test_coalesce_batches():
+    batches = [
+        pa.record_batch([pa.array([index])], schema=SCHEMA)
+        for index in range(5)
+    ]
+
+    coalesced = list(coalesce_batches(batches=batches, max_batch_bytes=16))
+
+    assert [batch.num_rows for batch in coalesced] == [2, 2, 1]
+
+
+def test_compact_folder(tmp_path):
+    for index in range(4):
+        write_file(
+            tmp_path / f"part-{index}.parquet", [3 - index, 10 + index]
+        )
+
+    compacted_files = compact_folder(
+        folder=tmp_path,
+        sink_options=SinkOptions(compression="zstd"),
+        sort_by="field1",
+    )
+
+    assert len(compacted_files) == 1
+    assert sorted(tmp_path.iterdir()) == compacted_files
+    parquet_file = pq.ParquetFile(compacted_files[0])
+    assert parquet_file.metadata.num_row_groups == 1
+    assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+    assert parquet_file.read().column("field1").to_pylist() == [
+        0,
+        1,
+        2,
+        3,
+        10,
+        11,
+        12,
+        13,
+    ]
+
+
+def test_compact_folder_removes_summary_files(tmp_path):
+    for index in range(2):
+        write_file(tmp_path / f"part-{index}.parquet", [index])
+    write_dataset_summary(folder=tmp_path)
+
+    compacted_files = compact_folder(folder=tmp_path)
+
+    assert sorted(tmp_path.iterdir()) == compacted_files
+
+
+def test_compact_folder_rolls_files(tmp_path):
+    for index in range(4):
+        write_file(tmp_path / f"part-{index}.parquet", list(range(1000)))
+
+    compacted_files = compact_folder(
+        folder=tmp_path, target_file_bytes=1, row_group_bytes=1
+    )
+
+    assert len(compacted_files) == 4
+    assert (
+        sum(pq.read_metadata(path).num_rows for path in compacted_files)
+        == 4000
+    )
+
+
+def test_compact_folder_nothing_to_compact(tmp_path):
+    write_file(tmp_path / "part-0.parquet", [1])
+
+    assert compact_folder(folder=tmp_path) == [tmp_path / "part-0.parquet"]
+
+
+def test_compact_folder_schema_mismatch(tmp_path):
+    write_file(tmp_path / "part-0.parquet", [1])
+    write_file(
+        tmp_path / "part-1.parquet",
+        ["a"],
+        schema=pa.schema(fields=[pa.field("field1", pa.string())]),
+    )
+
+    with pytest.raises(SchemaMismatchError):
+        compact_folder(folder=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_compact_folder_twice(tmp_path):
+    for index in range(3):
+        write_file(tmp_path / f"part-{index}.parquet", [index, index + 10])
+    first_files = compact_folder(folder=tmp_path)
+    write_file(tmp_path / "part-3.parquet", [3, 13])
+
+    compacted_files = compact_folder(folder=tmp_path)
+
+    assert len(compacted_files) == 1
+    assert compacted_files != first_files
+    assert sorted(tmp_path.iterdir()) == compacted_files
+    assert sorted(
+        pq.read_table(compacted_files[0]).column("field1").to_pylist()
+    ) == [0, 1, 2, 3, 10, 11, 12, 13]
+
+
+def test_compact_folder_empty_files(tmp_path):
+    for index in range(3):
+        write_file(tmp_path / f"part-{index}.parquet", [])
+
+    compacted_files = compact_folder(folder=tmp_path)
+
+    # The schema is kept in one empty file
+    assert len(compacted_files) == 1
+    assert sorted(tmp_path.iterdir()) == compacted_files
+    table = pq.read_table(compacted_files[0])
+    assert table.num_rows == 0
+    assert table.schema.equals(SCHEMA)
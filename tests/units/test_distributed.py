@@ -0,0 +1,244 @@
+import json
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pg2pyrquet.core.exceptions import (
+    InvalidPartitionColumnError,
+    WorkQueueError,
+)
+from pg2pyrquet.distributed import (
+    UnitState,
+    WorkUnit,
+    claim_unit,
+    get_queue_path,
+    get_unit_state,
+    plan_table_units,
+    read_queue_manifest,
+    run_worker,
+    write_queue_manifest,
+)
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+
+UNITS = [
+    WorkUnit(
+        name="orders",
+        table="orders",
+        query="SELECT * FROM orders;",
+        output_file="orders.parquet",
+    ),
+    WorkUnit(
+        name="users",
+        table="users",
+        query="SELECT * FROM users;",
+        output_file="users.parquet",
+    ),
+]
+
+
+def write_output_file(output_file, **kwargs):
+    Path(output_file).write_text(kwargs["query"])
+    return [output_file]
+
+
+@patch("pg2pyrquet.distributed.get_table_pages", return_value=1000)
+def test_plan_table_units_page_ranges(mock_get_table_pages):
+    units = plan_table_units(
+        dsn="dsn",
+        table="orders",
+        extension=".parquet",
+        partitions=2,
+        ctid_ranges=True,
+    )
+
+    assert [unit.name for unit in units] == [
+        "orders.part-0000",
+        "orders.part-0001",
+    ]
+    assert [unit.output_file for unit in units] == [
+        "orders.part-0000.parquet",
+        "orders.part-0001.parquet",
+    ]
+    assert units[0].query == (
+        "SELECT * FROM orders WHERE ctid < '(500,0)'::tid;"
+    )
+
+
+@patch("pg2pyrquet.distributed.get_query_column_range", return_value=(0, 10))
+def test_plan_table_units_key_ranges(mock_get_query_column_range):
+    units = plan_table_units(
+        dsn="dsn",
+        table="orders",
+        extension=".parquet",
+        partitions=2,
+        partition_column="id",
+    )
+
+    assert len(units) == 2
+    assert '"id" >= 5' in units[1].query
+
+
+@patch("pg2pyrquet.distributed.get_query_column_range", return_value=(0, 10))
+@patch(
+    "pg2pyrquet.distributed.get_primary_key_columns",
+    return_value=["id", "line"],
+)
+def test_plan_table_units_primary_key_ranges(
+    mock_get_primary_key_columns, mock_get_query_column_range
+):
+    units = plan_table_units(
+        dsn="dsn", table="orders", extension=".parquet", partitions=2
+    )
+
+    assert len(units) == 2
+    assert '"id" >= 5' in units[1].query
+    mock_get_query_column_range.assert_called_once_with(
+        dsn="dsn", query="SELECT * FROM orders;", column="id"
+    )
+
+
+@pytest.mark.parametrize(
+    "primary_key, column_range",
+    [([], (None, None)), (["id"], (None, None)), (["code"], ("a", "z"))],
+)
+def test_plan_table_units_single_unit(primary_key, column_range):
+    with (
+        patch(
+            "pg2pyrquet.distributed.get_primary_key_columns",
+            return_value=primary_key,
+        ),
+        patch(
+            "pg2pyrquet.distributed.get_query_column_range",
+            return_value=column_range,
+        ),
+    ):
+        assert plan_table_units(
+            dsn="dsn", table="orders", extension=".parquet", partitions=4
+        ) == [UNITS[0]]
+
+
+@patch(
+    "pg2pyrquet.distributed.get_query_column_range", return_value=("a", "z")
+)
+def test_plan_table_units_invalid_partition_column(
+    mock_get_query_column_range,
+):
+    with pytest.raises(InvalidPartitionColumnError):
+        plan_table_units(
+            dsn="dsn",
+            table="orders",
+            extension=".parquet",
+            partitions=4,
+            partition_column="code",
+        )
+
+
+def test_queue_manifest(tmp_path):
+    sink_options = SinkOptions(
+        output_format=OutputFormat.ARROW_IPC, compression="zstd"
+    )
+    write_queue_manifest(
+        output_path=tmp_path, units=UNITS, sink_options=sink_options
+    )
+
+    assert read_queue_manifest(output_path=tmp_path) == (UNITS, sink_options)
+    # A planned queue is never overwritten
+    with pytest.raises(WorkQueueError):
+        write_queue_manifest(
+            output_path=tmp_path, units=UNITS, sink_options=sink_options
+        )
+
+
+def test_read_queue_manifest_missing(tmp_path):
+    with pytest.raises(WorkQueueError):
+        read_queue_manifest(output_path=tmp_path)
+
+
+def test_claim_unit(tmp_path):
+    assert claim_unit(
+        queue_path=tmp_path, unit=UNITS[0], attempt=1, worker="a"
+    )
+    assert not claim_unit(
+        queue_path=tmp_path, unit=UNITS[0], attempt=1, worker="b"
+    )
+    assert get_unit_state(
+        queue_path=tmp_path, unit=UNITS[0], lease_seconds=60
+    ) == (UnitState.RUNNING, 1)
+
+
+def test_get_unit_state_abandoned_lock(tmp_path):
+    claim_unit(queue_path=tmp_path, unit=UNITS[0], attempt=1, worker="a")
+    stale = time.time() - 120
+    os.utime(tmp_path / "orders.1.lock", (stale, stale))
+
+    assert get_unit_state(
+        queue_path=tmp_path, unit=UNITS[0], lease_seconds=60
+    ) == (UnitState.FAILED, 1)
+    assert get_unit_state(
+        queue_path=tmp_path, unit=UNITS[1], lease_seconds=60
+    ) == (UnitState.PENDING, 0)
+
+
+@patch(
+    "pg2pyrquet.distributed.export_to_parquet", side_effect=write_output_file
+)
+def test_run_worker(mock_export_to_parquet, tmp_path):
+    write_queue_manifest(
+        output_path=tmp_path, units=UNITS, sink_options=SinkOptions()
+    )
+    queue_path = get_queue_path(output_path=tmp_path)
+    # The first unit is held by another worker, whose lock was abandoned
+    claim_unit(queue_path=queue_path, unit=UNITS[0], attempt=1, worker="a")
+    stale = time.time() - 120
+    os.utime(queue_path / "orders.1.lock", (stale, stale))
+
+    status = run_worker(
+        dsn="dsn",
+        output_path=tmp_path,
+        batch_size=10,
+        worker="b",
+        lease_seconds=60,
+    )
+
+    assert status == {
+        UnitState.PENDING: 0,
+        UnitState.RUNNING: 0,
+        UnitState.FAILED: 0,
+        UnitState.DONE: 2,
+    }
+    assert (tmp_path / "orders.parquet").read_text() == (
+        "SELECT * FROM orders;"
+    )
+    assert json.loads((queue_path / "orders.done").read_text()) == {
+        "worker": "b",
+        "attempt": 2,
+        "files": ["orders.parquet"],
+    }
+    assert mock_export_to_parquet.call_args.kwargs["output_file"] == (
+        tmp_path / "users.parquet.1.tmp"
+    )
+
+
+@patch(
+    "pg2pyrquet.distributed.export_to_parquet",
+    side_effect=RuntimeError("connection lost"),
+)
+def test_run_worker_failed_units(mock_export_to_parquet, tmp_path):
+    write_queue_manifest(
+        output_path=tmp_path, units=UNITS[:1], sink_options=SinkOptions()
+    )
+
+    status = run_worker(
+        dsn="dsn",
+        output_path=tmp_path,
+        batch_size=10,
+        max_attempts=2,
+        poll_seconds=0,
+    )
+
+    assert status[UnitState.FAILED] == 1
+    assert mock_export_to_parquet.call_count == 2
+    assert (get_queue_path(output_path=tmp_path) / "orders.2.failed").exists()
@@ -2,41 +2,187 @@ from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 
-from pg2pyrquet.export import export_to_parquet, reset_column_values
+from pg2pyrquet.core.exceptions import KeysetColumnsError
+from pg2pyrquet.export import (
+    FetchMode,
+    export_to_parquet,
+    fetch_keyset_batches,
+    fetch_record_batches,
+    get_fetch_size,
+)
 
+FIELDS_TYPES = {"field1": pa.int32(), "field2": pa.string()}
+SCHEMA = pa.schema(fields=FIELDS_TYPES)
 
-def test_reset_column_values():
-    fields_types = {"field1": pa.int32(), "field2": pa.string()}
-    records = {"field1": [1, 2], "field2": ["a", "b"]}
-    reset_column_values(fields_types=fields_types, records=records)
-    assert records == {"field1": [], "field2": []}
 
+def test_get_fetch_size_limited_by_rows():
+    batch = pa.record_batch(data=[pa.array([1, 2], pa.int64())], names=["a"])
+    assert (
+        get_fetch_size(batch=batch, batch_size=10, max_batch_bytes=1000) == 10
+    )
 
-@patch("pg2pyrquet.export.ParquetWriter")
-@patch("pg2pyrquet.export.reset_column_values")
-@patch("pg2pyrquet.export.write_batch_to_parquet")
-@patch(
-    "pg2pyrquet.export.get_query_data_types",
-    return_value={"field1": pa.int32(), "field2": pa.string()},
+
+def test_get_fetch_size_limited_by_bytes():
+    batch = pa.record_batch(
+        data=[pa.array([b"x" * 1000, b"y" * 1000], pa.binary())], names=["a"]
+    )
+    assert (
+        get_fetch_size(batch=batch, batch_size=10, max_batch_bytes=3000) == 2
+    )
+    assert get_fetch_size(batch=batch, batch_size=10, max_batch_bytes=10) == 1
+
+
+def test_fetch_record_batches():
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = [[(1, "a"), (2, "b")], [(3, "c")], []]
+
+    batches = list(
+        fetch_record_batches(
+            cursor=cursor,
+            fields_types=FIELDS_TYPES,
+            schema=SCHEMA,
+            batch_size=2,
+        )
+    )
+
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert batches[1].to_pylist() == [{"field1": 3, "field2": "c"}]
+    assert [call.args[0] for call in cursor.fetchmany.call_args_list] == [
+        2,
+        2,
+        2,
+    ]
+
+
+def test_fetch_keyset_batches():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [[(1, "a"), (2, "b")], [(3, "c")]]
+
+    batches = list(
+        fetch_keyset_batches(
+            conn=conn,
+            query="SELECT * FROM test_table",
+            key_columns=["field1"],
+            fields_types=FIELDS_TYPES,
+            schema=SCHEMA,
+            batch_size=2,
+            unique_key=True,
+        )
+    )
+
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    params = [call.args[1] for call in cursor.execute.call_args_list]
+    assert params == [None, (2,)]
+    # Every page is read in its own transaction
+    assert conn.commit.call_count == 3
+
+
+@patch("pg2pyrquet.export.time.monotonic", side_effect=[0, 1, 1, 11, 12, 13])
+def test_fetch_keyset_batches_max_transaction_seconds(mock_monotonic):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [[(1, "a")], [(2, "b")], []]
+
+    batches = list(
+        fetch_keyset_batches(
+            conn=conn,
+            query="SELECT * FROM test_table",
+            key_columns=["field1"],
+            fields_types=FIELDS_TYPES,
+            schema=SCHEMA,
+            batch_size=1,
+            max_transaction_seconds=10,
+            unique_key=True,
+        )
+    )
+
+    assert len(batches) == 2
+    # Committed once the transaction ran for 10 seconds, and at the end
+    assert conn.commit.call_count == 2
+
+
+def test_fetch_keyset_batches_ties():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [
+        [(1, "a"), (2, "b"), (2, "c")],
+        [(2, "b"), (2, "c"), (2, "d")],
+        [(3, "e")],
+    ]
+
+    batches = list(
+        fetch_keyset_batches(
+            conn=conn,
+            query="SELECT * FROM test_table",
+            key_columns=["field1"],
+            fields_types=FIELDS_TYPES,
+            schema=SCHEMA,
+            batch_size=3,
+        )
+    )
+
+    # The rows of the last key of the full page are all fetched at once
+    assert [batch.to_pydict()["field2"] for batch in batches] == [
+        ["a", "b", "c", "d"],
+        ["e"],
+    ]
+    queries = [
+        call.args[0].as_string(None) for call in cursor.execute.call_args_list
+    ]
+    assert '("field1") = (%s)' in queries[1]
+    params = [call.args[1] for call in cursor.execute.call_args_list]
+    assert params == [None, (2,), (2,)]
+
+
+@pytest.mark.parametrize(
+    "rows", [[(1, "a"), (None, "b")], [(None, "a"), (1, "b"), (2, "c")]]
 )
+def test_fetch_keyset_batches_null_key(rows):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = rows
+
+    with pytest.raises(KeysetColumnsError, match="NULL"):
+        list(
+            fetch_keyset_batches(
+                conn=conn,
+                query="SELECT * FROM test_table",
+                key_columns=["field1"],
+                fields_types=FIELDS_TYPES,
+                schema=SCHEMA,
+                batch_size=10,
+            )
+        )
+
+
+@patch("pg2pyrquet.export.get_query_data_types", return_value=FIELDS_TYPES)
+def test_export_to_parquet_keyset_without_columns(mock_get_query_data_types):
+    with pytest.raises(KeysetColumnsError):
+        export_to_parquet(
+            dsn="dsn",
+            output_file=Path("./data/pytest.parquet"),
+            batch_size=1,
+            query="SELECT * FROM test_table",
+            fetch_mode=FetchMode.KEYSET,
+            keyset_columns=["missing"],
+        )
+
+
+@patch("pg2pyrquet.export.open_sink")
+@patch("pg2pyrquet.export.get_query_data_types", return_value=FIELDS_TYPES)
 @patch("pg2pyrquet.export.psycopg.connect")
 def test_export_to_parquet(
-    mock_psycopg_connect,
-    mock_reset_column_values,
-    mock_get_query_data_types,
-    mock_write_batch_to_parquet,
-    mock_parquet_writer,
+    mock_psycopg_connect, mock_get_query_data_types, mock_open_sink
 ):
     mock_writer = MagicMock()
-    mock_parquet_writer.return_value.__enter__.return_value = mock_writer
+    mock_open_sink.return_value.__enter__.return_value = mock_writer
 
     mock_cursor = MagicMock()
-    mock_cursor.__iter__.return_value = [
-        {"field1": 1, "field2": "a"},
-        {"field1": 2, "field2": "b"},
-    ]
-    mock_cursor.itersize = 1
+    mock_cursor.fetchmany.side_effect = [[(1, "a")], [(2, "b")], []]
     mock_psycopg_connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = (
         mock_cursor
     )
@@ -50,8 +196,136 @@ def test_export_to_parquet(
         dsn=dsn, output_file=output_file, batch_size=batch_size, query=query
     )
 
+    mock_cursor.execute.assert_called_once_with(query)
     # Check if the writer was called to write batches
-    mock_write_batch_to_parquet.assert_called()
-    assert mock_write_batch_to_parquet.call_count == 2
-    # Check if reset_column_values was called
-    mock_reset_column_values.assert_called()
+    assert mock_writer.write_batch.call_count == 2
+    mock_open_sink.assert_called_once()
+
+
+@patch("pg2pyrquet.export.open_sink")
+@patch(
+    "pg2pyrquet.export.get_query_data_types",
+    return_value={"field1": pa.binary()},
+)
+@patch("pg2pyrquet.export.psycopg.connect")
+def test_export_to_parquet_large_values(
+    mock_psycopg_connect, mock_get_query_data_types, mock_open_sink
+):
+    mock_psycopg_connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value.fetchmany.return_value = (
+        []
+    )
+    export_to_parquet(
+        dsn="dsn",
+        output_file=Path("./data/pytest.parquet"),
+        batch_size=1,
+        query="SELECT * FROM test_table",
+        large_values=True,
+    )
+
+    schema = mock_open_sink.call_args.kwargs["schema"]
+    assert schema.field("field1").type == pa.large_binary()
+
+
+@patch("pg2pyrquet.export.register_nested_loaders")
+@patch("pg2pyrquet.export.open_sink")
+@patch(
+    "pg2pyrquet.export.get_query_data_types",
+    return_value={"tags": pa.map_(pa.string(), pa.string())},
+)
+@patch("pg2pyrquet.export.psycopg.connect")
+def test_export_to_parquet_nested_types(
+    mock_psycopg_connect,
+    mock_get_query_data_types,
+    mock_open_sink,
+    mock_register_nested_loaders,
+):
+    mock_conn = mock_psycopg_connect.return_value.__enter__.return_value
+    mock_conn.cursor.return_value.__enter__.return_value.fetchmany.return_value = (
+        []
+    )
+    export_to_parquet(
+        dsn="dsn",
+        output_file=Path("./data/pytest.parquet"),
+        batch_size=1,
+        query="SELECT * FROM test_table;",
+    )
+
+    mock_register_nested_loaders.assert_called_once_with(
+        conn=mock_conn, query="SELECT * FROM test_table"
+    )
+
+
+@patch("pg2pyrquet.export.ExternalSortSink")
+@patch("pg2pyrquet.export.open_sink")
+@patch(
+    "pg2pyrquet.export.get_query_data_types",
+    return_value={"field1": pa.int32()},
+)
+@patch("pg2pyrquet.export.psycopg.connect")
+def test_export_to_parquet_sort_by(
+    mock_psycopg_connect,
+    mock_get_query_data_types,
+    mock_open_sink,
+    mock_external_sort_sink,
+):
+    mock_psycopg_connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value.fetchmany.return_value = (
+        []
+    )
+    output_file = Path("./data/pytest.parquet")
+
+    export_to_parquet(
+        dsn="dsn",
+        output_file=output_file,
+        batch_size=1,
+        query="SELECT * FROM test_table",
+        sort_by="field1",
+        sort_memory_limit=1024,
+    )
+
+    mock_external_sort_sink.assert_called_once_with(
+        sink=mock_open_sink.return_value,
+        schema=pa.schema(fields={"field1": pa.int32()}),
+        key="field1",
+        temp_dir=output_file.parent,
+        memory_limit=1024,
+    )
+
+
+@patch(
+    "pg2pyrquet.export.get_query_data_types",
+    return_value={"field1": pa.int64()},
+)
+@patch("pg2pyrquet.export.psycopg.connect")
+def test_export_to_parquet_max_file_bytes(
+    mock_psycopg_connect, mock_get_query_data_types, tmp_path
+):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchmany.side_effect = [[(1,)], [(2,)], [(3,)], []]
+    mock_psycopg_connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = (
+        mock_cursor
+    )
+
+    # The files of earlier single-file and rolled exports are replaced
+    for name in ("output.parquet", "output-00003.parquet"):
+        (tmp_path / name).touch()
+    (tmp_path / "output-old.parquet").touch()
+
+    files = export_to_parquet(
+        dsn="dsn",
+        output_file=tmp_path / "output.parquet",
+        batch_size=1,
+        query="SELECT * FROM test_table",
+        max_file_bytes=1,
+    )
+
+    assert files == [
+        tmp_path / f"output-{index:05d}.parquet" for index in range(3)
+    ]
+    assert sorted(tmp_path.iterdir()) == sorted(
+        [*files, tmp_path / "output-old.parquet"]
+    )
+    assert [pq.read_table(path)["field1"].to_pylist() for path in files] == [
+        [1],
+        [2],
+        [3],
+    ]
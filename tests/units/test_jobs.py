@@ -0,0 +1,325 @@
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import psycopg
+import pytest
+
+from pg2pyrquet.core.exceptions import InvalidJobConfigError
+from pg2pyrquet.jobs import (
+    ExportJob,
+    JobKind,
+    JobResult,
+    JobsConfig,
+    format_report,
+    load_jobs_config,
+    parse_job,
+    run_export_jobs,
+    run_job,
+    run_job_with_retries,
+)
+from pg2pyrquet.utils.postgres import RelationKind
+from pg2pyrquet.utils.sinks import OutputFormat
+
+CONFIG = """
+max_concurrency: 3
+retries: 1
+defaults:
+  host: db.local
+  port: 6432
+  folder: {folder}
+jobs:
+  - type: table
+    database: app
+    table: users
+    priority: 5
+  - type: query
+    database: app
+    query_file: queries/orders.sql
+    format: arrow-ipc
+  - type: database
+    database: analytics
+"""
+
+
+def test_load_jobs_config(tmp_path):
+    config_file = tmp_path / "jobs.yaml"
+    config_file.write_text(CONFIG.format(folder=tmp_path))
+
+    config = load_jobs_config(path=config_file)
+
+    assert config.max_concurrency == 3
+    assert config.retries == 1
+    assert [job.name for job in config.jobs] == [
+        "users",
+        "orders",
+        "analytics",
+    ]
+    assert config.jobs[0] == ExportJob(
+        kind=JobKind.TABLE,
+        database="app",
+        folder=str(tmp_path),
+        name="users",
+        host="db.local",
+        port="6432",
+        table="users",
+        priority=5,
+    )
+    assert config.jobs[1].output_format == OutputFormat.ARROW_IPC
+
+
+def test_load_jobs_config_without_jobs(tmp_path):
+    config_file = tmp_path / "jobs.yaml"
+    config_file.write_text("max_concurrency: 3\n")
+
+    with pytest.raises(InvalidJobConfigError, match="'jobs' list"):
+        load_jobs_config(path=config_file)
+
+
+@pytest.mark.parametrize(
+    "option", ["max_concurrency", "max_concurrency_per_database"]
+)
+def test_load_jobs_config_invalid_concurrency(tmp_path, option):
+    path = tmp_path / "jobs.yaml"
+    path.write_text(
+        f"{option}: 0\n"
+        "jobs:\n"
+        "  - {type: table, database: app, folder: ., table: users}\n"
+    )
+
+    with pytest.raises(InvalidJobConfigError, match=option):
+        load_jobs_config(path=path)
+
+
+def test_parse_job_invalid():
+    with pytest.raises(InvalidJobConfigError, match="Unknown job options"):
+        parse_job(spec={"type": "table", "tables": "users"}, defaults={})
+    with pytest.raises(InvalidJobConfigError, match="requires a 'table'"):
+        parse_job(
+            spec={"type": "table", "database": "app"},
+            defaults={"folder": "."},
+        )
+    with pytest.raises(InvalidJobConfigError, match="Invalid job"):
+        parse_job(
+            spec={"type": "view", "database": "app", "folder": "."},
+            defaults={},
+        )
+
+
+@patch("pg2pyrquet.jobs.export_to_parquet")
+@patch("pg2pyrquet.jobs.get_queries_data_types")
+@patch("pg2pyrquet.jobs.get_database_tables", return_value=["a", "b"])
+def test_run_job_database(
+    mock_get_database_tables,
+    mock_get_queries_data_types,
+    mock_export_to_parquet,
+    tmp_path,
+):
+    mock_get_queries_data_types.side_effect = lambda dsn, queries, pool: {
+        name: {"id": name} for name in queries
+    }
+    mock_export_to_parquet.side_effect = lambda **kwargs: [
+        kwargs["output_file"]
+    ]
+    pool = MagicMock(dsn="dsn")
+    job = ExportJob(
+        kind=JobKind.DATABASE,
+        database="app",
+        folder=str(tmp_path),
+        schemas=["public", "sales"],
+        exclude=["*_archive"],
+        relation_kinds=["materialized-view"],
+    )
+
+    files = run_job(job=job, pool=pool)
+
+    assert files == [tmp_path / "a.parquet", tmp_path / "b.parquet"]
+    kwargs = mock_export_to_parquet.call_args.kwargs
+    assert kwargs["query"] == "SELECT * FROM b;"
+    assert kwargs["pool"] is pool
+    assert kwargs["max_file_bytes"] is None
+    assert kwargs["data_types"] == {"id": "b.parquet"}
+    # The tables and the column types are read with pooled connections
+    mock_get_database_tables.assert_called_once_with(
+        dsn="dsn",
+        schemas=["public", "sales"],
+        relation_kinds=[RelationKind.MATERIALIZED_VIEW],
+        include=[],
+        exclude=["*_archive"],
+        pool=pool,
+    )
+    mock_get_queries_data_types.assert_called_once_with(
+        dsn="dsn",
+        queries={
+            "a.parquet": "SELECT * FROM a;",
+            "b.parquet": "SELECT * FROM b;",
+        },
+        pool=pool,
+    )
+
+
+@patch("pg2pyrquet.jobs.time.sleep")
+@patch("pg2pyrquet.jobs.run_job")
+def test_run_job_with_retries(mock_run_job, mock_sleep):
+    mock_run_job.side_effect = [
+        psycopg.OperationalError("connection lost"),
+        psycopg.OperationalError("connection lost"),
+        [Path("users.parquet")],
+    ]
+    job = ExportJob(
+        kind=JobKind.TABLE, database="app", folder=".", table="users"
+    )
+
+    result = run_job_with_retries(
+        job=job, pool=MagicMock(), retries=2, retry_backoff=1.5
+    )
+
+    assert result.succeeded
+    assert result.attempts == 3
+    assert result.files == [Path("users.parquet")]
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [1.5, 3.0]
+
+
+@patch("pg2pyrquet.jobs.time.sleep")
+@patch("pg2pyrquet.jobs.run_job", side_effect=ValueError("bad query"))
+def test_run_job_with_retries_not_retryable(mock_run_job, mock_sleep):
+    job = ExportJob(
+        kind=JobKind.TABLE, database="app", folder=".", table="users"
+    )
+
+    result = run_job_with_retries(
+        job=job, pool=MagicMock(), retries=2, retry_backoff=1
+    )
+
+    assert not result.succeeded
+    assert result.attempts == 1
+    assert result.error == "ValueError: bad query"
+    mock_sleep.assert_not_called()
+
+
+@patch("pg2pyrquet.jobs.ConnectionPool")
+@patch("pg2pyrquet.jobs.run_job_with_retries")
+def test_run_export_jobs(mock_run_job_with_retries, mock_connection_pool):
+    started = []
+
+    def run(job, pool, retries, retry_backoff, throttle):
+        assert throttle is None
+        started.append(job.name)
+        return JobResult(
+            name=job.name, succeeded=True, attempts=1, duration=0
+        )
+
+    mock_run_job_with_retries.side_effect = run
+    jobs = [
+        ExportJob(
+            kind=JobKind.TABLE,
+            database="app",
+            folder=".",
+            table=name,
+            priority=priority,
+        )
+        for name, priority in (("low", 0), ("high", 10), ("mid", 5))
+    ]
+
+    results = run_export_jobs(config=JobsConfig(jobs=jobs, max_concurrency=1))
+
+    assert started == ["high", "mid", "low"]
+    assert [result.name for result in results] == ["low", "high", "mid"]
+    # One pool is shared by the jobs of one database and closed at the end
+    mock_connection_pool.assert_called_once()
+    mock_connection_pool.return_value.close.assert_called_once()
+
+
+@patch("pg2pyrquet.jobs.ConnectionPool")
+@patch("pg2pyrquet.jobs.run_job_with_retries")
+def test_run_export_jobs_database_limit(
+    mock_run_job_with_retries, mock_connection_pool
+):
+    other_started = threading.Event()
+
+    def run(job, pool, retries, retry_backoff, throttle):
+        if job.database == "other":
+            other_started.set()
+        elif job.name == "first":
+            # The job of the other database starts while this one runs
+            assert other_started.wait(timeout=5)
+        return JobResult(
+            name=job.name, succeeded=True, attempts=1, duration=0
+        )
+
+    mock_run_job_with_retries.side_effect = run
+    jobs = [
+        ExportJob(
+            kind=JobKind.TABLE,
+            database=database,
+            folder=".",
+            table=name,
+            priority=priority,
+        )
+        for name, database, priority in (
+            ("first", "app", 10),
+            ("second", "app", 5),
+            ("third", "other", 0),
+        )
+    ]
+
+    results = run_export_jobs(
+        config=JobsConfig(
+            jobs=jobs, max_concurrency=2, max_concurrency_per_database=1
+        )
+    )
+
+    assert all(result.succeeded for result in results)
+
+
+@patch("pg2pyrquet.jobs.ConnectionPool")
+@patch("pg2pyrquet.jobs.run_job_with_retries")
+def test_run_export_jobs_shared_throttle(
+    mock_run_job_with_retries, mock_connection_pool
+):
+    mock_run_job_with_retries.return_value = JobResult(
+        name="job", succeeded=True, attempts=1, duration=0
+    )
+    jobs = [
+        ExportJob(kind=JobKind.TABLE, database="app", folder=".", table=name)
+        for name in ("users", "orders")
+    ]
+
+    run_export_jobs(
+        config=JobsConfig(jobs=jobs, max_rows_per_sec=1000, retries=0)
+    )
+
+    throttles = [
+        call.kwargs["throttle"]
+        for call in mock_run_job_with_retries.call_args_list
+    ]
+    # The jobs of one database share one throttle
+    assert throttles[0] is throttles[1]
+    assert throttles[0].limits.max_rows_per_sec == 1000
+
+
+def test_format_report():
+    report = format_report(
+        results=[
+            JobResult(
+                name="users",
+                succeeded=True,
+                attempts=1,
+                duration=2.04,
+                files=[Path("users.parquet")],
+            ),
+            JobResult(
+                name="orders",
+                succeeded=False,
+                attempts=3,
+                duration=10,
+                error="OperationalError: connection lost",
+            ),
+        ]
+    )
+
+    assert report.splitlines() == [
+        "OK     users: 1 file(s), 1 attempt(s), 2.0s",
+        "FAILED orders: 0 file(s), 3 attempt(s), 10.0s - OperationalError: connection lost",
+        "1 of 2 jobs succeeded, 1 failed.",
+    ]
@@ -0,0 +1,160 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pg2pyrquet.parallel import (
+    export_query_partitions,
+    get_merged_sink_options,
+    get_part_file,
+    merge_part_files,
+)
+from pg2pyrquet.utils.sinks import SinkOptions, open_sink
+from pg2pyrquet.utils.throttle import Throttle, ThrottleLimits
+
+SCHEMA = pa.schema(fields=[pa.field("field1", pa.int64())])
+
+
+def test_get_part_file():
+    assert get_part_file(output_file=Path("data/query.parquet"), index=3) == (
+        Path("data/query.part-0003.parquet")
+    )
+
+
+def test_merge_part_files(tmp_path):
+    part_files = []
+    for index in range(3):
+        part_file = tmp_path / f"query.part-{index}.parquet"
+        with open_sink(
+            where=part_file, schema=SCHEMA, options=SinkOptions()
+        ) as sink:
+            sink.write_batch(
+                pa.record_batch([pa.array([index, index])], schema=SCHEMA)
+            )
+        part_files.append(part_file)
+
+    output_file = tmp_path / "query.parquet"
+    merge_part_files(
+        part_files=part_files,
+        output_file=output_file,
+        schema=SCHEMA,
+        sink_options=SinkOptions(),
+    )
+
+    assert [path.name for path in tmp_path.iterdir()] == ["query.parquet"]
+    table = pq.read_table(output_file)
+    assert table.column("field1").to_pylist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_merge_part_files_empty(tmp_path):
+    output_file = tmp_path / "query.parquet"
+    merge_part_files(
+        part_files=[],
+        output_file=output_file,
+        schema=SCHEMA,
+        sink_options=SinkOptions(),
+    )
+
+    table = pq.read_table(output_file)
+    assert table.num_rows == 0
+    assert table.schema.equals(SCHEMA)
+
+
+def test_get_merged_sink_options():
+    sink_options = SinkOptions(sorting_columns=["id", "name:desc"])
+
+    assert (
+        get_merged_sink_options(
+            sink_options=sink_options, partition_column="id"
+        )
+        == sink_options
+    )
+    # The concatenated parts are not ordered by another column
+    assert (
+        get_merged_sink_options(
+            sink_options=sink_options, partition_column="created_at"
+        ).sorting_columns
+        == []
+    )
+    assert (
+        get_merged_sink_options(
+            sink_options=SinkOptions(sorting_columns=["id:desc"]),
+            partition_column="id",
+        ).sorting_columns
+        == []
+    )
+
+
+@patch("pg2pyrquet.parallel.ProcessPoolExecutor")
+@patch("pg2pyrquet.parallel.export_snapshot")
+@patch(
+    "pg2pyrquet.parallel.get_query_data_types",
+    return_value={"field1": pa.int64()},
+)
+@patch("pg2pyrquet.parallel.get_query_column_range", return_value=(0, 100))
+def test_export_query_partitions(
+    mock_get_query_column_range,
+    mock_get_query_data_types,
+    mock_export_snapshot,
+    mock_process_pool_executor,
+):
+    mock_export_snapshot.return_value.__enter__.return_value = "snapshot-id"
+    mock_pool = MagicMock()
+    mock_pool.submit.side_effect = lambda *args, **kwargs: MagicMock(
+        **{"result.return_value": [kwargs["output_file"]]}
+    )
+    mock_process_pool_executor.return_value.__enter__.return_value = mock_pool
+
+    part_files = export_query_partitions(
+        dsn="dsn",
+        output_file=Path("data/query.parquet"),
+        batch_size=10,
+        query="SELECT * FROM test_table",
+        partition_column="field1",
+        partitions=4,
+        large_values=True,
+        throttle=Throttle(limits=ThrottleLimits(max_rows_per_sec=1000)),
+    )
+
+    assert part_files == [
+        Path(f"data/query.part-{index:04d}.parquet") for index in range(4)
+    ]
+    assert mock_pool.submit.call_count == 4
+    submitted = mock_pool.submit.call_args_list[1].kwargs
+    assert submitted["snapshot"] == "snapshot-id"
+    assert submitted["large_values"] is True
+    assert submitted["data_types"] == {"field1": pa.int64()}
+    assert '"field1" >= 25 AND "field1" < 50' in submitted["query"]
+    # The workers share the rate limit
+    assert submitted["throttle"].limits.max_rows_per_sec == 250
+
+
+@patch("pg2pyrquet.parallel.ProcessPoolExecutor")
+@patch("pg2pyrquet.parallel.export_snapshot")
+@patch("pg2pyrquet.parallel.get_query_data_types", return_value={})
+@patch("pg2pyrquet.parallel.get_query_column_range", return_value=(0, 10))
+def test_export_query_partitions_explicit_bounds(
+    mock_get_query_column_range,
+    mock_get_query_data_types,
+    mock_export_snapshot,
+    mock_process_pool_executor,
+):
+    export_query_partitions(
+        dsn="dsn",
+        output_file=Path("data/query.parquet"),
+        batch_size=10,
+        query="SELECT * FROM test_table",
+        partition_column="field1",
+        partitions=2,
+        lower_bound="0",
+        upper_bound="10",
+    )
+
+    mock_get_query_column_range.assert_called_once_with(
+        dsn="dsn",
+        query="SELECT * FROM test_table",
+        column="field1",
+        lower="0",
+        upper="10",
+    )
@@ -0,0 +1,112 @@
+import os
+from unittest.mock import patch
+
+from pg2pyrquet.planner import (
+    MAX_BATCH_SIZE,
+    MIN_BATCH_SIZE,
+    ExportPlan,
+    apply_plan,
+    format_plan,
+    plan_export,
+    plan_query_export,
+)
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+
+GIB = 1024 * 1024 * 1024
+
+
+def test_plan_export_small():
+    plan = plan_export(name="users", rows=1000, row_bytes=100)
+
+    assert plan == ExportPlan(
+        name="users",
+        rows=1000,
+        row_bytes=100,
+        batch_size=671088,
+        workers=1,
+        max_file_bytes=None,
+        compression="snappy",
+    )
+
+
+def test_plan_export_large():
+    plan = plan_export(
+        name="events",
+        rows=100_000_000,
+        row_bytes=200,
+        output_format=OutputFormat.ARROW_IPC,
+        parallel=True,
+    )
+
+    assert plan.batch_size == 335544
+    assert plan.workers == min(os.cpu_count(), 18)
+    assert plan.max_file_bytes == 512 * 1024 * 1024
+    assert plan.compression == "zstd"
+
+
+def test_plan_export_batch_size_bounds():
+    assert plan_export(name="t", rows=10, row_bytes=1).batch_size == (
+        MAX_BATCH_SIZE
+    )
+    assert plan_export(name="t", rows=10, row_bytes=GIB).batch_size == (
+        MIN_BATCH_SIZE
+    )
+
+
+@patch("pg2pyrquet.planner.os.cpu_count", return_value=4)
+def test_plan_export_workers(mock_cpu_count):
+    assert plan_export(name="t", rows=2, row_bytes=GIB).workers == 1
+    assert (
+        plan_export(name="t", rows=2, row_bytes=GIB, parallel=True).workers
+        == 2
+    )
+    assert (
+        plan_export(name="t", rows=64, row_bytes=GIB, parallel=True).workers
+        == 4
+    )
+
+
+@patch("pg2pyrquet.planner.get_query_estimate", return_value=(500, 20))
+def test_plan_query_export(mock_get_query_estimate):
+    plan = plan_query_export(
+        dsn="dsn", name="custom-query.parquet", query="SELECT 1"
+    )
+
+    assert plan.rows == 500
+    assert plan.row_bytes == 20
+    mock_get_query_estimate.assert_called_once_with(
+        dsn="dsn", query="SELECT 1"
+    )
+
+
+def test_apply_plan():
+    plan = plan_export(name="t", rows=10 * 1024 * 1024, row_bytes=1024)
+
+    batch_size, sink_options, max_file_bytes = apply_plan(
+        plan=plan,
+        batch_size=None,
+        sink_options=SinkOptions(),
+        max_file_bytes=None,
+    )
+    assert batch_size == plan.batch_size
+    assert sink_options.compression == "zstd"
+    assert max_file_bytes == plan.max_file_bytes
+
+    batch_size, sink_options, max_file_bytes = apply_plan(
+        plan=plan,
+        batch_size=500,
+        sink_options=SinkOptions(compression="gzip"),
+        max_file_bytes=1024,
+    )
+    assert batch_size == 500
+    assert sink_options.compression == "gzip"
+    assert max_file_bytes == 1024
+
+
+def test_format_plan():
+    plan = plan_export(name="users", rows=1000, row_bytes=100)
+
+    assert format_plan(plan=plan) == (
+        "users: ~1000 rows x 100 B = 97.7 KiB; batch size 671088, "
+        "1 worker(s), single file, snappy compression"
+    )
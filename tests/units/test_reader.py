@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pyarrow as pa
+import pytest
+
+from pg2pyrquet.core.exceptions import TableDoesNotExistError
+from pg2pyrquet.reader import read_query, read_table
+from pg2pyrquet.utils.transforms import Transform
+
+FIELDS_TYPES = {"field1": pa.int32(), "field2": pa.string()}
+
+
+@patch("pg2pyrquet.reader.get_query_data_types", return_value=FIELDS_TYPES)
+@patch("pg2pyrquet.reader.psycopg.connect")
+def test_read_query(mock_psycopg_connect, mock_get_query_data_types):
+    mock_cursor = (
+        mock_psycopg_connect.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+    )
+    mock_cursor.fetchmany.side_effect = [[(1, "a"), (2, "b")], [(3, "c")], []]
+
+    reader = read_query(
+        dsn="dsn",
+        query="SELECT * FROM test_table",
+        transforms=[Transform(column="field2", operation="drop")],
+    )
+
+    assert reader.schema == pa.schema(fields={"field1": pa.int32()})
+    # Nothing is fetched before the first batch is read
+    mock_psycopg_connect.assert_not_called()
+
+    assert reader.read_all().to_pydict() == {"field1": [1, 2, 3]}
+    mock_cursor.execute.assert_called_once_with("SELECT * FROM test_table")
+
+
+@patch("pg2pyrquet.reader.get_query_data_types", return_value=FIELDS_TYPES)
+@patch("pg2pyrquet.reader.psycopg.connect")
+def test_read_query_large_values(
+    mock_psycopg_connect, mock_get_query_data_types
+):
+    reader = read_query(
+        dsn="dsn", query="SELECT * FROM test_table", large_values=True
+    )
+
+    assert reader.schema.field("field2").type == pa.large_string()
+
+
+@patch("pg2pyrquet.reader.read_query")
+@patch("pg2pyrquet.reader.validate_table_exists", return_value="test_table")
+def test_read_table(mock_validate_table_exists, mock_read_query):
+    assert read_table(dsn="dsn", table="test_table") is (
+        mock_read_query.return_value
+    )
+    assert mock_read_query.call_args.kwargs["query"] == (
+        "SELECT * FROM test_table;"
+    )
+
+
+@patch(
+    "pg2pyrquet.reader.validate_table_exists",
+    side_effect=TableDoesNotExistError,
+)
+def test_read_table_does_not_exist(mock_validate_table_exists):
+    with pytest.raises(TableDoesNotExistError):
+        read_table(dsn="dsn", table="missing")
@@ -0,0 +1,83 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pyarrow as pa
+
+from pg2pyrquet.statements import export_named_queries
+from pg2pyrquet.utils.sinks import OutputFormat, SinkOptions
+
+QUERIES = {"orders": "SELECT * FROM orders", "totals": "SELECT 1 AS total"}
+DATA_TYPES = {"orders": {"id": pa.int64()}, "totals": {"total": pa.int32()}}
+
+
+@patch("pg2pyrquet.statements.export_to_parquet")
+@patch("pg2pyrquet.statements.export_snapshot")
+@patch("pg2pyrquet.statements.ConnectionPool")
+@patch(
+    "pg2pyrquet.statements.get_queries_data_types", return_value=DATA_TYPES
+)
+def test_export_named_queries(
+    mock_get_queries_data_types,
+    mock_connection_pool,
+    mock_export_snapshot,
+    mock_export_to_parquet,
+):
+    mock_export_to_parquet.side_effect = lambda **kwargs: [
+        kwargs["output_file"]
+    ]
+
+    files = export_named_queries(
+        dsn="dsn",
+        queries=QUERIES,
+        output_path=Path("data"),
+        batch_size=10,
+        sink_options=SinkOptions(output_format=OutputFormat.ARROW_IPC),
+        large_values=True,
+    )
+
+    assert files == {
+        "orders": [Path("data/orders.arrow")],
+        "totals": [Path("data/totals.arrow")],
+    }
+    mock_get_queries_data_types.assert_called_once_with(
+        dsn="dsn", queries=QUERIES
+    )
+    mock_export_snapshot.assert_not_called()
+    kwargs = mock_export_to_parquet.call_args.kwargs
+    assert kwargs["data_types"] == {"total": pa.int32()}
+    assert kwargs["snapshot"] is None
+    assert kwargs["large_values"] is True
+    # All the queries share one pool, closed at the end
+    assert kwargs["pool"] is mock_connection_pool.return_value
+    mock_connection_pool.return_value.close.assert_called_once()
+
+
+@patch("pg2pyrquet.statements.export_to_parquet", return_value=[])
+@patch("pg2pyrquet.statements.export_snapshot")
+@patch("pg2pyrquet.statements.ConnectionPool")
+@patch(
+    "pg2pyrquet.statements.get_queries_data_types", return_value=DATA_TYPES
+)
+def test_export_named_queries_consistent(
+    mock_get_queries_data_types,
+    mock_connection_pool,
+    mock_export_snapshot,
+    mock_export_to_parquet,
+):
+    mock_export_snapshot.return_value.__enter__.return_value = "snapshot-id"
+
+    export_named_queries(
+        dsn="dsn",
+        queries=QUERIES,
+        output_path=Path("data"),
+        batch_size=10,
+        consistent=True,
+        parallel=2,
+    )
+
+    mock_export_snapshot.assert_called_once_with(dsn="dsn")
+    snapshots = {
+        call.kwargs["snapshot"]
+        for call in mock_export_to_parquet.call_args_list
+    }
+    assert snapshots == {"snapshot-id"}
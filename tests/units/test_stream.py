@@ -0,0 +1,216 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import psycopg
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from pg2pyrquet.core.exceptions import IncompleteSnapshotError
+from pg2pyrquet.stream import (
+    SNAPSHOT_MARKER,
+    create_stream_slot,
+    get_qualified_name,
+    group_changes,
+    parse_lsn,
+    stream_changes,
+    validate_snapshot_complete,
+    write_change_file,
+)
+from pg2pyrquet.utils.sinks import SinkOptions
+
+CHANGES = [
+    ("0/100", json.dumps({"action": "B"})),
+    (
+        "0/110",
+        json.dumps(
+            {
+                "action": "I",
+                "schema": "public",
+                "table": "orders",
+                "columns": [
+                    {"name": "id", "type": "integer", "value": 1},
+                    {"name": "total", "type": "text", "value": "9.99"},
+                ],
+            }
+        ),
+    ),
+    (
+        "0/120",
+        json.dumps(
+            {
+                "action": "D",
+                "schema": "sales",
+                "table": "refunds",
+                "identity": [{"name": "id", "type": "integer", "value": 7}],
+            }
+        ),
+    ),
+    ("0/130", json.dumps({"action": "C"})),
+]
+
+
+def test_parse_lsn():
+    assert parse_lsn("0/16B3748") == 0x16B3748
+    assert parse_lsn("1A/0") == 0x1A << 32
+
+
+def test_get_qualified_name():
+    assert get_qualified_name("orders") == "public.orders"
+    assert get_qualified_name("sales.refunds") == "sales.refunds"
+
+
+def test_group_changes():
+    assert group_changes(changes=CHANGES) == {
+        "orders": [("0/110", "I", {"id": 1, "total": "9.99"})],
+        "sales.refunds": [("0/120", "D", {"id": 7})],
+    }
+
+
+def test_write_change_file(tmp_path):
+    batch = pa.record_batch({"_lsn": ["0/110"], "id": [1]})
+    path = tmp_path / "changes.parquet"
+
+    write_change_file(path=path, batch=batch, sink_options=SinkOptions())
+
+    assert pq.read_table(path).to_pylist() == [{"_lsn": "0/110", "id": 1}]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@patch("pg2pyrquet.stream.export_to_parquet", return_value=[])
+@patch("pg2pyrquet.stream.create_replication_slot")
+def test_create_stream_slot(
+    mock_create_replication_slot, mock_export_to_parquet, tmp_path
+):
+    mock_create_replication_slot.return_value.__enter__.return_value = (
+        "00000003-0000001B-1"
+    )
+
+    create_stream_slot(
+        dsn="dsn",
+        slot="orders_stream",
+        tables=["orders"],
+        output_path=tmp_path,
+        batch_size=10,
+    )
+
+    kwargs = mock_export_to_parquet.call_args.kwargs
+    assert kwargs["snapshot"] == "00000003-0000001B-1"
+    assert kwargs["output_file"] == tmp_path / "orders" / "snapshot.parquet"
+    assert (tmp_path / "orders" / SNAPSHOT_MARKER).read_text() == (
+        "orders_stream"
+    )
+    validate_snapshot_complete(
+        output_path=tmp_path, tables=["orders"], slot="orders_stream"
+    )
+
+
+@patch("pg2pyrquet.stream.drop_replication_slot")
+@patch(
+    "pg2pyrquet.stream.export_to_parquet",
+    side_effect=[[], psycopg.OperationalError("down")],
+)
+@patch("pg2pyrquet.stream.create_replication_slot")
+def test_create_stream_slot_failure(
+    mock_create_replication_slot,
+    mock_export_to_parquet,
+    mock_drop_replication_slot,
+    tmp_path,
+):
+    with pytest.raises(psycopg.OperationalError):
+        create_stream_slot(
+            dsn="dsn",
+            slot="orders_stream",
+            tables=["orders", "refunds"],
+            output_path=tmp_path,
+            batch_size=10,
+        )
+
+    mock_drop_replication_slot.assert_called_once_with(
+        dsn="dsn", slot="orders_stream"
+    )
+    assert not (tmp_path / "orders" / SNAPSHOT_MARKER).exists()
+    with pytest.raises(IncompleteSnapshotError):
+        validate_snapshot_complete(
+            output_path=tmp_path,
+            tables=["orders", "refunds"],
+            slot="orders_stream",
+        )
+
+
+def test_validate_snapshot_complete_other_slot(tmp_path):
+    (tmp_path / "orders").mkdir()
+    (tmp_path / "orders" / SNAPSHOT_MARKER).write_text("old_stream")
+
+    with pytest.raises(IncompleteSnapshotError):
+        validate_snapshot_complete(
+            output_path=tmp_path, tables=["orders"], slot="orders_stream"
+        )
+
+
+@patch("pg2pyrquet.stream.export_to_parquet")
+@patch("pg2pyrquet.stream.create_replication_slot")
+def test_create_stream_slot_without_snapshot(
+    mock_create_replication_slot, mock_export_to_parquet
+):
+    files = create_stream_slot(
+        dsn="dsn",
+        slot="orders_stream",
+        tables=["orders"],
+        output_path=Path("data"),
+        batch_size=10,
+        initial_snapshot=False,
+    )
+
+    assert files == {}
+    mock_create_replication_slot.assert_called_once()
+    mock_export_to_parquet.assert_not_called()
+
+
+@patch("pg2pyrquet.stream.time.sleep")
+@patch("pg2pyrquet.stream.advance_slot")
+@patch("pg2pyrquet.stream.peek_slot_changes")
+@patch(
+    "pg2pyrquet.stream.get_query_data_types",
+    return_value={"id": pa.int32(), "total": pa.string()},
+)
+@patch("pg2pyrquet.stream.psycopg.connect")
+def test_stream_changes(
+    mock_connect,
+    mock_get_query_data_types,
+    mock_peek_slot_changes,
+    mock_advance_slot,
+    mock_sleep,
+    tmp_path,
+):
+    mock_conn = mock_connect.return_value.__enter__.return_value
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = [(1, "9.99")]
+    mock_peek_slot_changes.side_effect = [CHANGES, []]
+
+    rows = stream_changes(
+        dsn="dsn",
+        slot="orders_stream",
+        tables=["orders"],
+        output_path=tmp_path,
+        max_batches=2,
+    )
+
+    assert rows == 1
+    path = tmp_path / "orders" / "changes-0000000000000130.parquet"
+    assert pq.read_table(path).to_pylist() == [
+        {"_lsn": "0/110", "_op": "I", "id": 1, "total": "9.99"}
+    ]
+    # The changes of other tables are skipped, the slot is advanced past them
+    assert not (tmp_path / "sales.refunds").exists()
+    mock_advance_slot.assert_called_once_with(
+        conn=mock_conn, slot="orders_stream", lsn="0/130"
+    )
+    assert mock_peek_slot_changes.call_args.kwargs["options"] == {
+        "format-version": "2",
+        "include-transaction": "true",
+        "add-tables": "public.orders",
+    }
+    # The stream sleeps between the polls, not after the last one
+    assert mock_sleep.call_count == 1
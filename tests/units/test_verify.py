@@ -0,0 +1,284 @@
+import hashlib
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from pg2pyrquet.core.exceptions import VerificationError
+from pg2pyrquet.utils.sinks import OutputFormat
+from pg2pyrquet.utils.transforms import Transform
+from pg2pyrquet.verify import (
+    ColumnAggregates,
+    ExportAggregates,
+    compare_aggregates,
+    get_batch_aggregates,
+    get_file_aggregates,
+    get_server_aggregate_expressions,
+    get_server_aggregates,
+    get_verified_columns,
+    hash_values,
+    values_match,
+    verify_export,
+)
+
+COLUMNS = {
+    "id": pa.int64(),
+    "name": pa.string(),
+    "price": pa.float64(),
+    "day": pa.date32(),
+}
+SCHEMA = pa.schema(fields=COLUMNS)
+
+
+def md5_hash(*values):
+    return (
+        sum(
+            int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+            for value in values
+        )
+        % 2**64
+    )
+
+
+def write_file(path):
+    table = pa.table(
+        {
+            "id": [1, 2, 3, None],
+            "name": ["b", "a", None, "a"],
+            "price": [1.5, 2.5, None, 4.0],
+            "day": [date(2024, 1, 2), None, date(2024, 1, 1), None],
+        },
+        schema=SCHEMA,
+    )
+    pq.write_table(table, path, row_group_size=2)
+
+
+def test_hash_values():
+    values = pa.array([3, None, 1, 3], pa.int64())
+    assert hash_values(values=values) == md5_hash("3", "1", "3")
+    assert hash_values(values=pa.array([None], pa.string())) is None
+
+
+def test_get_file_aggregates(tmp_path):
+    path = tmp_path / "output.parquet"
+    write_file(path=path)
+
+    aggregates = get_file_aggregates(
+        where=path,
+        output_format=OutputFormat.PARQUET,
+        columns=COLUMNS,
+        hash_text=True,
+        max_workers=2,
+    )
+
+    assert aggregates.num_rows == 4
+    assert aggregates.columns["id"] == ColumnAggregates(
+        count=3, null_count=1, min=1, max=3, sum=Decimal(6)
+    )
+    assert aggregates.columns["name"] == ColumnAggregates(
+        count=3, null_count=1, min="a", max="b", hash=md5_hash("b", "a", "a")
+    )
+    assert aggregates.columns["price"].sum == 8.0
+    assert aggregates.columns["price"].hash is None
+    assert aggregates.columns["day"].min == date(2024, 1, 1)
+    assert aggregates.columns["day"].hash == md5_hash(
+        "2024-01-02", "2024-01-01"
+    )
+
+    aggregates = get_file_aggregates(
+        where=path, output_format=OutputFormat.PARQUET, columns=COLUMNS
+    )
+    assert aggregates.columns["name"].hash is None
+
+
+def test_get_server_aggregate_expressions():
+    text = '(CASE WHEN "name" IS NOT NULL THEN concat("name") END)'
+    expressions = get_server_aggregate_expressions(
+        column="name", data_type=pa.string(), hash_text=True
+    )
+    assert [expression.as_string(None) for expression in expressions] == [
+        'count("name")',
+        f'min({text} COLLATE "C")',
+        f'max({text} COLLATE "C")',
+        f"sum(('x' || left(md5({text}), 16))::bit(64)::bigint)",
+    ]
+
+    expressions = get_server_aggregate_expressions(
+        column="name", data_type=pa.string()
+    )
+    assert len(expressions) == 3
+
+    expressions = get_server_aggregate_expressions(
+        column="day", data_type=pa.date32()
+    )
+    assert expressions[-1].as_string(None) == (
+        "sum(('x' || left(md5(to_char(\"day\", 'YYYY-MM-DD')), 16))"
+        "::bit(64)::bigint)"
+    )
+
+    expressions = get_server_aggregate_expressions(
+        column="id", data_type=pa.int64()
+    )
+    assert len(expressions) == 4
+
+    expressions = get_server_aggregate_expressions(
+        column="flag", data_type=pa.bool_()
+    )
+    assert len(expressions) == 2
+
+
+def test_get_server_aggregate_expressions_floats():
+    expressions = get_server_aggregate_expressions(
+        column="price", data_type=pa.float32()
+    )
+    assert [expression.as_string(None) for expression in expressions] == [
+        'count("price")',
+        """min("price") FILTER (WHERE "price" <> 'NaN')""",
+        """max("price") FILTER (WHERE "price" <> 'NaN')""",
+        """sum("price"::float8) FILTER (WHERE "price" <> 'NaN')""",
+    ]
+
+
+def test_get_batch_aggregates_nan():
+    batch = pa.record_batch(
+        [pa.array([1.5, float("nan"), None, 0.5], pa.float32())],
+        names=["price"],
+    )
+
+    aggregates = get_batch_aggregates(
+        batch=batch, columns={"price": pa.float32()}
+    )
+
+    # NaN values are counted but left out of the min, max and sum
+    assert aggregates.columns["price"] == ColumnAggregates(
+        count=3, null_count=1, min=0.5, max=1.5, sum=2.0
+    )
+
+
+def test_values_match():
+    assert values_match(expected=float("nan"), actual=float("nan"))
+    assert not values_match(expected=float("nan"), actual=1.0)
+    assert not values_match(expected=1.0, actual=None)
+    assert values_match(expected=1.0, actual=1.00001, tolerance=1e-4)
+    assert not values_match(expected=1.0, actual=1.00001)
+
+
+@patch("pg2pyrquet.verify.get_query_aggregates")
+def test_get_server_aggregates(mock_get_query_aggregates):
+    mock_get_query_aggregates.return_value = (
+        4,
+        3,
+        1,
+        3,
+        6,
+        0,
+        None,
+        None,
+        None,
+    )
+
+    aggregates = get_server_aggregates(
+        conn=MagicMock(),
+        query="SELECT * FROM test_table",
+        columns={"id": pa.int64(), "name": pa.string()},
+        hash_text=True,
+    )
+
+    assert aggregates.num_rows == 4
+    assert aggregates.columns["id"] == ColumnAggregates(
+        count=3, null_count=1, min=1, max=3, sum=6
+    )
+    assert aggregates.columns["name"] == ColumnAggregates(
+        count=0, null_count=4
+    )
+
+
+def test_get_verified_columns():
+    transforms = [
+        Transform(column="name", operation="sha256"),
+        Transform(column="price", operation="rename", argument="day"),
+    ]
+    assert get_verified_columns(
+        data_types=COLUMNS, transforms=transforms
+    ) == {"id": pa.int64()}
+
+
+def test_compare_aggregates():
+    expected = ExportAggregates(
+        num_rows=2,
+        columns={
+            "id": ColumnAggregates(count=2, sum=3),
+            "price": ColumnAggregates(count=2, sum=0.3),
+            "name": ColumnAggregates(count=2),
+        },
+    )
+    actual = ExportAggregates(
+        num_rows=3,
+        columns={
+            "id": ColumnAggregates(count=2, sum=Decimal(4)),
+            "price": ColumnAggregates(count=2, sum=0.1 + 0.2),
+        },
+    )
+
+    assert compare_aggregates(expected=expected, actual=actual) == [
+        "row count: expected 2, got 3",
+        "sum of column 'id': expected 3, got Decimal('4')",
+        "column 'name' is missing from the file",
+    ]
+
+
+def test_compare_aggregates_float32_tolerance():
+    expected = ExportAggregates(
+        num_rows=1, columns={"price": ColumnAggregates(count=1, sum=100.0)}
+    )
+    actual = ExportAggregates(
+        num_rows=1, columns={"price": ColumnAggregates(count=1, sum=100.001)}
+    )
+
+    assert (
+        compare_aggregates(
+            expected=expected, actual=actual, columns={"price": pa.float32()}
+        )
+        == []
+    )
+    assert (
+        len(
+            compare_aggregates(
+                expected=expected,
+                actual=actual,
+                columns={"price": pa.float64()},
+            )
+        )
+        == 1
+    )
+
+
+def test_verify_export(tmp_path):
+    path = tmp_path / "output.parquet"
+    write_file(path=path)
+    columns = {"id": pa.int64()}
+    expected = ExportAggregates(
+        num_rows=4,
+        columns={
+            "id": ColumnAggregates(count=3, null_count=1, min=1, max=3, sum=6)
+        },
+    )
+
+    verify_export(
+        files=[path],
+        output_format=OutputFormat.PARQUET,
+        expected=expected,
+        columns=columns,
+    )
+
+    expected.columns["id"].max = 4
+    with pytest.raises(VerificationError, match="max of column 'id'"):
+        verify_export(
+            files=[path],
+            output_format=OutputFormat.PARQUET,
+            expected=expected,
+            columns=columns,
+        )
@@ -3,7 +3,7 @@ from pathlib import Path
 import pytest
 
 from pg2pyrquet.core.exceptions import InvalidQueryError
-from pg2pyrquet.utils.files import read_query_from_file
+from pg2pyrquet.utils.files import read_named_queries, read_query_from_file
 
 
 def test_read_query_from_file_valid():
@@ -26,3 +26,66 @@ def test_read_query_from_file_invalid():
         read_query_from_file(query_path)
 
     query_path.unlink()
+
+
+def test_read_named_queries_single_query(tmp_path):
+    query_path = tmp_path / "orders.sql"
+    query_path.write_text("SELECT * FROM orders;\n")
+
+    assert read_named_queries(query_path) == {
+        "orders": "SELECT * FROM orders;"
+    }
+
+
+def test_read_named_queries_multiple_queries(tmp_path):
+    query_path = tmp_path / "report.sql"
+    query_path.write_text(
+        "-- Monthly report\n"
+        "-- name: orders\n"
+        "SELECT * FROM orders;\n"
+        "\n"
+        "-- name: totals\n"
+        "SELECT customer_id, sum(total) FROM orders GROUP BY 1;\n"
+    )
+
+    assert read_named_queries(query_path) == {
+        "orders": "SELECT * FROM orders;",
+        "totals": "SELECT customer_id, sum(total) FROM orders GROUP BY 1;",
+    }
+
+
+def test_read_named_queries_folder(tmp_path):
+    (tmp_path / "b.sql").write_text("SELECT 2;")
+    (tmp_path / "a.sql").write_text("-- name: first\nSELECT 1;")
+    (tmp_path / "notes.txt").write_text("not a query")
+
+    assert read_named_queries(tmp_path) == {
+        "first": "SELECT 1;",
+        "b": "SELECT 2;",
+    }
+
+
+def test_read_named_queries_invalid(tmp_path):
+    duplicated = tmp_path / "duplicated.sql"
+    duplicated.write_text("-- name: a\nSELECT 1;\n-- name: a\nSELECT 2;")
+    with pytest.raises(InvalidQueryError, match="more than once"):
+        read_named_queries(duplicated)
+
+    unnamed = tmp_path / "unnamed.sql"
+    unnamed.write_text("SELECT 0;\n-- name: a\nSELECT 1;")
+    with pytest.raises(InvalidQueryError, match="before its first"):
+        read_named_queries(unnamed)
+
+    not_select = tmp_path / "not_select.sql"
+    not_select.write_text("-- name: a\nDELETE FROM orders;")
+    with pytest.raises(InvalidQueryError):
+        read_named_queries(not_select)
+
+
+@pytest.mark.parametrize("name", ["../../x", "a/b", "a..b", "a:b"])
+def test_read_named_queries_invalid_name(tmp_path, name):
+    query_path = tmp_path / "queries.sql"
+    query_path.write_text(f"-- name: {name}\nSELECT 1;")
+
+    with pytest.raises(InvalidQueryError, match="must only contain"):
+        read_named_queries(query_path)
@@ -0,0 +1,20 @@
+from pg2pyrquet.utils.fingerprints import (
+    FINGERPRINTS_FILE_NAME,
+    read_fingerprints,
+    write_fingerprints,
+)
+
+
+def test_read_fingerprints_without_manifest(tmp_path):
+    assert read_fingerprints(output_path=tmp_path) == {}
+
+
+def test_write_and_read_fingerprints(tmp_path):
+    fingerprints = {"table1": "16384:10:2:1", "table2": "16390:0:0:0"}
+
+    write_fingerprints(output_path=tmp_path, fingerprints=fingerprints)
+
+    assert read_fingerprints(output_path=tmp_path) == fingerprints
+    assert [path.name for path in tmp_path.iterdir()] == [
+        FINGERPRINTS_FILE_NAME
+    ]
@@ -0,0 +1,174 @@
+from collections import namedtuple
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pyarrow as pa
+from psycopg.types.range import Range
+
+from pg2pyrquet.utils.nested import (
+    PostgresType,
+    convert_nested_values,
+    get_nested_arrow_type,
+    get_nested_data_types,
+    is_nested_arrow_type,
+    is_nested_postgres_type,
+)
+
+TYPES = {
+    23: PostgresType(23, "pg_catalog", "int4", "b", "N", 0, 0, None),
+    25: PostgresType(25, "pg_catalog", "text", "b", "S", 0, 0, None),
+    1007: PostgresType(1007, "pg_catalog", "_int4", "b", "A", 23, 0, None),
+    1700: PostgresType(1700, "pg_catalog", "numeric", "b", "N", 0, 0, None),
+    3904: PostgresType(3904, "pg_catalog", "int4range", "r", "R", 0, 0, 23),
+    16400: PostgresType(
+        16400,
+        "public",
+        "price",
+        "c",
+        "C",
+        0,
+        0,
+        None,
+        relid=16399,
+        attributes=[("amount", 1700), ("currency", 25)],
+    ),
+    16401: PostgresType(16401, "public", "_price", "b", "A", 16400, 0, None),
+    16402: PostgresType(16402, "public", "hstore", "b", "U", 0, 0, None),
+    16403: PostgresType(16403, "public", "positive", "d", "N", 0, 23, None),
+}
+
+
+def get_type_rows(*oids):
+    return [
+        (
+            oid,
+            TYPES[oid].schema,
+            TYPES[oid].name,
+            TYPES[oid].kind,
+            TYPES[oid].category,
+            TYPES[oid].element,
+            TYPES[oid].relid,
+            TYPES[oid].base,
+            TYPES[oid].subtype,
+        )
+        for oid in oids
+    ]
+
+
+def test_get_nested_arrow_type():
+    assert get_nested_arrow_type(types=TYPES, oid=16401) == pa.list_(
+        pa.struct([("amount", pa.string()), ("currency", pa.string())])
+    )
+    assert get_nested_arrow_type(types=TYPES, oid=16402) == pa.map_(
+        pa.string(), pa.string()
+    )
+    assert get_nested_arrow_type(types=TYPES, oid=3904) == pa.struct(
+        [
+            ("lower", pa.int32()),
+            ("upper", pa.int32()),
+            ("lower_inclusive", pa.bool_()),
+            ("upper_inclusive", pa.bool_()),
+            ("empty", pa.bool_()),
+        ]
+    )
+    assert get_nested_arrow_type(
+        types=TYPES, oid=1007, dimensions=2
+    ) == pa.list_(pa.list_(pa.int32()))
+    assert get_nested_arrow_type(types=TYPES, oid=16403) == pa.int32()
+
+
+def test_is_nested_postgres_type():
+    assert is_nested_postgres_type(types=TYPES, oid=16400)
+    assert is_nested_postgres_type(types=TYPES, oid=16401)
+    assert is_nested_postgres_type(types=TYPES, oid=16402)
+    assert is_nested_postgres_type(types=TYPES, oid=3904)
+    assert is_nested_postgres_type(types=TYPES, oid=1007, dimensions=2)
+    # One-dimensional arrays of scalars keep the type inferred by ADBC
+    assert not is_nested_postgres_type(types=TYPES, oid=1007)
+    assert not is_nested_postgres_type(types=TYPES, oid=16403)
+
+
+def test_is_nested_arrow_type():
+    assert is_nested_arrow_type(pa.struct([("a", pa.int32())]))
+    assert is_nested_arrow_type(pa.map_(pa.string(), pa.string()))
+    assert is_nested_arrow_type(pa.list_(pa.list_(pa.int32())))
+    assert not is_nested_arrow_type(pa.list_(pa.int32()))
+    assert not is_nested_arrow_type(pa.string())
+
+
+def test_convert_nested_values():
+    price_type = pa.struct(
+        [("amount", pa.string()), ("currency", pa.string())]
+    )
+    Price = namedtuple("Price", ["amount", "currency"])
+    values = convert_nested_values(
+        values=[Price(Decimal("1.50"), "EUR"), None, Price(None, "USD")],
+        data_type=price_type,
+    )
+    assert pa.array(values, type=price_type).to_pylist() == [
+        {"amount": "1.50", "currency": "EUR"},
+        None,
+        {"amount": None, "currency": "USD"},
+    ]
+
+    range_type = get_nested_arrow_type(types=TYPES, oid=3904)
+    values = convert_nested_values(
+        values=[Range(1, 5), Range(empty=True)], data_type=range_type
+    )
+    assert pa.array(values, type=range_type).to_pylist() == [
+        {
+            "lower": 1,
+            "upper": 5,
+            "lower_inclusive": True,
+            "upper_inclusive": False,
+            "empty": False,
+        },
+        {
+            "lower": None,
+            "upper": None,
+            "lower_inclusive": False,
+            "upper_inclusive": False,
+            "empty": True,
+        },
+    ]
+
+
+def test_convert_nested_values_without_conversion():
+    matrix_type = pa.list_(pa.list_(pa.int32()))
+    values = [[[1, 2], [3, 4]], None]
+
+    assert convert_nested_values(values=values, data_type=matrix_type) is (
+        values
+    )
+
+
+def test_get_nested_data_types():
+    conn = MagicMock()
+    mock_cursor = conn.cursor.return_value.__enter__.return_value
+    mock_cursor.description = [
+        MagicMock(type_code=23),
+        MagicMock(type_code=16401),
+        MagicMock(type_code=1007),
+    ]
+    for column, name in zip(
+        mock_cursor.description, ["id", "prices", "grid"]
+    ):
+        column.name = name
+    mock_cursor.pgresult.ftable.return_value = 16500
+    mock_cursor.pgresult.ftablecol.side_effect = [1, 2, 3]
+    mock_cursor.fetchall.side_effect = [
+        get_type_rows(23, 1007, 16401),
+        get_type_rows(16400),
+        [(16399, "amount", 1700), (16399, "currency", 25)],
+        get_type_rows(25, 1700),
+        [(16500, 2, 1), (16500, 3, 2)],
+    ]
+
+    data_types = get_nested_data_types(conn=conn, query="SELECT * FROM t")
+
+    assert data_types == {
+        "prices": pa.list_(
+            pa.struct([("amount", pa.string()), ("currency", pa.string())])
+        ),
+        "grid": pa.list_(pa.list_(pa.int32())),
+    }
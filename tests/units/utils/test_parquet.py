@@ -1,14 +1,11 @@
-from unittest.mock import MagicMock
-
 import pyarrow as pa
 
-from pg2pyrquet.utils.parquet import write_batch_to_parquet
+from pg2pyrquet.utils.parquet import build_record_batch, promote_large_types
 
 
-def test_write_batch_to_parquet():
-    writer = MagicMock()
+def test_build_record_batch():
     fields_types = {"field1": pa.int32(), "field2": pa.string()}
-    data = {"field1": [1, 2], "field2": ["a", "b"]}
+    rows = [(1, "a"), (2, "b")]
     schema = pa.schema(
         fields=[
             pa.field("field1", pa.int32()),
@@ -16,7 +13,52 @@ def test_write_batch_to_parquet():
         ]
     )
 
-    write_batch_to_parquet(
-        writer=writer, fields_types=fields_types, data=data, schema=schema
+    batch = build_record_batch(
+        fields_types=fields_types, rows=rows, schema=schema
+    )
+    assert batch.schema == schema
+    assert batch.to_pylist() == [
+        {"field1": 1, "field2": "a"},
+        {"field1": 2, "field2": "b"},
+    ]
+
+
+def test_build_record_batch_empty():
+    fields_types = {"field1": pa.int32()}
+    schema = pa.schema(fields=[pa.field("field1", pa.int32())])
+
+    batch = build_record_batch(
+        fields_types=fields_types, rows=[], schema=schema
     )
-    writer.write_batch.assert_called_once()
+    assert batch.num_rows == 0
+
+
+def test_build_record_batch_nested():
+    fields_types = {
+        "tags": pa.map_(pa.string(), pa.string()),
+        "grid": pa.list_(pa.list_(pa.int32())),
+    }
+    schema = pa.schema(fields=fields_types)
+
+    batch = build_record_batch(
+        fields_types=fields_types,
+        rows=[({"a": "1", "b": None}, [[1, 2], [3, 4]]), (None, None)],
+        schema=schema,
+    )
+    assert batch.to_pylist() == [
+        {"tags": [("a", "1"), ("b", None)], "grid": [[1, 2], [3, 4]]},
+        {"tags": None, "grid": None},
+    ]
+
+
+def test_promote_large_types():
+    fields_types = {
+        "field1": pa.int32(),
+        "field2": pa.string(),
+        "field3": pa.binary(),
+    }
+    assert promote_large_types(fields_types=fields_types) == {
+        "field1": pa.int32(),
+        "field2": pa.large_string(),
+        "field3": pa.large_binary(),
+    }
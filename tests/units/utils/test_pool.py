@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from psycopg.pq import TransactionStatus
+
+from pg2pyrquet.utils.pool import ConnectionPool
+
+
+def make_connection():
+    conn = MagicMock(closed=False, broken=False)
+    conn.info.transaction_status = TransactionStatus.IDLE
+    return conn
+
+
+@patch("pg2pyrquet.utils.pool.psycopg.connect")
+def test_connection_pool_reuses_connections(mock_connect):
+    mock_connect.side_effect = [make_connection(), make_connection()]
+    pool = ConnectionPool(dsn="dsn")
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    mock_connect.assert_called_once_with("dsn")
+    first.commit.assert_called()
+    assert first.isolation_level is None
+
+    pool.close()
+    first.close.assert_called_once()
+
+
+@patch("pg2pyrquet.utils.pool.psycopg.connect")
+def test_connection_pool_discards_broken_connections(mock_connect):
+    broken = make_connection()
+    mock_connect.side_effect = [broken, make_connection()]
+    pool = ConnectionPool(dsn="dsn")
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.broken = True
+            raise RuntimeError("connection lost")
+
+    broken.close.assert_called_once()
+    broken.rollback.assert_not_called()
+    with pool.connection() as conn:
+        assert conn is not broken
@@ -0,0 +1,223 @@
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from pg2pyrquet.core.exceptions import (
+    InvalidColumnOptionError,
+    UnsupportedCompressionError,
+)
+from pg2pyrquet.utils.sinks import (
+    ArrowIpcSink,
+    OutputFormat,
+    RollingSink,
+    SinkOptions,
+    get_bloom_filter_options,
+    get_sorting_columns,
+    open_sink,
+    read_batches,
+    read_schema,
+    remove_output_files,
+)
+
+SCHEMA = pa.schema(
+    fields=[pa.field("field1", pa.int32()), pa.field("field2", pa.string())]
+)
+BATCH = pa.record_batch(
+    data=[pa.array([1, 2], pa.int32()), pa.array(["a", "b"])], schema=SCHEMA
+)
+
+
+def test_output_format_extension():
+    assert OutputFormat.PARQUET.extension == ".parquet"
+    assert OutputFormat.ARROW_IPC.extension == ".arrow"
+    assert OutputFormat.ARROW_IPC_STREAM.extension == ".arrows"
+
+
+def test_sink_options_accepts_format_string():
+    options = SinkOptions(output_format="arrow-ipc")
+    assert options.output_format == OutputFormat.ARROW_IPC
+
+
+def test_open_sink_parquet(tmp_path):
+    output_file = tmp_path / "output.parquet"
+    with open_sink(
+        where=output_file, schema=SCHEMA, options=SinkOptions()
+    ) as sink:
+        sink.write_batch(BATCH)
+
+    assert pq.read_table(output_file).to_batches()[0].equals(BATCH)
+
+
+def test_open_sink_arrow_ipc_file(tmp_path):
+    output_file = tmp_path / "output.arrow"
+    options = SinkOptions(
+        output_format=OutputFormat.ARROW_IPC, compression="zstd"
+    )
+    with open_sink(where=output_file, schema=SCHEMA, options=options) as sink:
+        assert isinstance(sink, ArrowIpcSink)
+        sink.write_batch(BATCH)
+
+    with pa.memory_map(str(output_file)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.to_batches()[0].equals(BATCH)
+
+
+def test_arrow_ipc_sink_closes_file_on_error(tmp_path):
+    opened = []
+    os_file = pa.OSFile
+
+    def open_file(*args, **kwargs):
+        opened.append(os_file(*args, **kwargs))
+        return opened[-1]
+
+    with patch("pg2pyrquet.utils.sinks.pa.OSFile", side_effect=open_file):
+        with patch(
+            "pg2pyrquet.utils.sinks.pa.ipc.new_file",
+            side_effect=pa.ArrowInvalid("bad schema"),
+        ):
+            with pytest.raises(pa.ArrowInvalid):
+                ArrowIpcSink(where=tmp_path / "output.arrow", schema=SCHEMA)
+
+    assert opened[0].closed
+
+
+def test_open_sink_arrow_ipc_stream(tmp_path):
+    output_file = tmp_path / "output.arrows"
+    options = SinkOptions(output_format=OutputFormat.ARROW_IPC_STREAM)
+    with open_sink(where=output_file, schema=SCHEMA, options=options) as sink:
+        sink.write_batch(BATCH)
+
+    with pa.memory_map(str(output_file)) as source:
+        table = pa.ipc.open_stream(source).read_all()
+    assert table.to_batches()[0].equals(BATCH)
+
+
+def test_open_sink_arrow_ipc_unsupported_compression(tmp_path):
+    options = SinkOptions(
+        output_format=OutputFormat.ARROW_IPC, compression="snappy"
+    )
+    with pytest.raises(UnsupportedCompressionError):
+        open_sink(
+            where=tmp_path / "output.arrow", schema=SCHEMA, options=options
+        )
+
+
+def test_get_bloom_filter_options():
+    options = get_bloom_filter_options(
+        schema=SCHEMA, columns=["field1", "field2:1000"]
+    )
+    assert options == {"field1": {}, "field2": {"ndv": 1000}}
+
+
+@pytest.mark.parametrize("columns", [["unknown"], ["field1:many"], [":10"]])
+def test_get_bloom_filter_options_invalid(columns):
+    with pytest.raises(InvalidColumnOptionError):
+        get_bloom_filter_options(schema=SCHEMA, columns=columns)
+
+
+def test_get_sorting_columns():
+    sorting_columns = get_sorting_columns(
+        schema=SCHEMA, columns=["field1", "field2:desc"]
+    )
+    assert [column.column_index for column in sorting_columns] == [0, 1]
+    assert [column.descending for column in sorting_columns] == [False, True]
+
+
+@pytest.mark.parametrize("columns", [["unknown"], ["field1:random"]])
+def test_get_sorting_columns_invalid(columns):
+    with pytest.raises(InvalidColumnOptionError):
+        get_sorting_columns(schema=SCHEMA, columns=columns)
+
+
+def test_open_sink_parquet_pruning_metadata(tmp_path):
+    output_file = tmp_path / "output.parquet"
+    options = SinkOptions(
+        write_page_index=True,
+        bloom_filter_columns=["field1"],
+        sorting_columns=["field1"],
+    )
+    with open_sink(where=output_file, schema=SCHEMA, options=options) as sink:
+        sink.write_batch(BATCH)
+
+    row_group = pq.ParquetFile(output_file).metadata.row_group(0)
+    assert row_group.sorting_columns[0].column_index == 0
+    assert row_group.column(0).has_offset_index
+    assert row_group.column(0).has_column_index
+    assert row_group.column(0).bloom_filter_length > 0
+    assert row_group.column(1).bloom_filter_length in (None, 0)
+
+
+@pytest.mark.parametrize("output_format", list(OutputFormat))
+def test_read_batches_and_schema(tmp_path, output_format):
+    output_file = tmp_path / f"output{output_format.extension}"
+    options = SinkOptions(output_format=output_format)
+    with open_sink(where=output_file, schema=SCHEMA, options=options) as sink:
+        sink.write_batch(BATCH)
+        sink.write_batch(BATCH)
+
+    assert (
+        read_schema(where=output_file, output_format=output_format) == SCHEMA
+    )
+    batches = list(
+        read_batches(where=output_file, output_format=output_format)
+    )
+    assert pa.Table.from_batches(batches).num_rows == 4
+
+
+def test_rolling_sink(tmp_path):
+    with RollingSink(
+        get_path=lambda index: tmp_path / f"part-{index}.parquet",
+        schema=SCHEMA,
+        options=SinkOptions(),
+        max_file_bytes=1,
+    ) as sink:
+        sink.write_batch(BATCH)
+        sink.write_batch(BATCH)
+
+    assert sink.files == [
+        tmp_path / "part-0.parquet",
+        tmp_path / "part-1.parquet",
+    ]
+    assert pq.read_table(sink.files[1]).num_rows == 2
+
+
+def test_rolling_sink_empty(tmp_path):
+    with RollingSink(
+        get_path=lambda index: tmp_path / f"part-{index}.parquet",
+        schema=SCHEMA,
+        options=SinkOptions(),
+        max_file_bytes=1,
+    ) as sink:
+        pass
+
+    assert sink.files == [tmp_path / "part-0.parquet"]
+    table = pq.read_table(sink.files[0])
+    assert table.num_rows == 0
+    assert table.schema.equals(SCHEMA)
+
+
+def test_remove_output_files(tmp_path):
+    names = [
+        "orders.parquet",
+        "orders-00000.parquet",
+        "orders-123456.parquet",
+        "orders-part-00000.parquet",
+        "orders-00000.arrow",
+        "orders_items-00000.parquet",
+    ]
+    for name in names:
+        (tmp_path / name).touch()
+
+    assert remove_output_files(where=tmp_path / "orders.parquet") == [
+        tmp_path / "orders-00000.parquet",
+        tmp_path / "orders-123456.parquet",
+        tmp_path / "orders.parquet",
+    ]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "orders-00000.arrow",
+        "orders-part-00000.parquet",
+        "orders_items-00000.parquet",
+    ]
+    assert remove_output_files(where=tmp_path / "missing" / "x.parquet") == []
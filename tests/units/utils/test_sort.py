@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock
+
+import pyarrow as pa
+import pytest
+
+from pg2pyrquet.core.exceptions import InvalidColumnOptionError
+from pg2pyrquet.utils.sort import ExternalSortSink
+
+SCHEMA = pa.schema(
+    fields=[pa.field("field1", pa.int64()), pa.field("field2", pa.string())]
+)
+
+
+def make_batch(values: list) -> pa.RecordBatch:
+    return pa.record_batch(
+        data=[
+            pa.array(values, pa.int64()),
+            pa.array([str(value) for value in values]),
+        ],
+        schema=SCHEMA,
+    )
+
+
+def written_keys(sink: MagicMock) -> list:
+    return [
+        value
+        for call in sink.write_batch.call_args_list
+        for value in call.args[0].column(0).to_pylist()
+    ]
+
+
+def test_external_sort_sink_in_memory(tmp_path):
+    sink = MagicMock()
+    with ExternalSortSink(
+        sink=sink, schema=SCHEMA, key="field1", temp_dir=tmp_path
+    ) as sorter:
+        sorter.write_batch(make_batch([3, None, 1]))
+        sorter.write_batch(make_batch([2]))
+
+    assert written_keys(sink) == [1, 2, 3, None]
+    sink.close.assert_called_once()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_external_sort_sink_spills_and_merges(tmp_path):
+    sink = MagicMock()
+    values = [(index * 7919) % 1000 for index in range(3000)]
+    values[::100] = [None] * len(values[::100])
+
+    with ExternalSortSink(
+        sink=sink,
+        schema=SCHEMA,
+        key="field1",
+        temp_dir=tmp_path,
+        memory_limit=1,
+        chunk_size=50,
+    ) as sorter:
+        for start in range(0, len(values), 250):
+            sorter.write_batch(make_batch(values[start : start + 250]))
+
+    non_null = sorted(value for value in values if value is not None)
+    nulls = [None] * (len(values) - len(non_null))
+    assert written_keys(sink) == non_null + nulls
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_external_sort_sink_unknown_key(tmp_path):
+    with pytest.raises(InvalidColumnOptionError):
+        ExternalSortSink(
+            sink=MagicMock(), schema=SCHEMA, key="unknown", temp_dir=tmp_path
+        )
@@ -0,0 +1,114 @@
+import json
+import pickle
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pg2pyrquet.utils.sinks import SinkOptions, open_sink
+from pg2pyrquet.utils.summary import (
+    COMMON_METADATA_FILE_NAME,
+    MANIFEST_FILE_NAME,
+    METADATA_FILE_NAME,
+    MetadataCollector,
+    get_column_statistics,
+    remove_dataset_summary,
+    write_dataset_summary,
+)
+
+
+def write_file(path, batch, sink_options):
+    with open_sink(
+        where=path, schema=batch.schema, options=sink_options
+    ) as sink:
+        sink.write_batch(batch)
+
+
+def test_metadata_collector(tmp_path):
+    collector = MetadataCollector()
+    batch = pa.record_batch({"id": [1, 2]})
+
+    write_file(
+        path=tmp_path / "a.parquet",
+        batch=batch,
+        sink_options=SinkOptions(metadata_collector=collector),
+    )
+
+    assert list(collector.files) == [(tmp_path / "a.parquet").resolve()]
+    assert collector.files[(tmp_path / "a.parquet").resolve()].num_rows == 2
+    # Collectors sent to other processes start empty
+    assert pickle.loads(pickle.dumps(collector)).files == {}
+
+
+def test_get_column_statistics(tmp_path):
+    table = pa.table({"id": [3, 1, 2], "name": ["b", None, "a"]})
+    pq.write_table(table, tmp_path / "a.parquet", row_group_size=2)
+
+    statistics = get_column_statistics(
+        metadata=pq.read_metadata(tmp_path / "a.parquet")
+    )
+
+    assert statistics == {
+        "id": {"min": 1, "max": 3, "null_count": 0},
+        "name": {"min": "a", "max": "b", "null_count": 1},
+    }
+
+
+def test_write_dataset_summary(tmp_path):
+    collector = MetadataCollector()
+    write_file(
+        path=tmp_path / "part-0.parquet",
+        batch=pa.record_batch({"id": [1, 2]}),
+        sink_options=SinkOptions(metadata_collector=collector),
+    )
+    # Files written by other processes are summarized from their footers
+    pq.write_table(pa.table({"id": [5]}), tmp_path / "part-1.parquet")
+
+    written = write_dataset_summary(folder=tmp_path, collector=collector)
+
+    assert written == [
+        tmp_path / MANIFEST_FILE_NAME,
+        tmp_path / COMMON_METADATA_FILE_NAME,
+        tmp_path / METADATA_FILE_NAME,
+    ]
+    metadata = pq.read_metadata(tmp_path / METADATA_FILE_NAME)
+    assert metadata.num_rows == 3
+    assert [
+        metadata.row_group(index).column(0).file_path
+        for index in range(metadata.num_row_groups)
+    ] == ["part-0.parquet", "part-1.parquet"]
+    manifest = json.loads((tmp_path / MANIFEST_FILE_NAME).read_text())
+    assert manifest["rows"] == 3
+    assert manifest["files"][1] == {
+        "path": "part-1.parquet",
+        "rows": 1,
+        "row_groups": 1,
+        "columns": {"id": {"min": 5, "max": 5, "null_count": 0}},
+    }
+
+
+def test_write_dataset_summary_different_schemas(tmp_path):
+    pq.write_table(pa.table({"id": [1]}), tmp_path / "orders.parquet")
+    write_dataset_summary(folder=tmp_path)
+    pq.write_table(pa.table({"name": ["a"]}), tmp_path / "users.parquet")
+
+    written = write_dataset_summary(folder=tmp_path)
+
+    assert written == [tmp_path / MANIFEST_FILE_NAME]
+    # The summary files of the earlier single schema are removed
+    assert not (tmp_path / METADATA_FILE_NAME).exists()
+    assert not (tmp_path / COMMON_METADATA_FILE_NAME).exists()
+
+
+def test_write_dataset_summary_without_files(tmp_path):
+    assert write_dataset_summary(folder=tmp_path) == []
+
+
+def test_remove_dataset_summary(tmp_path):
+    for name in (METADATA_FILE_NAME, MANIFEST_FILE_NAME):
+        (tmp_path / name).touch()
+
+    assert remove_dataset_summary(folder=tmp_path) == [
+        tmp_path / METADATA_FILE_NAME,
+        tmp_path / MANIFEST_FILE_NAME,
+    ]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,132 @@
+import pickle
+from unittest.mock import patch
+
+import psycopg
+import pytest
+
+from pg2pyrquet.utils.throttle import (
+    MIN_RATE_FACTOR,
+    PROBE_INTERVAL,
+    PROBE_TIMEOUT,
+    Throttle,
+    ThrottleLimits,
+)
+
+
+def test_throttle_limits_enabled():
+    assert not ThrottleLimits().enabled
+    assert ThrottleLimits(max_bytes_per_sec=1024).enabled
+    assert ThrottleLimits(adaptive=True).enabled
+
+
+def test_throttle_limits_split():
+    limits = ThrottleLimits(max_rows_per_sec=1000, adaptive=True)
+
+    split = limits.split(workers=4)
+
+    assert split.max_rows_per_sec == 250
+    assert split.max_bytes_per_sec is None
+    assert split.adaptive is True
+
+
+@patch("pg2pyrquet.utils.throttle.time.sleep")
+@patch("pg2pyrquet.utils.throttle.time.monotonic", return_value=100.0)
+def test_throttle_wait_rows_per_sec(mock_monotonic, mock_sleep):
+    throttle = Throttle(limits=ThrottleLimits(max_rows_per_sec=100))
+
+    # The fetch itself took 0.5s of the 2s that 200 rows take at the limit
+    throttle.wait(rows=200, nbytes=0, fetch_seconds=0.5)
+    mock_sleep.assert_called_once_with(pytest.approx(1.5))
+
+    # The next fetch waits for the previous one too
+    throttle.wait(rows=100, nbytes=0, fetch_seconds=0)
+    assert mock_sleep.call_args.args[0] == pytest.approx(2.5)
+
+
+@patch("pg2pyrquet.utils.throttle.time.sleep")
+@patch("pg2pyrquet.utils.throttle.time.monotonic", return_value=100.0)
+def test_throttle_wait_bytes_per_sec(mock_monotonic, mock_sleep):
+    throttle = Throttle(
+        limits=ThrottleLimits(max_rows_per_sec=1000, max_bytes_per_sec=1000)
+    )
+
+    throttle.wait(rows=10, nbytes=3000, fetch_seconds=0)
+
+    mock_sleep.assert_called_once_with(pytest.approx(3))
+
+
+@patch("pg2pyrquet.utils.throttle.time.sleep")
+@patch("pg2pyrquet.utils.throttle.get_server_load", return_value=(10, 0.0))
+@patch("pg2pyrquet.utils.throttle.time.monotonic")
+def test_throttle_adaptive_backs_off(
+    mock_monotonic, mock_get_server_load, mock_sleep
+):
+    mock_monotonic.return_value = 0.0
+    throttle = Throttle(limits=ThrottleLimits(adaptive=True), dsn="dsn")
+
+    mock_monotonic.return_value = PROBE_INTERVAL
+    throttle.wait(rows=100, nbytes=0, fetch_seconds=1)
+
+    assert throttle.rate_factor == 0.5
+    mock_get_server_load.assert_called_once_with(
+        dsn="dsn", timeout=PROBE_TIMEOUT
+    )
+    # Half of the time is spent reading, half pausing
+    mock_sleep.assert_called_once_with(pytest.approx(1))
+
+    for probe in range(2, 10):
+        mock_monotonic.return_value = PROBE_INTERVAL * probe
+        throttle.wait(rows=100, nbytes=0, fetch_seconds=0)
+    assert throttle.rate_factor == MIN_RATE_FACTOR
+
+
+@patch("pg2pyrquet.utils.throttle.time.sleep")
+@patch("pg2pyrquet.utils.throttle.get_server_load")
+@patch("pg2pyrquet.utils.throttle.time.monotonic")
+def test_throttle_adaptive_recovers(
+    mock_monotonic, mock_get_server_load, mock_sleep
+):
+    mock_monotonic.return_value = 0.0
+    throttle = Throttle(limits=ThrottleLimits(adaptive=True), dsn="dsn")
+    throttle.rate_factor = 0.5
+
+    mock_get_server_load.return_value = (0, 60.0)
+    mock_monotonic.return_value = PROBE_INTERVAL
+    throttle.wait(rows=100, nbytes=0, fetch_seconds=0)
+    assert throttle.rate_factor == 0.25
+
+    mock_get_server_load.side_effect = psycopg.OperationalError("down")
+    mock_monotonic.return_value = PROBE_INTERVAL * 2
+    throttle.wait(rows=100, nbytes=0, fetch_seconds=0)
+    assert throttle.rate_factor == pytest.approx(0.3125)
+
+
+def test_throttle_pickle():
+    throttle = Throttle(limits=ThrottleLimits(max_rows_per_sec=10), dsn="dsn")
+
+    copy = pickle.loads(pickle.dumps(throttle))
+
+    assert copy.limits == throttle.limits
+    assert copy.dsn == "dsn"
+    with copy._lock:
+        pass
+
+
+@patch("pg2pyrquet.utils.throttle.time.sleep")
+@patch("pg2pyrquet.utils.throttle.get_server_load")
+@patch("pg2pyrquet.utils.throttle.time.monotonic")
+def test_throttle_adaptive_probes_without_lock(
+    mock_monotonic, mock_get_server_load, mock_sleep
+):
+    mock_monotonic.return_value = 0.0
+    throttle = Throttle(limits=ThrottleLimits(adaptive=True), dsn="dsn")
+
+    def get_server_load(dsn, timeout):
+        assert throttle._lock.acquire(blocking=False)
+        throttle._lock.release()
+        return 0, 0.0
+
+    mock_get_server_load.side_effect = get_server_load
+    mock_monotonic.return_value = PROBE_INTERVAL
+    throttle.wait(rows=100, nbytes=0, fetch_seconds=0)
+    mock_get_server_load.assert_called_once()
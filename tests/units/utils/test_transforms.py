@@ -0,0 +1,121 @@
+import datetime
+import hashlib
+
+import pyarrow as pa
+import pytest
+
+from pg2pyrquet.core.exceptions import InvalidTransformError
+from pg2pyrquet.utils.transforms import (
+    Transform,
+    apply_transforms,
+    get_transformed_schema,
+    parse_transform,
+)
+
+BATCH = pa.record_batch(
+    data=[
+        pa.array(["a@example.com", None, "a@example.com"]),
+        pa.array(
+            [
+                datetime.datetime(2024, 5, 17, 13, 45),
+                datetime.datetime(2024, 5, 18, 1, 2),
+                None,
+            ],
+            pa.timestamp("us"),
+        ),
+        pa.array([1, 2, 3], pa.int32()),
+    ],
+    names=["email", "ts", "amount"],
+)
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("email=sha256", Transform(column="email", operation="sha256")),
+        ("ts=date_trunc:day", Transform("ts", "date_trunc", "day")),
+        ("amount=cast:int64", Transform("amount", "cast", "int64")),
+        ("email=rename:contact", Transform("email", "rename", "contact")),
+        ("email=drop", Transform(column="email", operation="drop")),
+    ],
+)
+def test_parse_transform(spec, expected):
+    assert parse_transform(spec=spec) == expected
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "email",
+        "=sha256",
+        "email=md5",
+        "email=sha256:salt",
+        "ts=date_trunc",
+        "ts=date_trunc:decade",
+        "amount=cast:money",
+    ],
+)
+def test_parse_transform_invalid(spec):
+    with pytest.raises(InvalidTransformError):
+        parse_transform(spec=spec)
+
+
+def test_apply_transforms():
+    transforms = [
+        parse_transform(spec="email=sha256"),
+        parse_transform(spec="ts=date_trunc:day"),
+        parse_transform(spec="amount=cast:int64"),
+        parse_transform(spec="email=rename:email_hash"),
+    ]
+
+    batch = apply_transforms(batch=BATCH, transforms=transforms)
+
+    digest = hashlib.sha256(b"a@example.com").hexdigest()
+    assert batch.to_pydict() == {
+        "email_hash": [digest, None, digest],
+        "ts": [
+            datetime.datetime(2024, 5, 17),
+            datetime.datetime(2024, 5, 18),
+            None,
+        ],
+        "amount": [1, 2, 3],
+    }
+    assert batch.schema.field("amount").type == pa.int64()
+
+
+def test_apply_transforms_drop():
+    batch = apply_transforms(
+        batch=BATCH, transforms=[parse_transform(spec="email=drop")]
+    )
+    assert batch.schema.names == ["ts", "amount"]
+
+
+def test_apply_transforms_unknown_column():
+    with pytest.raises(InvalidTransformError):
+        apply_transforms(
+            batch=BATCH, transforms=[parse_transform(spec="unknown=drop")]
+        )
+
+
+def test_apply_transforms_unsupported_type():
+    with pytest.raises(InvalidTransformError):
+        apply_transforms(
+            batch=BATCH,
+            transforms=[parse_transform(spec="email=date_trunc:day")],
+        )
+
+
+def test_get_transformed_schema():
+    schema = get_transformed_schema(
+        schema=BATCH.schema,
+        transforms=[
+            parse_transform(spec="ts=drop"),
+            parse_transform(spec="amount=cast:float64"),
+        ],
+    )
+    assert schema == pa.schema(
+        fields=[
+            pa.field("email", pa.string()),
+            pa.field("amount", pa.float64()),
+        ]
+    )